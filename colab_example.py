@@ -22,8 +22,8 @@ config = {
 pipeline = Pipeline(config)
 pipeline.run()
 
-# 5. Query Data with DuckDB
-import duckdb
-con = duckdb.connect("crypto_data.duckdb")
-df = con.execute("SELECT * FROM klines LIMIT 5").df()
-print(df)
+# 5. Query Data with KlineStore (NumPy arrays, or output="arrow" for Arrow tables)
+from crypto_pipeline.store import KlineStore
+with KlineStore("crypto_data.duckdb") as store:
+    bars = store.get("BTCUSDT", "1d", "2024-01-01", "2024-02-01", ["open_time", "close", "volume"])
+    print(bars["close"][:5])
@@ -0,0 +1,11 @@
+{#- Staged rows in ranges reloaded since the last run are removed before they
+    are restaged, so rows dropped by a replacing file do not linger. -#}
+{% macro delete_reloaded_klines() -%}
+    delete from {{ this }}
+    using {{ source('raw', 'kline_loads') }} as loads
+    where loads.load_id > (select coalesce(max(_load_id), 0) from {{ this }})
+      and {{ this }}.symbol = loads.symbol
+      and {{ this }}.interval = loads.interval
+      and {{ this }}.open_time_ms >= loads.lo
+      and {{ this }}.open_time_ms < loads.hi
+{%- endmacro %}
@@ -0,0 +1,5 @@
+{#- Spot files from 2025 on carry microseconds, everything else milliseconds.
+    Millisecond epochs stay below 1e15, so the magnitude tells the unit. -#}
+{% macro normalize_epoch_ms(column) -%}
+    case when {{ column }} >= 1000000000000000 then {{ column }} // 1000 else {{ column }} end
+{%- endmacro %}
@@ -0,0 +1,50 @@
+{{
+    config(
+        materialized='incremental',
+        unique_key=['symbol', 'trade_date'],
+        incremental_strategy='delete+insert'
+    )
+}}
+
+with klines as (
+    select * from {{ ref('stg_klines') }}
+    where interval = '{{ var("daily_source_interval") }}'
+),
+
+{% if is_incremental() %}
+-- Days with klines restaged since the last run are rebuilt in full, also
+-- when they lie before the newest stored day (backfills, replaced files)
+touched_days as (
+    select distinct symbol, cast(open_ts as date) as trade_date
+    from klines
+    where _load_id > (select coalesce(max(_load_id), 0) from {{ this }})
+),
+{% endif %}
+
+new_klines as (
+    select klines.*
+    from klines
+    {% if is_incremental() %}
+    join touched_days
+      on touched_days.symbol = klines.symbol
+     and touched_days.trade_date = cast(klines.open_ts as date)
+    {% endif %}
+)
+
+select
+    symbol,
+    cast(open_ts as date) as trade_date,
+    arg_min(open_price, open_ts) as open_price,
+    max(high_price) as high_price,
+    min(low_price) as low_price,
+    arg_max(close_price, open_ts) as close_price,
+    sum(volume) as volume,
+    sum(quote_asset_volume) as quote_asset_volume,
+    sum(number_of_trades) as number_of_trades,
+    sum(taker_buy_base_asset_volume) as taker_buy_base_asset_volume,
+    sum(taker_buy_quote_asset_volume) as taker_buy_quote_asset_volume,
+    count(*) as kline_count,
+    max(_load_id) as _load_id,
+    current_timestamp as _loaded_at
+from new_klines
+group by symbol, cast(open_ts as date)
@@ -1,16 +1,55 @@
-with source as (
-    select * from {{ source('raw', 'klines') }}
+{{
+    config(
+        materialized='incremental',
+        unique_key=['symbol', 'interval', 'open_time_ms'],
+        incremental_strategy='delete+insert',
+        pre_hook="{% if is_incremental() %}{{ delete_reloaded_klines() }}{% endif %}"
+    )
+}}
+
+-- The loader logs every replaced open_time range in kline_loads under a
+-- load_id. Incremental runs restage exactly the ranges logged since the
+-- newest load_id already staged, wherever they fall in time, so backfills
+-- and replaced files are picked up. Rows are stamped with the load_id.
+with batch as (
+    select coalesce(max(load_id), 0) as load_id from {{ source('raw', 'kline_loads') }}
+),
+
+{% if is_incremental() %}
+new_loads as (
+    select symbol, interval, lo, hi
+    from {{ source('raw', 'kline_loads') }}
+    where load_id > (select coalesce(max(_load_id), 0) from {{ this }})
+      and load_id <= (select load_id from batch)
+),
+{% endif %}
+
+source as (
+    select klines.*
+    from {{ source('raw', 'klines') }} as klines
+    {% if is_incremental() %}
+    -- A semi join on the clustered open_time, its bounds prune the klines scan
+    where exists (
+        select 1 from new_loads
+        where new_loads.symbol = klines.symbol
+          and new_loads.interval = klines.interval
+          and klines.open_time >= new_loads.lo
+          and klines.open_time < new_loads.hi
+    )
+    {% endif %}
 ),
 
 renamed as (
     select
         open_time as open_time_raw,
+        {{ normalize_epoch_ms('open_time') }} as open_time_ms,
         open as open_price,
         high as high_price,
         low as low_price,
         close as close_price,
         volume,
         close_time as close_time_raw,
+        {{ normalize_epoch_ms('close_time') }} as close_time_ms,
         quote_asset_volume,
         number_of_trades,
         taker_buy_base_asset_volume,
@@ -20,4 +59,10 @@ renamed as (
     from source
 )
 
-select * from renamed
+select
+    renamed.*,
+    epoch_ms(open_time_ms) as open_ts,
+    epoch_ms(close_time_ms) as close_ts,
+    batch.load_id as _load_id,
+    current_timestamp as _loaded_at
+from renamed cross join batch
@@ -1,4 +1,13 @@
-    parser.add_argument("--time-period", choices=["daily", "monthly"], default="monthly", help="Time period")
+import argparse
+
+# Heavy dependencies (rich, pydantic, requests, duckdb, ...) are imported in
+# main() after argument parsing, so `--help` and argument errors stay fast.
+
+def parse_args():
+    """Parse command line arguments."""
+    parser = argparse.ArgumentParser(description="Binance Data Downloader")
+    parser.add_argument("--asset-type", choices=["spot", "um", "cm", "option"], default="spot", help="Asset type")
+    parser.add_argument("--time-period", choices=["daily", "monthly", "hybrid"], default="monthly", help="Time period (hybrid: monthly archives plus daily ones for the current month)")
     parser.add_argument("--data-type", default="klines", help="Data type (e.g., klines, trades)")
     parser.add_argument("--data-frequency", default="1m", help="Data frequency (e.g., 1m, 1h)")
     parser.add_argument("--destination-dir", default="./binance_data", help="Destination directory")
@@ -11,18 +20,35 @@
     parser.add_argument("--fetch-method", choices=["api", "xml", "json"], default="api", help="Method to fetch symbols: api (default), xml (for Colab), or json")
     parser.add_argument("--symbol-file", help="Path to JSON file containing symbols (required if fetch-method is json)")
     parser.add_argument("--db-path", help="Path to DuckDB database file (optional)")
-    parser.add_argument("--config", help="Path to YAML configuration file")
+    parser.add_argument("--config", help="Path to YAML configuration file (single dataset or multi-dataset job)")
+    parser.add_argument("--mode", choices=["run", "plan", "execute", "daemon", "compact"], default="run", help="run (default), plan (dry run: list, estimate and save a plan), execute (run a saved plan), daemon (keep polling for new archives) or compact (merge daily files of closed months into monthly Parquet)")
+    parser.add_argument("--resume", action="store_true", help="Continue the interrupted run of this dataset and batch from its journal")
+    parser.add_argument("--retry-failed", action="store_true", help="Reprocess only the files that failed in the last run")
+    parser.add_argument("--profile", nargs="?", const="./profiles", metavar="DIR", help="Write a CPU and memory profile of every stage (fetch, list, download, extract, verify, load) to DIR (default: ./profiles)")
+    parser.add_argument("--plan-file", help="Plan file written by --mode plan and read by --mode execute")
     return parser.parse_args()
 
 def main():
     """Main execution flow."""
-    console = Console()
     args = parse_args()
+
+    from rich.console import Console
+    console = Console()
     
     try:
+        from crypto_pipeline.config import AppConfig, JobConfig, load_config
+        from crypto_pipeline.pipeline import Pipeline
+
         if args.config:
             # Load from YAML if provided
-            pipeline = Pipeline(args.config)
+            config = load_config(args.config)
+            if args.profile:
+                config = config.model_copy(update={"profile_dir": args.profile})
+            if isinstance(config, JobConfig):
+                from crypto_pipeline.job import JobRunner
+                pipeline = JobRunner(config)
+            else:
+                pipeline = Pipeline(config)
         else:
             # Load from CLI args
             config = AppConfig(
@@ -39,11 +65,24 @@ def main():
                 retries=args.retries,
                 fetch_method=args.fetch_method,
                 symbol_file=args.symbol_file,
-                db_path=args.db_path
+                db_path=args.db_path,
+                profile_dir=args.profile
             )
             pipeline = Pipeline(config)
             
-        pipeline.run()
+        if args.mode == "run" and (args.resume or args.retry_failed):
+            pipeline.run(resume=args.resume, retry_failed=args.retry_failed)
+        elif args.mode == "run":
+            pipeline.run()
+        elif args.mode == "daemon" and isinstance(pipeline, Pipeline):
+            from crypto_pipeline.daemon import Daemon
+            Daemon(pipeline.config).run()
+        elif args.mode == "compact" and isinstance(pipeline, Pipeline):
+            pipeline.compact()
+        elif isinstance(pipeline, Pipeline):
+            getattr(pipeline, args.mode)(args.plan_file)
+        else:
+            console.print(f"[bold red]--mode {args.mode} is only supported for single-dataset configs.[/]")
         
     except Exception as e:
         console.print(f"[bold red]Error: {e}[/]")
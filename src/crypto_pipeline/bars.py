@@ -0,0 +1,461 @@
+import csv
+import glob
+import json
+import os
+import re
+from typing import Dict, Iterator, List, Optional, Tuple
+import numpy as np
+from rich.console import Console
+from .config import AppConfig
+from .periods import period_range
+from .timeutils import INTERVAL_MS, INTERVAL_OFFSET_MS, normalize_ms_sql
+
+BARS_DDL = """
+    CREATE TABLE IF NOT EXISTS bars (
+        symbol VARCHAR,
+        bar_type VARCHAR,
+        bar_size VARCHAR,
+        open_time BIGINT,
+        close_time BIGINT,
+        open DOUBLE,
+        high DOUBLE,
+        low DOUBLE,
+        close DOUBLE,
+        volume DOUBLE,
+        quote_volume DOUBLE,
+        vwap DOUBLE,
+        trades BIGINT,
+        taker_buy_volume DOUBLE,
+        open_ts TIMESTAMP
+    )
+"""
+
+# Leading aggTrades columns; spot files carry an extra is_best_match column
+AGG_TRADES_COLUMNS = {
+    "agg_trade_id": "BIGINT",
+    "price": "DOUBLE",
+    "quantity": "DOUBLE",
+    "first_trade_id": "BIGINT",
+    "last_trade_id": "BIGINT",
+    "transact_time": "BIGINT",
+    "is_buyer_maker": "BOOLEAN",
+}
+
+# Open volume or dollar bar of a (symbol, bar_type, bar_size), carried to the next archive
+BAR_STATE_DDL = """
+    CREATE TABLE IF NOT EXISTS bar_state (
+        symbol VARCHAR,
+        bar_type VARCHAR,
+        bar_size VARCHAR,
+        last_id BIGINT,
+        filled DOUBLE,
+        open_time BIGINT,
+        close_time BIGINT,
+        open DOUBLE,
+        high DOUBLE,
+        low DOUBLE,
+        close DOUBLE,
+        volume DOUBLE,
+        quote_volume DOUBLE,
+        trades BIGINT,
+        taker_buy_volume DOUBLE
+    )
+"""
+
+BAR_FIELDS = ("open_time", "close_time", "open", "high", "low", "close",
+              "volume", "quote_volume", "trades", "taker_buy_volume")
+
+BAR_SPEC_PATTERN = re.compile(r"^(time|volume|dollar):(\S+)$")
+
+STAGING_DIR = ".bars_staging"
+
+# Bytes of trades parsed at a time by the volume and dollar bar builder
+CHUNK_BYTES = 16 * 1024**2
+
+
+def parse_bar_spec(spec: str) -> Tuple[str, str]:
+    """Split "time:1m", "volume:1000" or "dollar:1e6" into (bar_type, bar_size)."""
+    match = BAR_SPEC_PATTERN.match(spec.strip())
+    if not match:
+        raise ValueError(f"Invalid bar spec {spec!r}, expected time:<interval>, volume:<qty> or dollar:<quote qty>")
+    bar_type, size = match.groups()
+    if bar_type == "time":
+        if size not in INTERVAL_MS:
+            raise ValueError(f"Unknown bar interval {size!r}")
+        return bar_type, size
+    try:
+        threshold = float(size)
+    except ValueError:
+        raise ValueError(f"Invalid {bar_type} bar threshold {size!r}")
+    if threshold <= 0:
+        raise ValueError(f"{bar_type} bar threshold must be positive")
+    return bar_type, f"{threshold:g}"
+
+
+class ThresholdBarBuilder:
+    """
+    Volume or dollar bars over trades fed in agg_trade_id order.
+
+    A trade opens a new bar once the cumulative measure before it reached
+    the next multiple of the threshold. Only the open bar and the measure
+    filled since its grid line are kept between chunks (`state`), so memory
+    is bounded by one chunk of trades however long a bar runs.
+    """
+
+    def __init__(self, bar_type: str, bar_size: str, state: Optional[Dict] = None):
+        self.measure = "quantity" if bar_type == "volume" else "quote_quantity"
+        self.size = float(bar_size)
+        # {"last_id": int, "filled": float, "bar": {field: value} or None}
+        self.state = state
+
+    def feed(self, trades: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+        """Add a chunk of trades and return the bars it completed, as columns of BAR_FIELDS."""
+        ids = trades["agg_trade_id"]
+        if not len(ids):
+            return {field: np.empty(0) for field in BAR_FIELDS}
+        price, quantity, ts = trades["price"], trades["quantity"], trades["transact_time"]
+        quote = price * quantity
+        measure = quantity if self.measure == "quantity" else quote
+        filled = self.state["filled"] if self.state else 0.0
+        open_bar = self.state["bar"] if self.state else None
+
+        cumulative = filled + np.cumsum(measure)
+        bucket = np.floor((cumulative - measure) / self.size)
+        starts = np.flatnonzero(np.r_[True, bucket[1:] != bucket[:-1]])
+        ends = np.r_[starts[1:], len(ids)] - 1
+        bars = {
+            "open_time": np.minimum.reduceat(ts, starts),
+            "close_time": np.maximum.reduceat(ts, starts),
+            "open": price[starts],
+            "high": np.maximum.reduceat(price, starts),
+            "low": np.minimum.reduceat(price, starts),
+            "close": price[ends],
+            "volume": np.add.reduceat(quantity, starts),
+            "quote_volume": np.add.reduceat(quote, starts),
+            "trades": ends - starts + 1,
+            "taker_buy_volume": np.add.reduceat(np.where(trades["is_buyer_maker"], 0.0, quantity), starts),
+        }
+        if open_bar is not None:
+            # filled < size, so the first trade continues the open bar
+            bars["open_time"][0] = min(bars["open_time"][0], open_bar["open_time"])
+            bars["close_time"][0] = max(bars["close_time"][0], open_bar["close_time"])
+            bars["open"][0] = open_bar["open"]
+            bars["high"][0] = max(bars["high"][0], open_bar["high"])
+            bars["low"][0] = min(bars["low"][0], open_bar["low"])
+            for field in ("volume", "quote_volume", "trades", "taker_buy_volume"):
+                bars[field][0] += open_bar[field]
+
+        total = float(cumulative[-1])
+        grid = float(bucket[-1]) * self.size
+        if total - grid >= self.size:
+            # The last trade reached the threshold: every bar is complete
+            filled, open_bar = total - float(np.floor(total / self.size)) * self.size, None
+            complete = bars
+        else:
+            filled = total - grid
+            open_bar = {field: values[-1].item() for field, values in bars.items()}
+            complete = {field: values[:-1] for field, values in bars.items()}
+        self.state = {"last_id": int(ids[-1]), "filled": filled, "bar": open_bar}
+        return complete
+
+
+class BarAggregator:
+    """
+    Aggregates aggTrades archives into time, volume and dollar bars.
+
+    Time bars of each extracted CSV are aggregated right away by DuckDB,
+    which streams the file, and staged as Parquet next to the data. Volume
+    and dollar bars span archives: `flush` feeds the pending CSVs of every
+    symbol in period order through a `ThresholdBarBuilder` in chunks of
+    CHUNK_BYTES, and the open bar at the end of an archive is carried in
+    the `bar_state` table to the next archive that continues its
+    agg_trade_id sequence. Bars are written to the `bars` table of
+    config.db_path, replacing the stored bars of the day or month of each
+    archive, in the same transaction as the carried state.
+    """
+
+    def __init__(self):
+        self.console = Console()
+
+    def staging_dir(self, config: AppConfig) -> str:
+        return os.path.join(config.destination_dir, STAGING_DIR, config.asset_type)
+
+    def aggregate_file(self, csv_path: str, symbol: str, config: AppConfig) -> int:
+        """
+        Stage the time bars of one aggTrades CSV and queue it for volume and
+        dollar bars. Returns the number of time bars.
+        """
+        staging_dir = self.staging_dir(config)
+        os.makedirs(staging_dir, exist_ok=True)
+        specs = [parse_bar_spec(spec) for spec in config.bars]
+        time_specs = [size for bar_type, size in specs if bar_type == "time"]
+
+        count = 0
+        if time_specs:
+            import duckdb
+            staged_path = os.path.join(staging_dir, os.path.basename(csv_path).replace(".csv", ".parquet"))
+            trades_sql = self.trades_sql(csv_path)
+            queries = [self.bars_sql(trades_sql, symbol, size) for size in time_specs]
+            con = duckdb.connect()
+            try:
+                tmp_path = staged_path + ".tmp"
+                con.execute(f"COPY ({' UNION ALL '.join(queries)}) TO '{tmp_path}' (FORMAT PARQUET)")
+                os.replace(tmp_path, staged_path)
+                count = con.execute(f"SELECT count(*) FROM read_parquet('{staged_path}')").fetchone()[0]
+            finally:
+                con.close()
+
+        if len(time_specs) == len(specs):
+            if not config.keep_raw_trades:
+                os.remove(csv_path)
+            return count
+
+        # Volume and dollar bars wait for flush; the CSV leaves the dataset directory unless kept
+        pending_dir = os.path.join(staging_dir, "pending")
+        os.makedirs(pending_dir, exist_ok=True)
+        name = os.path.basename(csv_path)
+        if not config.keep_raw_trades:
+            os.replace(csv_path, os.path.join(pending_dir, name))
+            csv_path = os.path.join(pending_dir, name)
+        with open(os.path.join(pending_dir, name + ".json"), "w") as f:
+            json.dump({"csv": csv_path, "symbol": symbol}, f)
+        return count
+
+    def flush(self, config: AppConfig, con=None) -> int:
+        """Write staged and pending bars to the bars table, through `con` if given. Returns the number of bars written."""
+        staging_dir = self.staging_dir(config)
+        staged = sorted(glob.glob(os.path.join(staging_dir, "*.parquet")))
+        markers = sorted(glob.glob(os.path.join(staging_dir, "pending", "*.json")))
+        if not staged and not markers:
+            return 0
+        if not config.db_path:
+            self.console.print("[yellow]No database path provided. Bars stay staged.[/]")
+            return 0
+
+        self.console.print(f"[bold blue]Writing bars from {len(staged) + len(markers)} archives to {config.db_path}...[/]")
+        pending = []
+        for marker in markers:
+            with open(marker) as f:
+                pending.append(json.load(f))
+        try:
+            if con is not None:
+                rows, built = self._flush(con, staged, pending, config)
+            else:
+                import duckdb
+                con = duckdb.connect(config.db_path)
+                try:
+                    rows, built = self._flush(con, staged, pending, config)
+                finally:
+                    con.close()
+        except Exception as e:
+            self.console.print(f"[bold red]Error writing bars: {e}[/]")
+            return 0
+
+        for path in staged + built:
+            os.remove(path)
+        for marker, entry in zip(markers, pending):
+            if not config.keep_raw_trades and os.path.exists(entry["csv"]):
+                os.remove(entry["csv"])
+            os.remove(marker)
+        self.console.print(f"[bold green]Wrote {rows} bars.[/]")
+        return rows
+
+    def _flush(self, con, staged: List[str], pending: List[Dict], config: AppConfig) -> Tuple[int, List[str]]:
+        con.execute(BAR_STATE_DDL)
+        built, states = self.build_threshold_bars(con, pending, config)
+        return self.write_bars(con, staged + built, states), built
+
+    def build_threshold_bars(self, con, pending: List[Dict], config: AppConfig) -> Tuple[List[str], List[Tuple]]:
+        """
+        Stage the volume and dollar bars of the pending CSVs as Parquet.
+
+        Returns the staged files and the `bar_state` rows to store with them.
+        An archive continues the stored open bar only if its first trade
+        follows the bar's last one; otherwise its bars start afresh.
+        """
+        specs = [spec for spec in map(parse_bar_spec, config.bars) if spec[0] != "time"]
+        states: Dict[Tuple[str, str, str], Optional[Dict]] = {}
+        built = []
+        threshold_dir = os.path.join(self.staging_dir(config), "threshold")
+        os.makedirs(threshold_dir, exist_ok=True)
+        ordered = sorted(pending, key=lambda entry: (entry["symbol"], period_range(entry["csv"]) or (0, 0)))
+        for entry in ordered:
+            symbol = entry["symbol"]
+            name = os.path.basename(entry["csv"])
+            rows_path = os.path.join(threshold_dir, name + ".tmp")
+            builders = None
+            written = 0
+            with open(rows_path, "w", newline="") as f:
+                writer = csv.writer(f)
+                for trades in self.trade_chunks(entry["csv"]):
+                    if builders is None:
+                        builders = []
+                        for bar_type, bar_size in specs:
+                            key = (symbol, bar_type, bar_size)
+                            if key not in states:
+                                states[key] = self.load_state(con, *key)
+                            state = states[key]
+                            follows = state is not None and state["last_id"] + 1 == int(trades["agg_trade_id"][0])
+                            builders.append((key, ThresholdBarBuilder(bar_type, bar_size, state if follows else None)))
+                    for key, builder in builders:
+                        bars = builder.feed(trades)
+                        columns = [bars[field].tolist() for field in BAR_FIELDS]
+                        writer.writerows((*key, *row) for row in zip(*columns))
+                        written += len(bars["open_time"])
+            for key, builder in builders or []:
+                # An archive older than the stored bar does not move it back
+                if states[key] is None or builder.state["last_id"] > states[key]["last_id"]:
+                    states[key] = builder.state
+            if not written:
+                os.remove(rows_path)
+                continue
+            staged_path = os.path.join(threshold_dir, name.replace(".csv", ".parquet"))
+            self.stage_rows(con, rows_path, staged_path)
+            built.append(staged_path)
+        return built, [self.state_row(key, state) for key, state in states.items() if state is not None]
+
+    def trade_chunks(self, csv_path: str) -> Iterator[Dict[str, np.ndarray]]:
+        """Trades of an aggTrades CSV as NumPy columns, about CHUNK_BYTES of the file at a time."""
+        from .stream import parse_csv
+        with open(csv_path, "rb") as f:
+            rest = b""
+            while True:
+                data = f.read(CHUNK_BYTES)
+                if not data:
+                    break
+                data = rest + data
+                cut = data.rfind(b"\n") + 1
+                data, rest = data[:cut], data[cut:]
+                if data:
+                    trades = parse_csv(data, "aggTrades")
+                    if len(trades["agg_trade_id"]):
+                        yield trades
+            if rest.strip():
+                yield parse_csv(rest, "aggTrades")
+
+    def load_state(self, con, symbol: str, bar_type: str, bar_size: str) -> Optional[Dict]:
+        """Stored open bar of (symbol, bar_type, bar_size), None if there is none."""
+        row = con.execute("""
+            SELECT last_id, filled, open_time, close_time, open, high, low, close,
+                   volume, quote_volume, trades, taker_buy_volume
+            FROM bar_state WHERE symbol = ? AND bar_type = ? AND bar_size = ?
+        """, [symbol, bar_type, bar_size]).fetchone()
+        if row is None:
+            return None
+        bar = dict(zip(BAR_FIELDS, row[2:])) if row[2] is not None else None
+        return {"last_id": row[0], "filled": row[1], "bar": bar}
+
+    def state_row(self, key: Tuple[str, str, str], state: Dict) -> Tuple:
+        bar = state["bar"]
+        return (*key, state["last_id"], state["filled"],
+                *(bar[field] if bar is not None else None for field in BAR_FIELDS))
+
+    def stage_rows(self, con, rows_path: str, staged_path: str):
+        """Convert the bar rows written by build_threshold_bars into a staged Parquet file."""
+        columns = {"symbol": "VARCHAR", "bar_type": "VARCHAR", "bar_size": "VARCHAR",
+                   "open_time": "BIGINT", "close_time": "BIGINT", "open": "DOUBLE", "high": "DOUBLE",
+                   "low": "DOUBLE", "close": "DOUBLE", "volume": "DOUBLE", "quote_volume": "DOUBLE",
+                   "trades": "BIGINT", "taker_buy_volume": "DOUBLE"}
+        types = ", ".join(f"'{name}': '{dtype}'" for name, dtype in columns.items())
+        path = rows_path.replace("\\", "/")
+        tmp_path = staged_path + ".tmp"
+        con.execute(f"""
+            COPY (
+                SELECT symbol, bar_type, bar_size, open_time, close_time, open, high, low, close,
+                       volume, quote_volume, quote_volume / volume AS vwap, trades, taker_buy_volume,
+                       epoch_ms(open_time) AS open_ts
+                FROM read_csv('{path}', delim=',', header=false, columns={{{types}}})
+            ) TO '{tmp_path}' (FORMAT PARQUET)
+        """)
+        os.replace(tmp_path, staged_path)
+        os.remove(rows_path)
+
+    def write_bars(self, con, parquet_files: List[str], states: Optional[List[Tuple]] = None) -> int:
+        """
+        Replace the stored bars of each staged archive's (symbol, bar_type, bar_size) in the archive's period.
+        `states` rows replace their (symbol, bar_type, bar_size) in `bar_state` in the same transaction.
+        """
+        con.execute(BARS_DDL)
+        files_sql = ", ".join(f"'{path}'" for path in parquet_files)
+        source = f"read_parquet([{files_sql}], filename=true)" if parquet_files else "(SELECT *, '' AS filename FROM bars LIMIT 0)"
+        con.execute(f"""
+            CREATE OR REPLACE TEMP TABLE bars_staged AS
+            SELECT * FROM {source}
+            ORDER BY symbol, bar_type, bar_size, open_time
+        """)
+        rows = con.execute("SELECT count(*) FROM bars_staged").fetchone()[0]
+        # The day or month of the archive, widened to bars opening before it (weekly buckets, carried bars)
+        ranges = []
+        for path, symbol, bar_type, bar_size, lo, hi in con.execute("""
+                SELECT filename, symbol, bar_type, bar_size, min(open_time), max(open_time)
+                FROM bars_staged GROUP BY ALL
+        """).fetchall():
+            start, end = period_range(path) or (lo, hi + 1)
+            ranges.append((symbol, bar_type, bar_size, min(start, lo), max(end, hi + 1)))
+        try:
+            con.execute("BEGIN TRANSACTION")
+            con.execute("""
+                CREATE OR REPLACE TEMP TABLE bars_ranges
+                (symbol VARCHAR, bar_type VARCHAR, bar_size VARCHAR, lo BIGINT, hi BIGINT)
+            """)
+            if ranges:
+                con.executemany("INSERT INTO bars_ranges VALUES (?, ?, ?, ?, ?)", ranges)
+            con.execute("""
+                DELETE FROM bars USING bars_ranges r
+                WHERE bars.symbol = r.symbol AND bars.bar_type = r.bar_type AND bars.bar_size = r.bar_size
+                  AND bars.open_time >= r.lo AND bars.open_time < r.hi
+            """)
+            con.execute("INSERT INTO bars SELECT * EXCLUDE (filename) FROM bars_staged")
+            if states:
+                con.execute(BAR_STATE_DDL)
+                con.executemany("DELETE FROM bar_state WHERE symbol = ? AND bar_type = ? AND bar_size = ?",
+                                [state[:3] for state in states])
+                con.executemany(f"INSERT INTO bar_state VALUES ({', '.join(['?'] * 15)})", states)
+            con.execute("COMMIT")
+        except Exception:
+            con.execute("ROLLBACK")
+            raise
+        finally:
+            con.execute("DROP TABLE IF EXISTS bars_staged")
+            con.execute("DROP TABLE IF EXISTS bars_ranges")
+        return rows
+
+    def trades_sql(self, csv_path: str) -> str:
+        """Relation of the trades of one aggTrades CSV with ms timestamps and quote quantities."""
+        with open(csv_path, "rb") as f:
+            first = f.read(1)
+        header = bool(first) and not first.isdigit()
+        names = list(AGG_TRADES_COLUMNS)
+        types = ", ".join(f"'{name}': '{dtype}'" for name, dtype in AGG_TRADES_COLUMNS.items())
+        path = csv_path.replace("\\", "/")
+        return f"""(
+            SELECT agg_trade_id, price, quantity, price * quantity AS quote_quantity,
+                   {normalize_ms_sql('transact_time')} AS ts, is_buyer_maker
+            FROM read_csv('{path}', header={header}, names={names}, types={{{types}}})
+        )"""
+
+    def bars_sql(self, trades_sql: str, symbol: str, bar_size: str) -> str:
+        """SELECT of the time bars of one interval over a trades relation."""
+        size = INTERVAL_MS[bar_size]
+        offset = INTERVAL_OFFSET_MS.get(bar_size, 0)
+        bucket = f"((ts - {offset}) // {size}) * {size} + {offset}"
+        return f"""
+            SELECT
+                '{symbol}' AS symbol,
+                'time' AS bar_type,
+                '{bar_size}' AS bar_size,
+                bucket AS open_time,
+                bucket + {size - 1} AS close_time,
+                arg_min(price, agg_trade_id) AS open,
+                max(price) AS high,
+                min(price) AS low,
+                arg_max(price, agg_trade_id) AS close,
+                sum(quantity) AS volume,
+                sum(quote_quantity) AS quote_volume,
+                sum(quote_quantity) / sum(quantity) AS vwap,
+                count(*) AS trades,
+                sum(CASE WHEN is_buyer_maker THEN 0 ELSE quantity END) AS taker_buy_volume,
+                epoch_ms(bucket) AS open_ts
+            FROM (SELECT *, {bucket} AS bucket FROM {trades_sql})
+            GROUP BY bucket
+        """
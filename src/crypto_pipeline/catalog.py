@@ -0,0 +1,303 @@
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from datetime import date, timedelta
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+from .config import AppConfig
+from .periods import archive_period, compacted_path
+from .timeutils import TimeLike, to_epoch_ms, to_millis
+
+# Column holding the event time, per data type (klines: open_time)
+TIME_COLUMN = {
+    "klines": 0,
+    "aggTrades": 5,
+    "trades": 4,
+}
+
+CATALOG_DDL = [
+    """
+    CREATE TABLE IF NOT EXISTS files (
+        path TEXT PRIMARY KEY,
+        directory TEXT NOT NULL,
+        symbol TEXT,
+        period TEXT,
+        bytes INTEGER,
+        rows INTEGER,
+        columns INTEGER,
+        has_header INTEGER,
+        min_time INTEGER,
+        max_time INTEGER,
+        crc32 INTEGER,
+        verified INTEGER NOT NULL DEFAULT 0,
+        loaded INTEGER NOT NULL DEFAULT 0,
+        added_at REAL
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS files_directory_time ON files (directory, min_time)",
+    "CREATE TABLE IF NOT EXISTS dirs (path TEXT PRIMARY KEY, mtime_ns INTEGER)",
+    # Days merged into each compacted monthly Parquet file
+    "CREATE TABLE IF NOT EXISTS compacted (path TEXT NOT NULL, day TEXT NOT NULL, PRIMARY KEY (path, day))",
+]
+
+_catalogs: Dict[str, "FileCatalog"] = {}
+_catalogs_lock = threading.Lock()
+
+
+def catalog_path(config: AppConfig) -> str:
+    return config.catalog_path or os.path.join(config.destination_dir, "catalog.sqlite")
+
+
+def open_catalog(config: AppConfig) -> "FileCatalog":
+    """Catalog of config, shared by all components of the process."""
+    path = os.path.abspath(catalog_path(config))
+    with _catalogs_lock:
+        catalog = _catalogs.get(path)
+        if catalog is None:
+            catalog = FileCatalog(path)
+            _catalogs[path] = catalog
+        return catalog
+
+
+def read_compacted_days(config: AppConfig) -> Set[Tuple[str, str]]:
+    """
+    (Parquet path, day) of every day merged by the compactor, read from the
+    catalog file read-only. Empty without a catalog file, which is not created.
+    """
+    path = os.path.abspath(catalog_path(config))
+    if not os.path.exists(path):
+        return set()
+    con = sqlite3.connect(f"file:{path}?mode=ro", uri=True, timeout=30)
+    try:
+        return {(row[0], row[1]) for row in con.execute("SELECT path, day FROM compacted")}
+    except sqlite3.OperationalError:
+        # Catalog file not initialized yet
+        return set()
+    finally:
+        con.close()
+
+
+def csv_stats(data: bytes, data_type: str) -> Dict:
+    """Row count, column count, header flag and time bounds (ms) of a CSV's content."""
+    lines = data.splitlines()
+    while lines and not lines[-1].strip():
+        lines.pop()
+    has_header = bool(lines) and not lines[0][:1].isdigit()
+    body = lines[1:] if has_header else lines
+    stats = {"rows": len(body), "columns": None, "has_header": has_header, "min_time": None, "max_time": None}
+    if not body:
+        return stats
+
+    first, last = body[0].split(b","), body[-1].split(b",")
+    stats["columns"] = len(first)
+    index = TIME_COLUMN.get(data_type, 0)
+    try:
+        # Archives are ordered by time, so the bounds are the first and last rows
+        times = [to_millis(int(first[index])), to_millis(int(last[index]))]
+        stats["min_time"], stats["max_time"] = min(times), max(times)
+    except (ValueError, IndexError):
+        pass
+    return stats
+
+
+def parquet_stats(path: str, data_type: str) -> Dict:
+    """Row count, column count and time bounds (ms) of a compacted Parquet file."""
+    import duckdb  # Only compacted datasets have Parquet files
+    posix_path = path.replace("\\", "/")
+    source = f"read_parquet('{posix_path}')"
+    con = duckdb.connect()
+    try:
+        columns = [row[0] for row in con.execute(f"DESCRIBE SELECT * FROM {source}").fetchall()]
+        time_column = columns[TIME_COLUMN.get(data_type, 0)]
+        rows, min_time, max_time = con.execute(
+            f'SELECT count(*), min("{time_column}"), max("{time_column}") FROM {source}'
+        ).fetchone()
+    finally:
+        con.close()
+    return {
+        "rows": rows,
+        "columns": len(columns),
+        "has_header": False,
+        "min_time": to_millis(min_time) if min_time is not None else None,
+        "max_time": to_millis(max_time) if max_time is not None else None,
+    }
+
+
+def file_row(path: str, data_type: str, data: Optional[bytes] = None, crc32: Optional[int] = None) -> Dict:
+    """Catalog row of a CSV or compacted Parquet file, with statistics from `data` (read from disk if not given)."""
+    if data is None:
+        with open(path, "rb") as f:
+            data = f.read()
+    stats = parquet_stats(path, data_type) if path.endswith(".parquet") else csv_stats(data, data_type)
+    directory = os.path.dirname(path)
+    return {
+        "path": path,
+        "directory": directory,
+        "symbol": os.path.basename(os.path.dirname(directory)),
+        "period": archive_period(path),
+        "bytes": len(data),
+        "crc32": crc32 if crc32 is not None else zlib.crc32(data),
+        "has_header": int(stats["has_header"]),
+        "rows": stats["rows"],
+        "columns": stats["columns"],
+        "min_time": stats["min_time"],
+        "max_time": stats["max_time"],
+        "added_at": time.time(),
+    }
+
+
+class FileCatalog:
+    """
+    SQLite catalog of extracted files with per-file statistics.
+
+    Files are registered when they are extracted, with their directory,
+    symbol, period, size, row and column counts, header flag, time bounds
+    (epoch ms) and CRC-32, plus verified/loaded flags. Verification, loading,
+    gap analysis and range queries read the catalog instead of scanning and
+    parsing files. A directory is rescanned only when its mtime differs from
+    the one recorded after the last registration, which catches files added
+    or removed outside the pipeline. Monthly Parquet files written by the
+    compactor are registered like CSVs, with their statistics read by DuckDB.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._lock = threading.Lock()
+        self._con = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._con.row_factory = sqlite3.Row
+        with self._lock, self._con:
+            self._con.execute("PRAGMA journal_mode=WAL")
+            for statement in CATALOG_DDL:
+                self._con.execute(statement)
+
+    def close(self) -> None:
+        with self._lock:
+            self._con.close()
+
+    def add_file(self, path: str, data_type: str, data: Optional[bytes] = None, crc32: Optional[int] = None) -> Dict:
+        """Register a CSV or compacted Parquet file, computing its statistics from `data` (read from disk if not given)."""
+        return self.add_row(file_row(path, data_type, data, crc32))
+
+    def add_row(self, row: Dict) -> Dict:
+        """Register a file from a row built by `file_row`, e.g. in an extraction worker process."""
+        with self._lock, self._con:
+            self._con.execute(f"""
+                INSERT OR REPLACE INTO files ({', '.join(row)})
+                VALUES ({', '.join('?' for _ in row)})
+            """, list(row.values()))
+        return row
+
+    def touch_dir(self, directory: str) -> None:
+        """Record the current mtime of a directory whose files are all registered."""
+        try:
+            mtime_ns = os.stat(directory).st_mtime_ns
+        except FileNotFoundError:
+            return
+        with self._lock, self._con:
+            self._con.execute("INSERT OR REPLACE INTO dirs (path, mtime_ns) VALUES (?, ?)", [directory, mtime_ns])
+
+    def remove(self, paths: Iterable[str]) -> None:
+        paths = [(p,) for p in paths]
+        with self._lock, self._con:
+            self._con.executemany("DELETE FROM files WHERE path = ?", paths)
+            self._con.executemany("DELETE FROM compacted WHERE path = ?", paths)
+
+    def sync(self, directory: str, data_type: str) -> None:
+        """Rescan a directory whose mtime changed since it was last recorded."""
+        try:
+            mtime_ns = os.stat(directory).st_mtime_ns
+        except FileNotFoundError:
+            return
+        with self._lock:
+            row = self._con.execute("SELECT mtime_ns FROM dirs WHERE path = ?", [directory]).fetchone()
+            if row is not None and row["mtime_ns"] == mtime_ns:
+                return
+            known = {r["path"] for r in self._con.execute("SELECT path FROM files WHERE directory = ?", [directory])}
+
+        on_disk = {os.path.join(directory, name) for name in os.listdir(directory)
+                   if name.endswith((".csv", ".parquet"))}
+        self.remove(known - on_disk)
+        for path in sorted(on_disk - known):
+            self.add_file(path, data_type)
+        with self._lock, self._con:
+            self._con.execute("INSERT OR REPLACE INTO dirs (path, mtime_ns) VALUES (?, ?)", [directory, mtime_ns])
+
+    def files(self, directory: str, start: TimeLike = None, end: TimeLike = None,
+              verified: Optional[bool] = None, loaded: Optional[bool] = None) -> List[Dict]:
+        """Files of a directory overlapping start <= time < end, ordered by time."""
+        query = "SELECT * FROM files WHERE directory = ?"
+        params: List = [directory]
+        start_ms, end_ms = to_epoch_ms(start), to_epoch_ms(end)
+        if start_ms is not None:
+            query += " AND max_time >= ?"
+            params.append(start_ms)
+        if end_ms is not None:
+            query += " AND min_time < ?"
+            params.append(end_ms)
+        if verified is not None:
+            query += " AND verified = ?"
+            params.append(int(verified))
+        if loaded is not None:
+            query += " AND loaded = ?"
+            params.append(int(loaded))
+        with self._lock:
+            rows = self._con.execute(query + " ORDER BY min_time, path", params).fetchall()
+        return [dict(row) for row in rows]
+
+    def add_compacted(self, path: str, days: Iterable[str]) -> None:
+        """Record the days (YYYY-MM-DD) merged into a compacted Parquet file."""
+        with self._lock, self._con:
+            self._con.executemany("INSERT OR IGNORE INTO compacted (path, day) VALUES (?, ?)",
+                                  [(path, day) for day in days])
+
+    def is_compacted(self, path: str) -> bool:
+        """Whether the day of a daily CSV was merged into the Parquet file of its month."""
+        parquet = compacted_path(path)
+        if parquet is None or not os.path.exists(parquet):
+            return False
+        with self._lock:
+            row = self._con.execute("SELECT 1 FROM compacted WHERE path = ? AND day = ?",
+                                    [parquet, archive_period(path)]).fetchone()
+        return row is not None
+
+    def mark(self, paths: Iterable[str], **flags: int) -> None:
+        """Set verified and/or loaded flags of files."""
+        assignments = ", ".join(f"{name} = ?" for name in flags)
+        with self._lock, self._con:
+            self._con.executemany(f"UPDATE files SET {assignments} WHERE path = ?",
+                                  [list(flags.values()) + [p] for p in paths])
+
+    def reset_loaded(self, directories: Iterable[str]) -> None:
+        """Forget load state, e.g. when the database was recreated."""
+        with self._lock, self._con:
+            self._con.executemany("UPDATE files SET loaded = 0 WHERE directory = ?", [(d,) for d in directories])
+
+    def gaps(self, directory: str) -> List[Tuple[str, str]]:
+        """Missing days between the first and last file of a directory, as inclusive ISO date ranges."""
+        covered = set()
+        for row in self.files(directory):
+            period = row["period"]
+            if not period:
+                continue
+            if len(period) == 10:
+                covered.add(date.fromisoformat(period))
+            else:
+                day = date.fromisoformat(f"{period}-01")
+                while day.strftime("%Y-%m") == period:
+                    covered.add(day)
+                    day += timedelta(days=1)
+        if not covered:
+            return []
+
+        gaps = []
+        day, last = min(covered), max(covered)
+        while day <= last:
+            if day not in covered:
+                gap_start = day
+                while day + timedelta(days=1) not in covered:
+                    day += timedelta(days=1)
+                gaps.append((gap_start.isoformat(), day.isoformat()))
+            day += timedelta(days=1)
+        return gaps
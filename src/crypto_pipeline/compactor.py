@@ -0,0 +1,165 @@
+import os
+import time
+import zipfile
+from collections import defaultdict
+from typing import Dict, List, Optional
+from rich.console import Console
+from .catalog import TIME_COLUMN, FileCatalog, open_catalog
+from .config import AppConfig
+from .periods import archive_period, compacted_path, superseded_daily
+from .sink import relative_key, sink_for
+from .stream import STREAM_COLUMNS
+from .timeutils import next_month_ms, normalize_ms_sql, to_epoch_ms
+
+DAY_MS = 86_400_000
+
+
+class Compactor:
+    """
+    Merges the daily CSVs of closed months into one Parquet file per month.
+
+    A month is closed `compact_grace_days` after it ended, so archives
+    published late are still part of it. Its daily CSVs are rewritten by
+    DuckDB into `<SYMBOL>-<frequency>-YYYY-MM.parquet` next to them (zstd,
+    sorted by time, the CSV columns). Days arriving after a month was
+    compacted are merged into its file later, replacing any rows of the
+    same days. The catalog records the days in every Parquet file, which
+    takes over the verified and loaded flags of its sources, so nothing is
+    verified or loaded again; with a sink it replaces them there too. The
+    daily CSVs are then deleted, or zipped per month into
+    compact_archive_dir (`compact_retention`). Extraction, planning and the
+    daemon treat compacted days as present.
+
+    Usage:
+        Compactor().compact(["BTCUSDT"], config)
+    """
+
+    def __init__(self):
+        self.console = Console()
+
+    def archive_dir(self, config: AppConfig) -> str:
+        return config.compact_archive_dir or os.path.join(config.destination_dir, "archive")
+
+    def local_symbols(self, config: AppConfig) -> List[str]:
+        """Symbols with a directory of this dataset under destination_dir."""
+        root = os.path.join(config.destination_dir, config.asset_type)
+        if not os.path.isdir(root):
+            return []
+        return sorted(name for name in os.listdir(root) if os.path.isdir(config.dataset_dir(name)))
+
+    def compact(self, symbols: List[str], config: AppConfig, now_ms: Optional[int] = None) -> int:
+        """Compact the closed months of every symbol. Returns the number of Parquet files written."""
+        if config.data_type not in STREAM_COLUMNS:
+            self.console.print(f"[yellow]Compaction is not supported for {config.data_type}. Skipping.[/]")
+            return 0
+        now_ms = now_ms if now_ms is not None else int(time.time() * 1000)
+        cutoff = now_ms - config.compact_grace_days * DAY_MS
+        catalog = open_catalog(config)
+
+        written = retired = 0
+        for symbol in sorted(symbols):
+            directory = config.dataset_dir(symbol)
+            catalog.sync(directory, config.data_type)
+            entries = catalog.files(directory)
+            by_path = {entry["path"]: entry for entry in entries}
+            superseded = set(superseded_daily(list(by_path)))
+
+            months: Dict[str, List[Dict]] = defaultdict(list)
+            for entry in entries:
+                target = compacted_path(entry["path"])
+                if target and entry["path"].endswith(".csv") and entry["path"] not in superseded:
+                    months[target].append(entry)
+            for target, daily in sorted(months.items()):
+                if next_month_ms(to_epoch_ms(f"{archive_period(target)}-01")) > cutoff:
+                    continue
+                try:
+                    written += self._compact_month(target, daily, by_path.get(target), catalog, config)
+                    retired += len(daily)
+                except Exception as e:
+                    self.console.print(f"[bold red]Error compacting {os.path.basename(target)}: {e}[/]")
+            catalog.touch_dir(directory)
+
+        if retired:
+            self.console.print(f"[bold green]Compacted {retired} daily files into {written} monthly Parquet files.[/]")
+        return written
+
+    def _compact_month(self, target: str, daily: List[Dict], existing: Optional[Dict],
+                       catalog: FileCatalog, config: AppConfig) -> int:
+        """Merge the daily CSVs of one month into `target` and retire them. Returns 1 if it was written."""
+        # Days already merged into the Parquet file are left over from an interrupted compaction
+        new = [entry for entry in daily if not catalog.is_compacted(entry["path"])]
+        if new:
+            sources = new + ([existing] if existing else [])
+            counts = {entry["columns"] for entry in sources}
+            if len(counts) != 1 or None in counts:
+                raise ValueError(f"column counts differ: {sorted(counts, key=str)}")
+            self._write_parquet(target, new, existing is not None, counts.pop(), config)
+            catalog.add_file(target, config.data_type)
+            catalog.add_compacted(target, [archive_period(entry["path"]) for entry in new])
+            catalog.mark([target], verified=int(all(entry["verified"] for entry in sources)),
+                         loaded=int(all(entry["loaded"] for entry in sources)))
+            sink = sink_for(config)
+            if sink is not None:
+                sink.upload_file(relative_key(target, config), target)
+
+        paths = [entry["path"] for entry in daily]
+        self._retire(paths, target, config)
+        catalog.remove(paths)
+        return 1 if new else 0
+
+    def _write_parquet(self, target: str, entries: List[Dict], merge: bool, columns: int, config: AppConfig) -> None:
+        """Write the rows of the CSVs, plus those of `target` when merging, sorted by time."""
+        import duckdb
+        schema = list(STREAM_COLUMNS[config.data_type].items())[:columns]
+        # Trailing columns without a known name (e.g. is_best_match of spot trades) are kept as text
+        schema += [(f"column{i}", "VARCHAR") for i in range(len(schema), columns)]
+        columns_sql = ", ".join(f"'{name}': '{dtype}'" for name, dtype in schema)
+
+        groups = {True: [], False: []}
+        for entry in entries:
+            groups[bool(entry["has_header"])].append(entry["path"].replace("\\", "/"))
+        selects = []
+        for header, paths in groups.items():
+            if paths:
+                files_sql = ", ".join(f"'{path}'" for path in paths)
+                selects.append(f"SELECT * FROM read_csv([{files_sql}], header={header}, columns={{{columns_sql}}})")
+        time_column = schema[TIME_COLUMN[config.data_type]][0]
+        posix_target = target.replace("\\", "/")
+        if merge:
+            # The days being added replace any rows of theirs already compacted
+            time_sql = normalize_ms_sql(f'"{time_column}"')
+            days = [to_epoch_ms(archive_period(entry["path"])) for entry in entries]
+            replaced = " OR ".join(f"{time_sql} BETWEEN {day} AND {day + DAY_MS - 1}" for day in days)
+            selects.append(f"SELECT * FROM read_parquet('{posix_target}') WHERE NOT ({replaced})")
+
+        tmp_path = f"{target}.tmp"
+        con = duckdb.connect()
+        try:
+            con.execute(f"""
+                COPY ({" UNION ALL BY NAME ".join(selects)} ORDER BY "{time_column}")
+                TO '{posix_target}.tmp' (FORMAT PARQUET, COMPRESSION ZSTD)
+            """)
+        finally:
+            con.close()
+        os.replace(tmp_path, target)
+
+    def _retire(self, paths: List[str], target: str, config: AppConfig) -> None:
+        """Delete compacted daily CSVs, locally and in the sink, zipping them first when archiving."""
+        if config.compact_retention == "archive":
+            key = relative_key(target, config)[:-len(".parquet")]
+            archive_path = os.path.join(self.archive_dir(config), *key.split("/")) + ".zip"
+            os.makedirs(os.path.dirname(archive_path), exist_ok=True)
+            with zipfile.ZipFile(archive_path, "a", compression=zipfile.ZIP_DEFLATED) as archive:
+                archived = set(archive.namelist())
+                for path in paths:
+                    if os.path.exists(path) and os.path.basename(path) not in archived:
+                        archive.write(path, os.path.basename(path))
+
+        sink = sink_for(config)
+        for path in paths:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            if sink is not None:
+                sink.delete(relative_key(path, config))
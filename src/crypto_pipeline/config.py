@@ -1,15 +1,18 @@
+import os
+from itertools import product
 from pydantic import BaseModel, Field, field_validator, model_validator
-from typing import List, Optional, Literal
+from typing import List, Optional, Literal, Union
 
 class AppConfig(BaseModel):
     """Application configuration model."""
     asset_type: Literal["spot", "um", "cm", "option"] = Field(..., description="Asset type: spot, um, cm, option")
-    time_period: Literal["daily", "monthly"] = Field(..., description="Time period: daily or monthly")
+    time_period: Literal["daily", "monthly", "hybrid"] = Field(..., description="Time period: daily, monthly, or hybrid (monthly archives for complete months, daily for the rest)")
     data_type: str = Field(..., description="Data type: klines, trades, etc.")
     data_frequency: Optional[str] = Field(None, description="Data frequency: 1m, 1h, 1d, etc. (Optional for trades)")
     destination_dir: str = Field("./binance_data", description="Directory to save downloaded data")
     max_workers: int = Field(50, description="Max workers for downloading")
     max_extract_workers: int = Field(10, description="Max workers for extraction")
+    extract_mode: Literal["thread", "process"] = Field("thread", description="Extract in threads, or in max_extract_workers processes to use all cores for inflating and parsing")
     symbol_suffix: Optional[List[str]] = Field(None, description="Filter symbols by suffix (e.g., USDT)")
     batch_number: int = Field(1, description="Current batch number")
     total_batches: int = Field(1, description="Total number of batches")
@@ -17,6 +20,35 @@ class AppConfig(BaseModel):
     fetch_method: Literal["api", "xml", "json"] = Field("api", description="Method to fetch symbols: api, xml, or json")
     symbol_file: Optional[str] = Field(None, description="Path to JSON file containing symbols (required if fetch_method is json)")
     db_path: Optional[str] = Field(None, description="Path to DuckDB database file (optional)")
+    schema_check: Literal["archive", "api", "off"] = Field("archive", description="Schema check: archive fingerprints (default), live REST API, or off")
+    schema_cache_ttl_hours: float = Field(24.0, description="How long a cached schema fingerprint is trusted")
+    mmap_cache_dir: Optional[str] = Field(None, description="Directory of the memory-mapped kline cache refreshed after each load (optional)")
+    derive_from: Optional[str] = Field(None, description="Derive klines from this loaded finer interval (e.g. 1m) instead of downloading them")
+    bars: Optional[List[str]] = Field(None, description="Bars aggregated from aggTrades while extracting, e.g. ['time:1m', 'volume:100', 'dollar:1000000']")
+    keep_raw_trades: bool = Field(False, description="Keep extracted aggTrades CSVs after they were aggregated into bars")
+    catalog_path: Optional[str] = Field(None, description="SQLite file catalog of extracted files (default: catalog.sqlite in destination_dir)")
+    cache_dir: Optional[str] = Field(None, description="Shared archive cache directory consulted before downloading (optional)")
+    cache_max_gb: float = Field(50.0, description="Size limit of the shared archive cache, least recently used archives are evicted")
+    bandwidth_mbps: Optional[float] = Field(None, description="Link bandwidth in Mbit/s assumed by plan estimates (measured on one archive if unset)")
+    max_bandwidth_mbps: Optional[float] = Field(None, gt=0, description="Global download rate limit in Mbit/s shared by all workers (unlimited if unset)")
+    download_order: Literal["listing", "newest", "largest"] = Field("listing", description="Download order: as listed, most recent periods first, or largest archives first")
+    tail_sync: bool = Field(False, description="After loading, top up klines from the REST API up to now; archives replace these rows once published")
+    rest_base_url: Optional[str] = Field(None, description="REST API base URL used by tail sync (default: the Binance API of asset_type)")
+    rest_weight_per_minute: int = Field(1200, gt=0, description="REST request weight budget per minute shared by all tail sync requests")
+    features: Optional[List[str]] = Field(None, description="Kline features materialized after each load, e.g. ['ret:60', 'rvol:60', 'atr:14', 'vol_z:60', 'cum_volume']")
+    sink_url: Optional[str] = Field(None, description="Object store receiving extracted files with the local layout, e.g. s3://bucket/prefix (credentials from AWS_ACCESS_KEY_ID/AWS_SECRET_ACCESS_KEY)")
+    s3_endpoint_url: Optional[str] = Field(None, description="S3-compatible endpoint, e.g. http://localhost:9000 for MinIO (default: AWS in s3_region)")
+    s3_region: str = Field("us-east-1", description="Region used to sign S3 requests")
+    upload_part_mb: float = Field(16.0, ge=5, description="Multipart upload part size in MiB; larger objects are uploaded in parallel parts")
+    upload_workers: int = Field(8, gt=0, description="Parts uploaded concurrently per object, also the number of parts buffered")
+    compact: bool = Field(False, description="After loading, merge the daily CSVs of closed months into one Parquet file per month")
+    compact_grace_days: int = Field(3, ge=0, description="Days after a month ends before it is compacted, so late archives are still merged in")
+    compact_retention: Literal["delete", "archive"] = Field("delete", description="Compacted daily CSVs are deleted, or zipped per month into compact_archive_dir")
+    compact_archive_dir: Optional[str] = Field(None, description="Directory of the zipped daily CSVs kept by compact_retention 'archive' (default: archive in destination_dir)")
+    profile_dir: Optional[str] = Field(None, description="Write a CPU and memory profile of every pipeline stage to this directory (profiling is off if unset)")
+    poll_interval_seconds: float = Field(300.0, gt=0, description="Daemon mode: seconds between polls for newly published archives")
+    symbols_refresh_seconds: float = Field(3600.0, gt=0, description="Daemon mode: seconds a fetched symbol list is reused")
+    health_port: Optional[int] = Field(None, description="Daemon mode: local port of the /health and /metrics endpoint (disabled if unset)")
     
     @field_validator('asset_type')
     def validate_asset_type(cls, v):
@@ -26,11 +58,11 @@ class AppConfig(BaseModel):
 
     @field_validator('time_period')
     def validate_time_period(cls, v, info):
-        if v not in ["daily", "monthly"]:
-            raise ValueError("time_period must be one of 'daily', 'monthly'")
+        if v not in ["daily", "monthly", "hybrid"]:
+            raise ValueError("time_period must be one of 'daily', 'monthly', 'hybrid'")
         
         # Check if asset_type is available in validation info
-        if info.data.get('asset_type') == 'option' and v == 'monthly':
+        if info.data.get('asset_type') == 'option' and v in ('monthly', 'hybrid'):
              raise ValueError("Option data is only available for 'daily' time period.")
         return v
         
@@ -40,6 +72,68 @@ class AppConfig(BaseModel):
              raise ValueError(f"data_frequency is required for {self.data_type} data type.")
         return self
 
+    @model_validator(mode='after')
+    def check_derivable(self):
+        if self.derive_from:
+            from .timeutils import is_derivable
+            if self.data_type != "klines":
+                raise ValueError("derive_from is only supported for klines.")
+            if not is_derivable(self.data_frequency, self.derive_from):
+                raise ValueError(f"{self.data_frequency} klines cannot be derived from {self.derive_from} klines.")
+            if not self.db_path:
+                raise ValueError("derive_from requires db_path.")
+        return self
+
+    @model_validator(mode='after')
+    def check_bars(self):
+        if self.bars:
+            from .bars import parse_bar_spec
+            if self.data_type != "aggTrades":
+                raise ValueError("bars can only be aggregated from aggTrades.")
+            if not self.db_path:
+                raise ValueError("bars require db_path.")
+            for spec in self.bars:
+                parse_bar_spec(spec)
+        return self
+
+    @model_validator(mode='after')
+    def check_features(self):
+        if self.features:
+            from .features import parse_feature_spec
+            if self.data_type != "klines":
+                raise ValueError("features are only supported for klines.")
+            if not self.db_path:
+                raise ValueError("features require db_path.")
+            for spec in self.features:
+                parse_feature_spec(spec)
+        return self
+
+    @model_validator(mode='after')
+    def check_tail_sync(self):
+        if self.tail_sync:
+            if self.data_type != "klines":
+                raise ValueError("tail_sync is only supported for klines.")
+            if not self.db_path:
+                raise ValueError("tail_sync requires db_path.")
+        return self
+
+    @model_validator(mode='after')
+    def check_compact(self):
+        if self.compact and self.data_type not in ("klines", "aggTrades", "trades"):
+            raise ValueError("compact is only supported for klines, aggTrades and trades.")
+        return self
+
+    @property
+    def dataset_key(self) -> str:
+        """Short identifier of the dataset, e.g. spot/klines/1m."""
+        return "/".join(p for p in (self.asset_type, self.data_type, self.data_frequency) if p)
+
+    def dataset_dir(self, symbol: str) -> str:
+        """Local directory holding the extracted files of a symbol."""
+        if self.data_frequency:
+            return os.path.join(self.destination_dir, self.asset_type, symbol, self.data_frequency)
+        return os.path.join(self.destination_dir, self.asset_type, symbol, self.data_type)
+
     @classmethod
     def from_yaml(cls, path: str):
         """Load configuration from a YAML file."""
@@ -47,3 +141,55 @@ class AppConfig(BaseModel):
         with open(path, 'r') as f:
             data = yaml.safe_load(f)
         return cls(**data)
+
+
+class JobConfig(BaseModel):
+    """
+    Multi-dataset job specification.
+
+    Every entry of `datasets` is merged on top of `defaults`. List values for
+    asset_type, data_type or data_frequency expand into one dataset per
+    combination, so `{asset_type: [spot, um], data_frequency: [1m, 1h]}`
+    describes four datasets.
+    """
+    datasets: List[AppConfig] = Field(..., description="Datasets processed by the job")
+    max_workers: int = Field(50, description="Global download concurrency budget shared by all datasets")
+    max_extract_workers: int = Field(10, description="Global extraction workers shared by all datasets")
+    profile_dir: Optional[str] = Field(None, description="Write a CPU and memory profile of every job stage to this directory (profiling is off if unset)")
+
+    @model_validator(mode='before')
+    @classmethod
+    def expand_datasets(cls, data):
+        if not isinstance(data, dict):
+            return data
+        defaults = data.get('defaults') or {}
+        expanded = []
+        for entry in data.get('datasets') or []:
+            if isinstance(entry, AppConfig):
+                expanded.append(entry)
+                continue
+            merged = {**defaults, **entry}
+            axes = {k: merged[k] for k in ('asset_type', 'data_type', 'data_frequency') if isinstance(merged.get(k), list)}
+            for values in product(*axes.values()):
+                expanded.append({**merged, **dict(zip(axes.keys(), values))})
+        if not expanded:
+            raise ValueError("A job needs at least one dataset.")
+        return {k: v for k, v in data.items() if k != 'defaults'} | {'datasets': expanded}
+
+    @classmethod
+    def from_yaml(cls, path: str):
+        """Load a job specification from a YAML file."""
+        import yaml
+        with open(path, 'r') as f:
+            data = yaml.safe_load(f)
+        return cls(**data)
+
+
+def load_config(path: str) -> Union[AppConfig, JobConfig]:
+    """Load a YAML file describing either a single dataset or a multi-dataset job."""
+    import yaml
+    with open(path, 'r') as f:
+        data = yaml.safe_load(f)
+    if isinstance(data, dict) and 'datasets' in data:
+        return JobConfig(**data)
+    return AppConfig(**data)
@@ -0,0 +1,263 @@
+import json
+import os
+import threading
+import time
+import requests
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple, Union
+from requests.adapters import HTTPAdapter
+from rich.console import Console
+from .catalog import open_catalog
+from .config import AppConfig
+from .downloader import Downloader
+from .journal import RunJournal, default_journal_path
+from .periods import select_hybrid
+from .pipeline import Pipeline
+from .schema_monitor import SchemaMonitor
+from .symbol_fetcher import SymbolFetcher
+
+
+class Daemon:
+    """
+    Long-running pipeline that loads archives shortly after they are published.
+
+    One process keeps the HTTP connection pool, the symbol list (refreshed
+    every `symbols_refresh_seconds`) and one DuckDB connection to `db_path`
+    warm. DuckDB admits one writing process per database file, so other
+    processes cannot open the database while the daemon runs. Every
+    `poll_interval_seconds` each listing prefix is polled only after the
+    newest key seen so far (S3 `marker`), so a poll costs one short request
+    per prefix. New archives go through download, extraction, verification
+    and loading, and the tail sync runs when configured. Failed archives are
+    retried on the next poll, once even if listed again. The first poll
+    lists everything and skips archives whose CSV is already on disk.
+
+    With `health_port`, GET /health answers 200 while polls succeed and
+    GET /metrics serves counters in the Prometheus text format, on
+    127.0.0.1 only.
+
+    Usage:
+        Daemon({"asset_type": "spot", "time_period": "daily", ...}).run()
+    """
+
+    def __init__(self, config: Union[AppConfig, Dict, str]):
+        self.console = Console()
+        self.pipeline = Pipeline(config)
+        self.config = self.pipeline.config
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=self.config.max_workers)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.pipeline.fetcher = SymbolFetcher(self.session)
+        self.pipeline.downloader = Downloader(self.session)
+        self.pipeline.schema_monitor = SchemaMonitor(self.session)
+        if self.pipeline.tail_syncer is not None:
+            self.pipeline.tail_syncer.http = self.session
+
+        # Newest key listed per prefix, and archives to retry on the next poll
+        self.markers: Dict[str, str] = {}
+        self.retry: List[str] = []
+        self.symbols_fetched_at = 0.0
+        self.metrics: Dict[str, float] = {
+            "polls_total": 0,
+            "poll_errors_total": 0,
+            "archives_found_total": 0,
+            "archives_failed_total": 0,
+            "last_poll_timestamp": 0,
+            "last_poll_seconds": 0,
+            "last_success_timestamp": 0,
+            "symbols": 0,
+        }
+        self.server: Optional[ThreadingHTTPServer] = None
+        self.con = None
+        self._stop = threading.Event()
+
+    def run(self, max_polls: Optional[int] = None):
+        """Poll until stopped (Ctrl+C), or `max_polls` times."""
+        self.console.print(f"[bold green]Starting daemon for {self.config.dataset_key}, "
+                           f"polling every {self.config.poll_interval_seconds:.0f}s[/]")
+        os.makedirs(self.config.destination_dir, exist_ok=True)
+        if self.config.health_port is not None:
+            self.start_server(self.config.health_port)
+        polls = 0
+        try:
+            while not self._stop.is_set():
+                started = time.monotonic()
+                self.poll()
+                polls += 1
+                if max_polls is not None and polls >= max_polls:
+                    break
+                self._stop.wait(max(0.0, self.config.poll_interval_seconds - (time.monotonic() - started)))
+        except KeyboardInterrupt:
+            self.console.print("[yellow]Daemon interrupted.[/]")
+        finally:
+            self.stop()
+
+    def stop(self):
+        self._stop.set()
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+        if self.con is not None:
+            self.con.close()
+            self.con = None
+
+    def database(self):
+        """The daemon's DuckDB connection to config.db_path, opened on first use; None without a database."""
+        if self.con is None and self.config.db_path:
+            import duckdb
+            self.con = duckdb.connect(self.config.db_path)
+        return self.con
+
+    def poll(self) -> int:
+        """Load the archives published since the last poll. Returns how many were found."""
+        started = time.monotonic()
+        self.metrics["polls_total"] += 1
+        self.metrics["last_poll_timestamp"] = time.time()
+        try:
+            found = self._poll()
+            self.metrics["last_success_timestamp"] = time.time()
+            return found
+        except Exception as e:
+            self.metrics["poll_errors_total"] += 1
+            self.console.print(f"[bold red]Poll failed: {e}[/]")
+            return 0
+        finally:
+            self.metrics["last_poll_seconds"] = time.monotonic() - started
+
+    def _poll(self) -> int:
+        pipeline = self.pipeline
+        if not pipeline.schema_monitor.check_schema(self.config):
+            raise RuntimeError("schema mismatch")
+        symbols = self.symbols()
+        if not symbols:
+            raise RuntimeError("no symbols found")
+
+        listed, markers = self.list_new(symbols)
+        retried = set(self.retry)
+        new_urls = self.retry + [url for url in listed if url not in retried]
+        self.metrics["archives_found_total"] += len(new_urls)
+        changed = sorted({pipeline.symbol_from_url(url) for url in new_urls})
+        if new_urls:
+            self.console.print(f"[blue]{len(new_urls)} new archives for {len(changed)} symbols[/]")
+            pipeline.journal = RunJournal(default_journal_path(self.config))
+            journal_path = pipeline.journal.path
+            try:
+                pipeline.journal.record_listing(changed, new_urls)
+                pipeline._transfer(new_urls)
+                pipeline._finalize(changed, self.database())
+            finally:
+                pipeline._close_journal()
+            self.retry = RunJournal.replay(journal_path).failed()
+            self.metrics["archives_failed_total"] += len(self.retry)
+        # Only advance past keys once they went through the pipeline
+        self.markers.update(markers)
+
+        if pipeline.tail_syncer is not None:
+            # Symbols with new archives were synced by _finalize
+            unchanged = [symbol for symbol in symbols if symbol not in set(changed)]
+            if unchanged:
+                pipeline.tail_syncer.sync(unchanged, self.config, con=self.database())
+        return len(new_urls)
+
+    def symbols(self) -> List[str]:
+        """Symbols of the batch, refetched every symbols_refresh_seconds."""
+        fetcher = self.pipeline.fetcher
+        if time.monotonic() - self.symbols_fetched_at > self.config.symbols_refresh_seconds:
+            fetcher.clear_cache()
+            self.symbols_fetched_at = time.monotonic()
+        symbols = fetcher.get_symbols_cached(self.config)
+        batch = self.pipeline.select_batch(symbols) if symbols else []
+        self.metrics["symbols"] = len(batch)
+        return batch
+
+    def prefixes(self, symbols: List[str]) -> Dict[str, str]:
+        """Listing prefix -> symbol; hybrid polls the monthly and the daily prefix."""
+        downloader = self.pipeline.downloader
+        periods = ["monthly", "daily"] if self.config.time_period == "hybrid" else [self.config.time_period]
+        return {prefix: symbol
+                for period in periods
+                for symbol, prefix in zip(symbols, downloader.get_prefixes(symbols, self.config, period))}
+
+    def list_new(self, symbols: List[str]) -> Tuple[List[str], Dict[str, str]]:
+        """URLs listed after the newest known key of every prefix, and the new newest keys."""
+        downloader = self.pipeline.downloader
+        prefixes = self.prefixes(symbols)
+        markers: Dict[str, str] = {}
+
+        def list_prefix(prefix: str) -> List[str]:
+            marker = self.markers.get(prefix)
+            objects = downloader._fetch_objects_for_prefix(prefix, self.config, marker=marker)
+            urls = [url for url, _ in objects]
+            if urls:
+                markers[prefix] = max(url[len(downloader.download_base_url) + 1:] for url in urls)
+            if marker is None:
+                # First poll: only what is not extracted (or compacted) yet
+                directory = self.config.dataset_dir(prefixes[prefix])
+                catalog = open_catalog(self.config)
+                csv_paths = {url: os.path.join(directory, os.path.basename(url)[:-4] + ".csv") for url in urls}
+                urls = [url for url, path in csv_paths.items()
+                        if not os.path.exists(path) and not catalog.is_compacted(path)]
+            return urls
+
+        with ThreadPoolExecutor(max_workers=self.config.max_workers) as executor:
+            listings = dict(zip(prefixes, executor.map(list_prefix, prefixes)))
+        if self.config.time_period != "hybrid":
+            return [url for urls in listings.values() for url in urls], markers
+
+        # Daily archives of months that also have a monthly archive are not needed
+        monthly = {prefixes[p]: urls for p, urls in listings.items() if "/monthly/" in p}
+        daily = {prefixes[p]: urls for p, urls in listings.items() if "/daily/" in p}
+        return [url for symbol in symbols
+                for url, _ in select_hybrid([(u, 0) for u in monthly.get(symbol, [])],
+                                            [(u, 0) for u in daily.get(symbol, [])])], markers
+
+    def start_server(self, port: int) -> int:
+        """Serve /health and /metrics on 127.0.0.1. Returns the bound port."""
+        daemon = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path == "/health":
+                    healthy = daemon.healthy()
+                    body = json.dumps({"status": "ok" if healthy else "stale", **daemon.metrics}).encode()
+                    self._reply(200 if healthy else 503, "application/json", body)
+                elif self.path == "/metrics":
+                    self._reply(200, "text/plain; version=0.0.4", daemon.render_metrics().encode())
+                else:
+                    self._reply(404, "text/plain", b"not found\n")
+
+            def _reply(self, status: int, content_type: str, body: bytes):
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.console.print(f"[blue]Health and metrics on http://127.0.0.1:{self.server.server_port}/[/]")
+        return self.server.server_port
+
+    def healthy(self) -> bool:
+        """Whether the last successful poll is at most two poll intervals old."""
+        if not self.metrics["last_success_timestamp"]:
+            # Starting up: healthy until a poll fails
+            return not self.metrics["poll_errors_total"]
+        deadline = 2 * self.config.poll_interval_seconds + self.metrics["last_poll_seconds"]
+        return time.time() - self.metrics["last_success_timestamp"] <= deadline
+
+    def render_metrics(self) -> str:
+        lines = []
+        for name, value in self.metrics.items():
+            metric = f"crypto_pipeline_{name}"
+            kind = "counter" if name.endswith("_total") else "gauge"
+            lines.append(f"# TYPE {metric} {kind}")
+            lines.append(f'{metric}{{dataset="{self.config.dataset_key}"}} {value}')
+        return "\n".join(lines) + "\n"
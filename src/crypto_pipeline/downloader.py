@@ -1,25 +1,39 @@
 import requests
 import os
-from typing import List
+import threading
+from typing import Callable, Dict, List, Optional, Tuple
 from concurrent.futures import ThreadPoolExecutor, as_completed
 from rich.progress import Progress, TaskID
 from rich.console import Console
 from xml.etree import ElementTree
 from .config import AppConfig
 from .interfaces import IDownloader
+from .periods import select_hybrid
+from .scheduler import TokenBucket
+from .zip_cache import ZipCache
 
 class Downloader(IDownloader):
     """Handles downloading of files."""
     
-    def __init__(self):
+    def __init__(self, session: Optional[requests.Session] = None):
         self.console = Console()
+        # A shared Session keeps connection pools warm across datasets
+        self.http = session if session is not None else requests
         self.s3_base_url = "https://s3-ap-northeast-1.amazonaws.com/data.binance.vision"
         self.download_base_url = "https://data.binance.vision"
+        self._caches: Dict[str, ZipCache] = {}
+        self._limiters: Dict[float, TokenBucket] = {}
+        self._cache_lock = threading.Lock()
 
-    def _fetch_urls_for_prefix(self, prefix: str, config: AppConfig) -> List[str]:
-        """Fetch download URLs for a single prefix with retries."""
+    def _fetch_objects_for_prefix(self, prefix: str, config: AppConfig,
+                                  on_page: Optional[Callable[[List[Tuple[str, int]]], None]] = None,
+                                  marker: Optional[str] = None) -> List[Tuple[str, int]]:
+        """
+        Fetch (download URL, size in bytes) of every archive under a prefix, with retries.
+        `on_page` receives the archives of each listing page as soon as it is parsed.
+        With `marker` only keys sorting after it are listed, e.g. archives newer than a known one.
+        """
         download_urls = []
-        marker = None
         while True:
             params = {"prefix": prefix, "max-keys": 1000}
             if marker:
@@ -27,7 +41,7 @@ class Downloader(IDownloader):
 
             for attempt in range(config.retries + 1):
                 try:
-                    response = requests.get(self.s3_base_url, params=params)
+                    response = self.http.get(self.s3_base_url, params=params)
                     response.raise_for_status()
                     break
                 except requests.exceptions.RequestException as e:
@@ -48,45 +62,87 @@ class Downloader(IDownloader):
             if not contents:
                 contents = tree.findall(".//Contents")
 
+            last_key = None
+            page = []
             for content in contents:
                 key_element = content.find("./s3:Key", namespaces=namespace)
                 if key_element is None:
                     key_element = content.find("./Key")
+                size_element = content.find("./s3:Size", namespaces=namespace)
+                if size_element is None:
+                    size_element = content.find("./Size")
+                if key_element is not None:
+                    last_key = key_element.text
                 if key_element is not None and key_element.text.endswith(".zip"):
-                    download_urls.append(f"{self.download_base_url}/{key_element.text}")
+                    size = int(size_element.text) if size_element is not None and size_element.text else 0
+                    page.append((f"{self.download_base_url}/{key_element.text}", size))
+            download_urls.extend(page)
+            if on_page is not None and page:
+                on_page(page)
 
             marker_element = tree.find(".//s3:NextMarker", namespaces=namespace)
             if marker_element is None:
                 marker_element = tree.find(".//NextMarker")
+            truncated_element = tree.find(".//s3:IsTruncated", namespaces=namespace)
+            if truncated_element is None:
+                truncated_element = tree.find(".//IsTruncated")
             
             if marker_element is not None and marker_element.text:
                 marker = marker_element.text
+            elif truncated_element is not None and truncated_element.text == "true" and last_key:
+                # Without a delimiter S3 omits NextMarker; continue after the last key
+                marker = last_key
             else:
                 break
 
         return download_urls
 
+    def get_prefixes(self, symbols: List[str], config: AppConfig, time_period: Optional[str] = None) -> List[str]:
+        """Build the S3 listing prefix of every symbol (for `time_period`, default config.time_period)."""
+        time_period = time_period or config.time_period
+        if config.asset_type == "spot":
+            base_prefix = f"data/spot/{time_period}/{config.data_type}/"
+        elif config.asset_type == "option":
+            base_prefix = f"data/option/{time_period}/{config.data_type}/"
+        else:
+            base_prefix = f"data/futures/{config.asset_type}/{time_period}/{config.data_type}/"
+
+        if config.data_frequency:
+            return [f"{base_prefix}{symbol}/{config.data_frequency}/" for symbol in symbols]
+        return [f"{base_prefix}{symbol}/" for symbol in symbols]
+
+    def list_objects(self, symbol: str, config: AppConfig,
+                     on_page: Optional[Callable[[List[Tuple[str, int]]], None]] = None) -> List[Tuple[str, int]]:
+        """
+        List (download URL, size) of the archives of one symbol.
+
+        In hybrid mode monthly archives cover complete months and daily
+        archives only the months without a monthly file. `on_page` receives
+        archives as listing pages arrive (monthly pages right away, daily
+        ones once they could be checked against the monthly listing).
+        """
+        if config.time_period != "hybrid":
+            return self._fetch_objects_for_prefix(self.get_prefixes([symbol], config)[0], config, on_page)
+        monthly = self._fetch_objects_for_prefix(self.get_prefixes([symbol], config, "monthly")[0], config, on_page)
+        daily = self._fetch_objects_for_prefix(self.get_prefixes([symbol], config, "daily")[0], config)
+        selected = select_hybrid(monthly, daily)
+        if on_page is not None and len(selected) > len(monthly):
+            on_page(selected[len(monthly):])
+        return selected
+
+    def list_urls(self, symbol: str, config: AppConfig) -> List[str]:
+        """List the download URLs of one symbol."""
+        return [url for url, _ in self.list_objects(symbol, config)]
+
     def download(self, symbols: List[str], config: AppConfig) -> List[str]:
         """Fetch download URLs in batches."""
         self.console.print(f"[blue]Fetching URLs for {len(symbols)} symbols...[/]")
         download_urls = []
-        
-        if config.asset_type == "spot":
-            base_prefix = f"data/spot/{config.time_period}/{config.data_type}/"
-        elif config.asset_type == "option":
-            base_prefix = f"data/option/{config.time_period}/{config.data_type}/"
-        else:
-            base_prefix = f"data/futures/{config.asset_type}/{config.time_period}/{config.data_type}/"
 
         with Progress() as progress:
             task = progress.add_task("[cyan]Fetching URLs...", total=len(symbols))
             with ThreadPoolExecutor(max_workers=config.max_workers) as executor:
-                if config.data_frequency:
-                    futures = [executor.submit(self._fetch_urls_for_prefix, f"{base_prefix}{symbol}/{config.data_frequency}/", config) 
-                              for symbol in symbols]
-                else:
-                    futures = [executor.submit(self._fetch_urls_for_prefix, f"{base_prefix}{symbol}/", config) 
-                              for symbol in symbols]
+                futures = [executor.submit(self.list_urls, symbol, config) for symbol in symbols]
 
                 for future in as_completed(futures):
                     download_urls.extend(future.result())
@@ -94,14 +150,131 @@ class Downloader(IDownloader):
 
         return download_urls
 
+    def cache_for(self, config: AppConfig) -> Optional[ZipCache]:
+        """Shared archive cache configured by config.cache_dir, if any."""
+        if not config.cache_dir:
+            return None
+        with self._cache_lock:
+            cache = self._caches.get(config.cache_dir)
+            if cache is None:
+                cache = ZipCache(config.cache_dir, int(config.cache_max_gb * 1024**3))
+                self._caches[config.cache_dir] = cache
+            return cache
+
+    def limiter_for(self, config: AppConfig) -> Optional[TokenBucket]:
+        """Bandwidth budget of config.max_bandwidth_mbps, shared by every dataset with the same limit."""
+        if not config.max_bandwidth_mbps:
+            return None
+        with self._cache_lock:
+            limiter = self._limiters.get(config.max_bandwidth_mbps)
+            if limiter is None:
+                limiter = TokenBucket(config.max_bandwidth_mbps * 1_000_000 / 8)
+                self._limiters[config.max_bandwidth_mbps] = limiter
+            return limiter
+
+    def report_cache(self, config: AppConfig) -> None:
+        """Print hit and miss counts of the shared archive cache."""
+        cache = self.cache_for(config)
+        if cache is None:
+            return
+        stats = cache.stats()
+        self.console.print(f"[blue]Archive cache: {stats['hits']} hits, {stats['misses']} misses, "
+                           f"{stats['bytes_saved'] / 1024**2:.1f} MB not downloaded, "
+                           f"{stats['size'] / 1024**3:.2f} GB cached[/]")
+
     def download_file(self, url: str, dest_path: str, config: AppConfig) -> bytes:
-        """Download a single file and return content."""
+        """Download a single file and return content, going through the shared cache when configured."""
+        cache = self.cache_for(config)
+        checksum = None
+        if cache is not None:
+            checksum = self.upstream_checksum(url)
+            content = cache.get(url, checksum)
+            if content is not None:
+                return content
+
+        limiter = self.limiter_for(config)
+        for attempt in range(config.retries + 1):
+            try:
+                if limiter is None:
+                    response = self.http.get(url)
+                    response.raise_for_status()
+                    content = response.content
+                else:
+                    content = self._get_limited(url, limiter)
+                if cache is not None:
+                    try:
+                        cache.put(url, content, checksum)
+                    except OSError as e:
+                        self.console.print(f"[yellow]Could not cache {url}: {e}[/]")
+                return content
+            except requests.exceptions.RequestException as e:
+                if attempt == config.retries:
+                    self.console.print(f"[bold red]Failed to download {url}: {e}[/]")
+                    raise
+
+    def download_to(self, url: str, dest_path: str, config: AppConfig) -> None:
+        """
+        Download a single file straight to dest_path, in chunks, going through
+        the shared cache when configured. dest_path only appears once complete.
+        """
+        cache = self.cache_for(config)
+        checksum = None
+        if cache is not None:
+            checksum = self.upstream_checksum(url)
+            if cache.get_file(url, dest_path, checksum):
+                return
+
+        limiter = self.limiter_for(config)
         for attempt in range(config.retries + 1):
             try:
-                response = requests.get(url)
-                response.raise_for_status()
-                return response.content
+                self._stream_to(url, dest_path, limiter)
+                if cache is not None:
+                    try:
+                        cache.put_file(url, dest_path, checksum)
+                    except OSError as e:
+                        self.console.print(f"[yellow]Could not cache {url}: {e}[/]")
+                return
             except requests.exceptions.RequestException as e:
                 if attempt == config.retries:
                     self.console.print(f"[bold red]Failed to download {url}: {e}[/]")
                     raise
+
+    def upstream_checksum(self, url: str) -> Optional[str]:
+        """SHA-256 Binance publishes in `<archive>.CHECKSUM`, or None if it cannot be fetched."""
+        try:
+            response = self.http.get(f"{url}.CHECKSUM")
+            response.raise_for_status()
+            checksum = response.text.split()[0].lower()
+        except (requests.exceptions.RequestException, IndexError, AttributeError):
+            return None
+        return checksum if len(checksum) == 64 else None
+
+    def _get_limited(self, url: str, limiter: TokenBucket) -> bytes:
+        """Stream a file in chunks, taking each chunk from the shared bandwidth budget."""
+        response = self.http.get(url, stream=True)
+        try:
+            response.raise_for_status()
+            chunks = []
+            for chunk in response.iter_content(chunk_size=64 * 1024):
+                limiter.consume(len(chunk))
+                chunks.append(chunk)
+            return b"".join(chunks)
+        finally:
+            response.close()
+
+    def _stream_to(self, url: str, dest_path: str, limiter: Optional[TokenBucket]) -> None:
+        """Stream a file to dest_path through a temporary file, taking chunks from the bandwidth budget if any."""
+        tmp_path = f"{dest_path}.part"
+        response = self.http.get(url, stream=True)
+        try:
+            response.raise_for_status()
+            with open(tmp_path, "wb") as f:
+                for chunk in response.iter_content(chunk_size=64 * 1024):
+                    if limiter is not None:
+                        limiter.consume(len(chunk))
+                    f.write(chunk)
+            os.replace(tmp_path, dest_path)
+        finally:
+            response.close()
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
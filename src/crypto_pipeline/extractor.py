@@ -1,21 +1,80 @@
+import threading
+import uuid
 import zipfile
 import os
+from concurrent.futures import Executor
 from io import BytesIO
-from typing import List
+from typing import Collection, Dict, List, Optional
 from rich.console import Console
 from .config import AppConfig
 from .interfaces import IExtractor
+from .periods import archive_period, superseded_daily
+from .catalog import FileCatalog, file_row, open_catalog
+from .sink import relative_key, sink_for
+
+# Archives handed to extraction worker processes, below destination_dir
+SPOOL_DIR = ".extract_spool"
+
+
+def extract_file(zip_path: str, dest_path: str, data_type: str, skip: Collection[str] = ()) -> List[Dict]:
+    """
+    Extract the CSVs of an archive file into dest_path and return their catalog rows.
+
+    Runs in extraction worker processes: inflating, writing and computing
+    file statistics all happen here, and only the small rows travel back.
+    Files named in `skip` and files already on disk are left alone.
+    """
+    rows = []
+    with zipfile.ZipFile(zip_path) as zip_file:
+        for member in zip_file.namelist():
+            filename = os.path.basename(member)
+            extracted_path = os.path.join(dest_path, filename)
+            if not filename.endswith(".csv") or filename in skip or os.path.exists(extracted_path):
+                continue
+            data = zip_file.read(member)
+            with open(extracted_path, "wb") as target:
+                target.write(data)
+            rows.append(file_row(extracted_path, data_type, data, zip_file.getinfo(member).CRC))
+    return rows
+
 
 class Extractor(IExtractor):
-    """Handles extraction of zip files."""
+    """
+    Handles extraction of zip files.
+
+    With extract_mode "process", archives are spooled to a file under
+    destination_dir and extracted by a pool of max_extract_workers worker
+    processes, so inflating and parsing are not bound to one core by the
+    GIL. The pipeline has the downloader write archives straight to a
+    `spool_path` and hands only that path to `extract_path`, so archive
+    bytes never pass through the main process. The pool is started on
+    first use and stopped by `close`.
+    """
     
     def __init__(self):
         self.console = Console()
+        self._pool: Optional[Executor] = None
+        self._pool_lock = threading.Lock()
+
+    def close(self) -> None:
+        """Stop the extraction worker processes, if any were started."""
+        with self._pool_lock:
+            if self._pool is not None:
+                self._pool.shutdown()
+                self._pool = None
 
     def extract(self, zip_content: bytes, dest_path: str, config: AppConfig) -> int:
-        """Extract CSV files from zip content."""
+        """
+        Extract CSV files from zip content, copy them to the configured sink
+        and register them in the file catalog. A file is only kept once its
+        upload succeeded. Errors are reported and re-raised.
+        """
         extracted_count = 0
+        catalog = open_catalog(config)
+        sink = sink_for(config)
         try:
+            if config.extract_mode == "process":
+                return self._extract_in_process(zip_content, dest_path, config, catalog)
             with zipfile.ZipFile(BytesIO(zip_content)) as zip_file:
                 for member in zip_file.namelist():
                     filename = os.path.basename(member)
@@ -23,10 +82,97 @@ class Extractor(IExtractor):
                         continue
                     
                     extracted_path = os.path.join(dest_path, filename)
-                    if not os.path.exists(extracted_path):
-                        with zip_file.open(member) as source, open(extracted_path, "wb") as target:
-                            target.write(source.read())
+                    # Days already compacted into their month's Parquet file are not extracted again
+                    if not os.path.exists(extracted_path) and not catalog.is_compacted(extracted_path):
+                        data = zip_file.read(member)
+                        if sink is not None:
+                            # Uploaded from memory before the file exists, so a failed
+                            # upload leaves the archive to be extracted again
+                            sink.write(relative_key(extracted_path, config), data)
+                        with open(extracted_path, "wb") as target:
+                            target.write(data)
+                        # The zip already carries the CRC-32 of the member
+                        catalog.add_file(extracted_path, config.data_type, data, zip_file.getinfo(member).CRC)
                         extracted_count += 1
+                    if len(archive_period(filename) or "") == 7:
+                        self._remove_superseded(dest_path, catalog, sink, config)
+                    catalog.touch_dir(dest_path)
         except Exception as e:
             self.console.print(f"[bold red]Error extracting: {e}[/]")
+            raise
         return extracted_count
+
+    def spool_path(self, config: AppConfig) -> str:
+        """New path under destination_dir for an archive to be extracted by a worker process."""
+        spool_dir = os.path.join(config.destination_dir, SPOOL_DIR)
+        os.makedirs(spool_dir, exist_ok=True)
+        return os.path.join(spool_dir, f"{uuid.uuid4().hex}.zip")
+
+    def extract_path(self, zip_path: str, dest_path: str, config: AppConfig) -> int:
+        """Like `extract` for an archive spooled at `zip_path`, which is removed afterwards."""
+        try:
+            return self._extract_spooled(zip_path, dest_path, config, open_catalog(config))
+        except Exception as e:
+            self.console.print(f"[bold red]Error extracting: {e}[/]")
+            raise
+        finally:
+            os.remove(zip_path)
+
+    def _extract_in_process(self, zip_content: bytes, dest_path: str, config: AppConfig,
+                            catalog: FileCatalog) -> int:
+        """Extract in a worker process, handing over the archive by path instead of pickling it."""
+        spool_path = self.spool_path(config)
+        with open(spool_path, "wb") as f:
+            f.write(zip_content)
+        try:
+            return self._extract_spooled(spool_path, dest_path, config, catalog)
+        finally:
+            os.remove(spool_path)
+
+    def _extract_spooled(self, zip_path: str, dest_path: str, config: AppConfig, catalog: FileCatalog) -> int:
+        # Only the central directory is read here, members are inflated by the worker
+        with zipfile.ZipFile(zip_path) as zip_file:
+            names = [os.path.basename(member) for member in zip_file.namelist()]
+        skip = [name for name in names if catalog.is_compacted(os.path.join(dest_path, name))]
+        rows = self._process_pool(config).submit(extract_file, zip_path, dest_path,
+                                                 config.data_type, skip).result()
+
+        sink = sink_for(config)
+        for i, row in enumerate(rows):
+            if sink is not None:
+                try:
+                    sink.upload_file(relative_key(row["path"], config), row["path"])
+                except Exception:
+                    # Files not uploaded are not kept, so the archive is extracted again
+                    for pending in rows[i:]:
+                        os.remove(pending["path"])
+                    raise
+            catalog.add_row(row)
+        if any(len(archive_period(name) or "") == 7 for name in names):
+            self._remove_superseded(dest_path, catalog, sink, config)
+        catalog.touch_dir(dest_path)
+        return len(rows)
+
+    def _process_pool(self, config: AppConfig) -> Executor:
+        with self._pool_lock:
+            if self._pool is None:
+                # multiprocessing is only needed in process mode
+                import multiprocessing
+                from concurrent.futures import ProcessPoolExecutor
+                # Forking a process with running download threads is unsafe
+                method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+                self._pool = ProcessPoolExecutor(max_workers=config.max_extract_workers,
+                                                 mp_context=multiprocessing.get_context(method))
+            return self._pool
+
+    def _remove_superseded(self, dest_path: str, catalog, sink=None, config: Optional[AppConfig] = None) -> None:
+        """Delete daily CSVs and compacted Parquet files whose month is now covered by a monthly CSV, locally and in the sink."""
+        superseded = superseded_daily([row["path"] for row in catalog.files(dest_path)])
+        for path in superseded:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            if sink is not None:
+                sink.delete(relative_key(path, config))
+        catalog.remove(superseded)
@@ -0,0 +1,265 @@
+import re
+from typing import Callable, Dict, List, NamedTuple, Optional, Sequence
+from rich.console import Console
+from .config import AppConfig
+from .loader import ensure_klines_schema
+
+FEATURES_DDL = """
+    CREATE TABLE IF NOT EXISTS features (
+        symbol VARCHAR,
+        interval VARCHAR,
+        feature VARCHAR,
+        open_time BIGINT,
+        value DOUBLE
+    )
+"""
+
+FEATURE_SPEC_PATTERN = re.compile(r"^([a-z_]+)(?::(\d+))?$")
+
+# Materialized rows younger than this are recomputed, e.g. REST tail rows replaced by archives
+REWRITE_MS = 2 * 86_400_000
+
+
+class Feature(NamedTuple):
+    """
+    One materialized feature.
+
+    `sql` is evaluated per row over the klines columns plus prev_close,
+    log_ret (log return to the previous row) and true_range, with the window
+    `w` (per symbol, ordered by open_time). `lookback` is the number of
+    preceding rows a value depends on. Expanding features have a `combine`
+    aggregate (sum, max or min): `sql` is the running aggregate of the rows
+    being computed, folded into the last stored value.
+    """
+    name: str
+    sql: str
+    lookback: int = 0
+    combine: Optional[str] = None
+
+
+FEATURES: Dict[str, Callable[[Optional[int]], Feature]] = {}
+
+
+def register_feature(kind: str, windowed: bool = True):
+    """Register a feature factory under `kind`, used as "kind:window" (or "kind" if not windowed)."""
+    def decorator(factory: Callable[[Optional[int]], Feature]):
+        factory.windowed = windowed
+        FEATURES[kind] = factory
+        return factory
+    return decorator
+
+
+def rolling(n: int, sql: str) -> str:
+    """`sql` over the last n rows (window `r`), NULL until n rows are available."""
+    frame = f"(w ROWS BETWEEN {n - 1} PRECEDING AND CURRENT ROW)"
+    return f"CASE WHEN count(*) OVER {frame} = {n} THEN {sql.format(r=frame)} END"
+
+
+@register_feature("ret")
+def _ret(n):
+    return Feature(f"ret_{n}", f"close / lag(close, {n}) OVER w - 1", n)
+
+
+@register_feature("rvol")
+def _rvol(n):
+    return Feature(f"rvol_{n}", rolling(n, "sqrt(sum(log_ret * log_ret) OVER {r})"), n)
+
+
+@register_feature("atr")
+def _atr(n):
+    return Feature(f"atr_{n}", rolling(n, "avg(true_range) OVER {r}"), n)
+
+
+@register_feature("sma")
+def _sma(n):
+    return Feature(f"sma_{n}", rolling(n, "avg(close) OVER {r}"), n)
+
+
+@register_feature("vol_z")
+def _vol_z(n):
+    return Feature(f"vol_z_{n}", rolling(n, "(volume - avg(volume) OVER {r}) / nullif(stddev_samp(volume) OVER {r}, 0)"), n)
+
+
+@register_feature("cum_volume", windowed=False)
+def _cum_volume(_):
+    return Feature("cum_volume", "volume", combine="sum")
+
+
+@register_feature("max_close", windowed=False)
+def _max_close(_):
+    return Feature("max_close", "close", combine="max")
+
+
+@register_feature("min_close", windowed=False)
+def _min_close(_):
+    return Feature("min_close", "close", combine="min")
+
+
+def parse_feature_spec(spec: str) -> Feature:
+    """Build the feature of a spec such as "ret:60", "atr:14" or "cum_volume"."""
+    match = FEATURE_SPEC_PATTERN.match(spec.strip())
+    if not match or match.group(1) not in FEATURES:
+        raise ValueError(f"Unknown feature {spec!r}, expected one of {sorted(FEATURES)}")
+    kind, window = match.groups()
+    factory = FEATURES[kind]
+    if factory.windowed and window is None:
+        raise ValueError(f"Feature {kind!r} needs a window, e.g. {kind}:60")
+    if not factory.windowed and window is not None:
+        raise ValueError(f"Feature {kind!r} takes no window")
+    if window is not None and int(window) < 1:
+        raise ValueError(f"Feature window must be positive, got {spec!r}")
+    return factory(int(window) if window else None)
+
+
+class FeatureEngine:
+    """
+    Materializes a registry of rolling and expanding kline features.
+
+    Values go to the long `features` table (symbol, interval, feature,
+    open_time, value), computed with DuckDB window functions per symbol.
+    Each run recomputes only the klines after the last stored value, minus
+    REWRITE_MS to pick up replaced tail rows, reading the `lookback` rows
+    before them as warm-up. Expanding features continue from their last
+    stored value. A feature added later triggers a full recompute of the
+    symbol.
+
+    Usage:
+        FeatureEngine().materialize(con, ["BTCUSDT"], "1h", ["ret:24", "rvol:24", "atr:14", "vol_z:24"])
+    """
+
+    def __init__(self):
+        self.console = Console()
+
+    def update(self, symbols: List[str], config: AppConfig, con=None) -> int:
+        """Materialize config.features of the loaded klines in config.db_path, through `con` if given."""
+        if not config.db_path:
+            self.console.print("[yellow]No database path provided. Skipping features.[/]")
+            return 0
+        self.console.print(f"[bold blue]Updating {len(config.features)} features...[/]")
+        try:
+            if con is not None:
+                rows = self.materialize(con, symbols, config.data_frequency, config.features)
+            else:
+                import duckdb
+                con = duckdb.connect(config.db_path)
+                try:
+                    rows = self.materialize(con, symbols, config.data_frequency, config.features)
+                finally:
+                    con.close()
+            self.console.print(f"[bold green]Wrote {rows} feature values.[/]")
+            return rows
+        except Exception as e:
+            self.console.print(f"[bold red]Error materializing features: {e}[/]")
+            return 0
+
+    def materialize(self, con, symbols: Sequence[str], interval: str, specs: Sequence[str]) -> int:
+        """Compute the new values of every feature for every symbol. Returns rows written."""
+        features = list({f.name: f for f in map(parse_feature_spec, specs)}.values())
+        ensure_klines_schema(con)
+        con.execute(FEATURES_DDL)
+        return sum(self._materialize_symbol(con, symbol, interval, features) for symbol in sorted(symbols))
+
+    def _materialize_symbol(self, con, symbol: str, interval: str, features: List[Feature]) -> int:
+        names = [f.name for f in features]
+        placeholders = ", ".join("?" for _ in names)
+        done = dict(con.execute(f"""
+            SELECT feature, max(open_time) FROM features
+            WHERE symbol = ? AND interval = ? AND feature IN ({placeholders})
+            GROUP BY feature
+        """, [symbol, interval] + names).fetchall())
+
+        # A feature never computed needs the whole history
+        start = None
+        if len(done) == len(features):
+            start = min(done.values()) - REWRITE_MS
+        warm_start = self._warm_start(con, symbol, interval, start, max(f.lookback for f in features))
+        carry = self._carry(con, symbol, interval, start, [f for f in features if f.combine])
+
+        expressions = []
+        # Carried values are bound, so inf and nan reach DuckDB as doubles
+        carried = {}
+        for i, feature in enumerate(features):
+            if feature.combine:
+                running = (f"{feature.combine}(CASE WHEN open_time >= $start THEN {feature.sql} END) "
+                           f"OVER (w ROWS BETWEEN UNBOUNDED PRECEDING AND CURRENT ROW)")
+                previous = carry.get(feature.name)
+                if previous is None:
+                    expressions.append(running)
+                    continue
+                carried[f"carry_{i}"] = float(previous)
+                previous = f"CAST($carry_{i} AS DOUBLE)"
+                if feature.combine == "sum":
+                    expressions.append(f"{previous} + coalesce({running}, 0)")
+                else:
+                    function = "greatest" if feature.combine == "max" else "least"
+                    expressions.append(f"{function}({previous}, coalesce({running}, {previous}))")
+            else:
+                expressions.append(feature.sql)
+
+        params = {"symbol": symbol, "interval": interval, "warm_start": warm_start,
+                  "start": start if start is not None else -2**62, **carried}
+        con.execute(f"""
+            CREATE OR REPLACE TEMP TABLE features_staged AS
+            WITH base AS (
+                SELECT open_time, open, high, low, close, volume, quote_asset_volume, number_of_trades,
+                       lag(close) OVER w AS prev_close,
+                       ln(close / lag(close) OVER w) AS log_ret,
+                       greatest(high - low, abs(high - lag(close) OVER w), abs(low - lag(close) OVER w)) AS true_range
+                FROM klines
+                WHERE symbol = $symbol AND interval = $interval AND open_time >= $warm_start
+                WINDOW w AS (ORDER BY open_time)
+            ),
+            calc AS (
+                SELECT open_time, {", ".join(f'{sql} AS "{f.name}"' for sql, f in zip(expressions, features))}
+                FROM base
+                WINDOW w AS (ORDER BY open_time)
+            )
+            UNPIVOT (SELECT * FROM calc WHERE open_time >= $start)
+            ON {", ".join(f'"{name}"' for name in names)} INTO NAME feature VALUE value
+        """, params)
+        try:
+            con.execute("BEGIN TRANSACTION")
+            con.execute(f"""
+                DELETE FROM features
+                WHERE symbol = ? AND interval = ? AND feature IN ({placeholders}) AND open_time >= ?
+            """, [symbol, interval] + names + [params["start"]])
+            con.execute("""
+                INSERT INTO features
+                SELECT ?, ?, feature, open_time, value FROM features_staged ORDER BY feature, open_time
+            """, [symbol, interval])
+            rows = con.execute("SELECT count(*) FROM features_staged").fetchone()[0]
+            con.execute("COMMIT")
+            return rows
+        except Exception:
+            con.execute("ROLLBACK")
+            raise
+        finally:
+            con.execute("DROP TABLE IF EXISTS features_staged")
+
+    def _warm_start(self, con, symbol: str, interval: str, start: Optional[int], lookback: int) -> int:
+        """open_time of the row `lookback` rows before the first one recomputed."""
+        if start is None:
+            return -2**62
+        if lookback == 0:
+            return start
+        row = con.execute("""
+            SELECT open_time FROM klines
+            WHERE symbol = ? AND interval = ? AND open_time < ?
+            ORDER BY open_time DESC LIMIT 1 OFFSET ?
+        """, [symbol, interval, start, lookback - 1]).fetchone()
+        return row[0] if row else -2**62
+
+    def _carry(self, con, symbol: str, interval: str, start: Optional[int],
+               features: List[Feature]) -> Dict[str, Optional[float]]:
+        """Last stored value before `start` of every expanding feature."""
+        if start is None or not features:
+            return {}
+        carry = {}
+        for feature in features:
+            row = con.execute("""
+                SELECT value FROM features
+                WHERE symbol = ? AND interval = ? AND feature = ? AND open_time < ?
+                ORDER BY open_time DESC LIMIT 1
+            """, [symbol, interval, feature.name, start]).fetchone()
+            carry[feature.name] = row[0] if row else None
+        return carry
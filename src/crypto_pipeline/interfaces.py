@@ -1,26 +1,6 @@
 from abc import ABC, abstractmethod
 from typing import List, Any
-from config import AppConfig
-
-class IFetcher(ABC):
-    """Interface for fetching symbols."""
-    @abstractmethod
-    def get_symbols(self, config: AppConfig) -> List[str]:
-        pass
-
-class IDownloader(ABC):
-    """Interface for downloading files."""
-    @abstractmethod
-    def download(self, urls: List[str], config: AppConfig) -> List[str]:
-        pass
-
-class IExtractor(ABC):
-    """Interface for extracting files."""
-    @abstractmethod
-    def extract(self, files: List[str], config: AppConfig) -> None:
-from abc import ABC, abstractmethod
-from typing import List, Any
-from config import AppConfig
+from .config import AppConfig
 
 class IFetcher(ABC):
     """Interface for fetching symbols."""
@@ -54,3 +34,21 @@ class ILoader(ABC):
     def load(self, symbols: List[str], config: AppConfig) -> None:
         """Load data into storage."""
         pass
+
+class ISink(ABC):
+    """Interface for object storage sinks receiving pipeline output."""
+
+    @abstractmethod
+    def write(self, key: str, data: bytes) -> None:
+        """Store `data` under `key`, a path relative to the sink root."""
+        pass
+
+    @abstractmethod
+    def upload_file(self, key: str, local_path: str) -> None:
+        """Store a local file under `key`, streaming large files."""
+        pass
+
+    @abstractmethod
+    def delete(self, key: str) -> None:
+        """Remove the object under `key` if it exists."""
+        pass
@@ -0,0 +1,185 @@
+import os
+import threading
+import requests
+from contextlib import nullcontext
+from typing import Union, Dict, List, Set, Tuple
+from urllib.parse import urlparse
+from rich.console import Console
+from rich.progress import Progress
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
+from requests.adapters import HTTPAdapter
+from .config import AppConfig, JobConfig
+from .symbol_fetcher import SymbolFetcher
+from .downloader import Downloader
+from .schema_monitor import SchemaMonitor, REST_API_BASE
+from .scheduler import DownloadScheduler
+from .journal import RunJournal, default_journal_path
+from .pipeline import Pipeline
+
+class JobRunner:
+    """
+    Runs many datasets in one process.
+
+    All datasets share one HTTP session, one symbol catalog and one pair of
+    download/extract executors sized by the job's global concurrency budget.
+    Every dataset is listed concurrently and its archives are queued for
+    download as their listing pages arrive, in the dataset's own
+    `download_order`, so the datasets interleave and the link stays busy.
+    Each dataset keeps its own run journal, so `--resume` and
+    `--retry-failed` work per dataset.
+
+    Usage:
+        runner = JobRunner("job.yaml")
+        runner.run()
+    """
+
+    def __init__(self, job: Union[JobConfig, List[Union[AppConfig, Dict]], Dict, str]):
+        self.console = Console()
+
+        if isinstance(job, JobConfig):
+            self.job = job
+        elif isinstance(job, str) and job.endswith(('.yaml', '.yml')):
+            self.job = JobConfig.from_yaml(job)
+        elif isinstance(job, list):
+            self.job = JobConfig(datasets=job)
+        elif isinstance(job, dict):
+            self.job = JobConfig(**job)
+        else:
+            raise ValueError("Job must be JobConfig, list of configs, dict, or path to YAML file")
+
+        self.session = requests.Session()
+        self.fetcher = SymbolFetcher(self.session)
+        self.downloader = Downloader(self.session)
+        self.schema_monitor = SchemaMonitor(self.session)
+
+        # One pool per host the session talks to, each as large as the download budget
+        adapter = HTTPAdapter(pool_connections=len(self._hosts()), pool_maxsize=self.job.max_workers)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+        self.profiler = None
+        if self.job.profile_dir:
+            from .profiler import StageProfiler
+            self.profiler = StageProfiler(self.job.profile_dir)
+
+        self.pipelines = []
+        for config in self.job.datasets:
+            pipeline = Pipeline(config)
+            pipeline.fetcher = self.fetcher
+            pipeline.downloader = self.downloader
+            pipeline.schema_monitor = self.schema_monitor
+            if self.profiler is not None:
+                pipeline.profiler = self.profiler
+            self.pipelines.append(pipeline)
+
+    def _hosts(self) -> Set[str]:
+        """Hosts reached through the shared session: archive downloads, S3 listings and the REST APIs of the datasets."""
+        hosts = {urlparse(self.downloader.download_base_url).netloc, urlparse(self.downloader.s3_base_url).netloc}
+        for config in self.job.datasets:
+            if config.asset_type in REST_API_BASE:
+                hosts.add(urlparse(REST_API_BASE[config.asset_type]).netloc)
+        return hosts
+
+    def _stage(self, name: str):
+        """Profiling scope of a job stage, a no-op unless profile_dir is set."""
+        return self.profiler.stage(name) if self.profiler is not None else nullcontext()
+
+    def run(self, resume: bool = False, retry_failed: bool = False):
+        """
+        Execute every dataset of the job.
+
+        `resume` and `retry_failed` continue or retry each dataset from its
+        own journal, one dataset after another.
+        """
+        self.console.print(f"[bold green]Starting Job ({len(self.pipelines)} datasets)[/]")
+
+        if resume or retry_failed:
+            for pipeline in self.pipelines:
+                if not pipeline.config.derive_from:
+                    pipeline.run(resume=resume, retry_failed=retry_failed)
+            return
+
+        # 0-1. Schema check and symbol discovery per dataset (symbols are shared)
+        active: List[Tuple[Pipeline, List[str]]] = []
+        derived: List[Tuple[Pipeline, List[str]]] = []
+        with self._stage("fetch"):
+            for pipeline in self.pipelines:
+                config = pipeline.config
+                if config.derive_from:
+                    symbols = self.fetcher.get_symbols_cached(config)
+                    if symbols:
+                        derived.append((pipeline, pipeline.select_batch(symbols)))
+                    continue
+
+                if not self.schema_monitor.check_schema(config):
+                    self.console.print(f"[bold red]Skipping {config.dataset_key} due to schema mismatch.[/]")
+                    continue
+
+                os.makedirs(config.destination_dir, exist_ok=True)
+                symbols = self.fetcher.get_symbols_cached(config)
+                if not symbols:
+                    self.console.print(f"[bold red]No symbols found for {config.dataset_key}[/]")
+                    continue
+                active.append((pipeline, pipeline.select_batch(symbols)))
+
+        if not active and not derived:
+            self.console.print("[bold red]No datasets to process[/]")
+            return
+
+        for pipeline, _ in active:
+            pipeline.journal = RunJournal(default_journal_path(pipeline.config))
+        try:
+            # 2-3. List, download & extract all datasets with a global budget
+            self._stream(active)
+
+            # 4-5. Verify & load each dataset
+            for pipeline, batch in active:
+                pipeline._finalize(batch)
+        finally:
+            for pipeline, _ in active:
+                pipeline._close_journal()
+
+        # 6. Derive coarser intervals from the freshly loaded klines
+        for pipeline, batch in derived:
+            pipeline.resampler.derive(batch, pipeline.config)
+            pipeline.after_load(batch)
+
+        self.console.print("[bold green]\nJob execution completed successfully.[/]")
+
+    def _stream(self, active: List[Tuple[Pipeline, List[str]]]):
+        """List every dataset and download and extract its archives as the listing pages arrive."""
+        total = sum(len(batch) for _, batch in active)
+        self.console.print(f"[blue]Fetching URLs for {total} symbols across {len(active)} datasets...[/]")
+        lock = threading.Lock()
+        futures: List[Future] = []
+        with Progress() as progress, self._stage("download"), self._stage("extract"):
+            list_task = progress.add_task("[blue]Listing...", total=total)
+            dl_task = progress.add_task("[cyan]Downloading...", total=0)
+            ex_task = progress.add_task("[green]Extracting...", total=0)
+
+            with ThreadPoolExecutor(max_workers=self.job.max_workers, thread_name_prefix="list") as list_executor, \
+                 ThreadPoolExecutor(max_workers=self.job.max_workers, thread_name_prefix="download") as dl_executor, \
+                 ThreadPoolExecutor(max_workers=self.job.max_extract_workers,
+                                    thread_name_prefix="extract") as ex_executor:
+                with self._stage("list"):
+                    listings = []
+                    for pipeline, batch in active:
+                        scheduler = DownloadScheduler(dl_executor, pipeline.config.download_order)
+                        listings += pipeline.submit_listings(batch, list_executor, scheduler, ex_executor,
+                                                             progress, dl_task, ex_task, lock, futures)
+                    for future in as_completed(listings):
+                        future.result()
+                        progress.advance(list_task)
+                for pipeline, batch in active:
+                    pipeline.journal.record_listing_complete(batch)
+
+                # No listing is running anymore, so futures is complete
+                for _ in as_completed(futures):
+                    pass
+
+        reported = set()
+        for pipeline, _ in active:
+            pipeline.extractor.close()
+            if pipeline.config.cache_dir not in reported:
+                reported.add(pipeline.config.cache_dir)
+                self.downloader.report_cache(pipeline.config)
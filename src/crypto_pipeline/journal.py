@@ -0,0 +1,120 @@
+import json
+import os
+import threading
+import time
+from typing import Dict, List, Optional
+from .config import AppConfig
+
+# Unit (archive URL) states in processing order; symbols move to verified and loaded
+LISTED = "listed"
+DOWNLOADED = "downloaded"
+EXTRACTED = "extracted"
+FAILED = "failed"
+VERIFIED = "verified"
+LOADED = "loaded"
+
+
+def default_journal_path(config: AppConfig) -> str:
+    """Where the journal of a dataset and batch is kept."""
+    name = config.dataset_key.replace("/", "-")
+    return os.path.join(config.destination_dir, f"journal-{name}-{config.batch_number}of{config.total_batches}.jsonl")
+
+
+class JournalState:
+    """State of a run rebuilt from its journal; the last record of a unit wins."""
+
+    def __init__(self):
+        self.units: Dict[str, str] = {}
+        self.reasons: Dict[str, str] = {}
+        self.symbols: Dict[str, str] = {}
+        self.batch: List[str] = []
+        self.listing_complete = False
+
+    def apply(self, record: Dict) -> None:
+        event = record.get("event")
+        if event == "listing_complete":
+            self.listing_complete = True
+            self.batch = record.get("symbols", [])
+        elif "symbol_state" in record:
+            self.symbols[record["symbol"]] = record["symbol_state"]
+        elif "unit" in record:
+            self.units[record["unit"]] = record["state"]
+            if record["state"] == FAILED:
+                self.reasons[record["unit"]] = record.get("reason", "")
+            else:
+                self.reasons.pop(record["unit"], None)
+
+    def with_state(self, *states: str) -> List[str]:
+        return sorted(unit for unit, state in self.units.items() if state in states)
+
+    def pending(self) -> List[str]:
+        """Units not yet extracted; downloaded content is gone after a crash, so those are redone."""
+        return self.with_state(LISTED, DOWNLOADED, FAILED)
+
+    def failed(self) -> List[str]:
+        return self.with_state(FAILED)
+
+
+class RunJournal:
+    """
+    Durable, append-only JSONL journal of a pipeline run.
+
+    Every archive (unit) is recorded as listed, downloaded, extracted or
+    failed with a reason, and every symbol as verified and loaded. Each
+    record is flushed when written, so a crashed run can be resumed from the
+    journal; a torn last line is ignored on replay.
+    """
+
+    def __init__(self, path: str, append: bool = False):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._file = open(path, "a" if append else "w")
+        self._lock = threading.Lock()
+
+    def _write(self, record: Dict) -> None:
+        record["ts"] = time.time()
+        line = json.dumps(record) + "\n"
+        with self._lock:
+            self._file.write(line)
+            self._file.flush()
+
+    def record(self, unit: str, state: str, reason: Optional[str] = None) -> None:
+        record = {"unit": unit, "state": state}
+        if reason:
+            record["reason"] = reason
+        self._write(record)
+
+    def record_symbols(self, symbols: List[str], state: str) -> None:
+        for symbol in symbols:
+            self._write({"symbol": symbol, "symbol_state": state})
+
+    def record_listing(self, symbols: List[str], units: List[str]) -> None:
+        """Record all listed units, then mark the listing phase complete."""
+        for unit in units:
+            self.record(unit, LISTED)
+        self.record_listing_complete(symbols)
+
+    def record_listing_complete(self, symbols: List[str]) -> None:
+        """Mark the listing phase complete once every unit was recorded as listed."""
+        self._write({"event": "listing_complete", "symbols": symbols})
+
+    def close(self) -> None:
+        with self._lock:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._file.close()
+
+    @staticmethod
+    def replay(path: str) -> Optional[JournalState]:
+        """Rebuild the state of a run, or None when there is no journal."""
+        if not os.path.exists(path):
+            return None
+        state = JournalState()
+        with open(path, "r") as f:
+            for line in f:
+                try:
+                    state.apply(json.loads(line))
+                except json.JSONDecodeError:
+                    # Torn write at the moment of a crash
+                    continue
+        return state
@@ -1,10 +1,104 @@
-import os
-import duckdb
-import glob
-from typing import List
+from typing import Dict, List, Optional, Tuple
 from rich.console import Console
 from .config import AppConfig
 from .interfaces import ILoader
+from .timeutils import normalize_ms_sql
+from .periods import period_range, superseded_daily
+from .catalog import open_catalog
+
+# open_time/close_time are stored as epoch milliseconds whatever unit the
+# source file used; open_ts carries the same instant as a TIMESTAMP.
+KLINES_DDL = """
+    CREATE TABLE IF NOT EXISTS klines (
+        open_time BIGINT,
+        open DOUBLE,
+        high DOUBLE,
+        low DOUBLE,
+        close DOUBLE,
+        volume DOUBLE,
+        close_time BIGINT,
+        quote_asset_volume DOUBLE,
+        number_of_trades BIGINT,
+        taker_buy_base_asset_volume DOUBLE,
+        taker_buy_quote_asset_volume DOUBLE,
+        ignore DOUBLE,
+        symbol VARCHAR,
+        interval VARCHAR,
+        open_ts TIMESTAMP
+    )
+"""
+
+# One row per time range of klines replaced by a load; dbt models use load_id
+# to restage exactly the ranges written since their last run
+KLINE_LOADS_DDL = """
+    CREATE TABLE IF NOT EXISTS kline_loads (
+        load_id BIGINT,
+        symbol VARCHAR,
+        interval VARCHAR,
+        lo BIGINT,
+        hi BIGINT,
+        loaded_at TIMESTAMP
+    )
+"""
+
+KLINES_CSV_COLUMNS = {
+    "open_time": "BIGINT",
+    "open": "DOUBLE",
+    "high": "DOUBLE",
+    "low": "DOUBLE",
+    "close": "DOUBLE",
+    "volume": "DOUBLE",
+    "close_time": "BIGINT",
+    "quote_asset_volume": "DOUBLE",
+    "number_of_trades": "BIGINT",
+    "taker_buy_base_asset_volume": "DOUBLE",
+    "taker_buy_quote_asset_volume": "DOUBLE",
+    "ignore": "DOUBLE",
+}
+
+
+def ensure_klines_schema(con) -> None:
+    """Create the klines table, migrating tables written before timestamps were normalized."""
+    con.execute(KLINES_DDL)
+    columns = [row[0] for row in con.execute("DESCRIBE klines").fetchall()]
+    if "open_ts" not in columns:
+        con.execute("ALTER TABLE klines ADD COLUMN open_ts TIMESTAMP")
+        con.execute(f"""
+            UPDATE klines SET
+                open_time = {normalize_ms_sql('open_time')},
+                close_time = {normalize_ms_sql('close_time')},
+                open_ts = epoch_ms({normalize_ms_sql('open_time')})
+        """)
+
+
+def record_load(con, symbol: str, interval: str, ranges: List[Tuple[int, int]]) -> None:
+    """Log the [lo, hi) open_time ranges of klines just written for a symbol under a new load_id."""
+    con.execute(KLINE_LOADS_DDL)
+    if not ranges:
+        return
+    load_id = con.execute("SELECT coalesce(max(load_id), 0) + 1 FROM kline_loads").fetchone()[0]
+    con.executemany("INSERT INTO kline_loads VALUES (?, ?, ?, ?, ?, now()::TIMESTAMP)",
+                    [(load_id, symbol, interval, lo, hi) for lo, hi in ranges])
+
+
+def klines_select_sql(source_sql: str, symbol: str, interval: str, source: bool = False) -> str:
+    """
+    SELECT producing klines rows, with normalized times, from a relation of raw CSV columns.
+
+    With `source`, the relation's `filename` column is kept after the klines columns.
+    """
+    return f"""
+        SELECT
+            {normalize_ms_sql('open_time')} AS open_time,
+            open, high, low, close, volume,
+            {normalize_ms_sql('close_time')} AS close_time,
+            quote_asset_volume, number_of_trades,
+            taker_buy_base_asset_volume, taker_buy_quote_asset_volume, ignore,
+            '{symbol}' AS symbol,
+            '{interval}' AS interval,
+            epoch_ms({normalize_ms_sql('open_time')}) AS open_ts{", filename" if source else ""}
+        FROM {source_sql}
+    """
 
 class DuckDBLoader(ILoader):
     """Loads data into DuckDB."""
@@ -12,8 +106,8 @@ class DuckDBLoader(ILoader):
     def __init__(self):
         self.console = Console()
 
-    def load(self, symbols: List[str], config: AppConfig) -> None:
-        """Load downloaded CSVs into DuckDB."""
+    def load(self, symbols: List[str], config: AppConfig, con=None) -> None:
+        """Load downloaded CSVs into DuckDB, through `con` if given (else a connection to config.db_path)."""
         if not config.db_path:
             self.console.print("[yellow]No database path provided. Skipping loading.[/]")
             return
@@ -21,7 +115,10 @@ class DuckDBLoader(ILoader):
         self.console.print(f"[bold blue]Loading data into DuckDB: {config.db_path}...[/]")
         
         try:
-            con = duckdb.connect(config.db_path)
+            own = con is None
+            if own:
+                import duckdb  # Only needed once there is a database to load into
+                con = duckdb.connect(config.db_path)
             
             # Create table if not exists (assuming klines structure for now)
             # We'll use a generic approach or specific based on data_type
@@ -30,60 +127,136 @@ class DuckDBLoader(ILoader):
             else:
                 self.console.print(f"[yellow]Loading for {config.data_type} not fully implemented yet. Skipping.[/]")
             
-            con.close()
+            if own:
+                con.close()
             self.console.print("[bold green]Data loading completed.[/]")
             
         except Exception as e:
             self.console.print(f"[bold red]Error loading data into DuckDB: {e}[/]")
 
     def _load_klines(self, con, symbols: List[str], config: AppConfig):
-        """Load klines data."""
-        # Create schema
-        con.execute("""
-            CREATE TABLE IF NOT EXISTS klines (
-                open_time BIGINT,
-                open DOUBLE,
-                high DOUBLE,
-                low DOUBLE,
-                close DOUBLE,
-                volume DOUBLE,
-                close_time BIGINT,
-                quote_asset_volume DOUBLE,
-                number_of_trades BIGINT,
-                taker_buy_base_asset_volume DOUBLE,
-                taker_buy_quote_asset_volume DOUBLE,
-                ignore DOUBLE,
-                symbol VARCHAR,
-                interval VARCHAR
-            )
-        """)
+        """
+        Load klines data.
 
-        for symbol in symbols:
-            # Find all CSVs for this symbol
-            if config.asset_type == "spot" or config.asset_type == "option":
-                base_path = os.path.join(config.destination_dir, config.asset_type, symbol, config.data_frequency)
-            else:
-                base_path = os.path.join(config.destination_dir, config.asset_type, symbol, config.data_frequency)
-            
-            csv_files = glob.glob(os.path.join(base_path, "*.csv"))
+        Each symbol is inserted in one statement sorted by open_time, and
+        symbols are loaded in sorted order, so rows land clustered by
+        (symbol, interval, open_time) and DuckDB zone maps can prune range scans.
+
+        Loading replaces the rows already stored in the day or month of each
+        file, so reloads are idempotent and a monthly file replaces the daily
+        rows of its month. Rows between non-adjacent files are left alone.
+        Daily files superseded by a monthly file in the same directory are
+        skipped.
+
+        Files come from the file catalog, and only those not loaded into this
+        database before are read, CSVs and compacted monthly Parquet files alike.
+        """
+        catalog = open_catalog(config)
+        is_new = not con.execute(
+            "SELECT count(*) FROM information_schema.tables WHERE table_name = 'klines'"
+        ).fetchone()[0]
+        ensure_klines_schema(con)
+        if is_new:
+            # Files loaded into a previous database must be loaded again
+            catalog.reset_loaded(config.dataset_dir(symbol) for symbol in symbols)
+
+        for symbol in sorted(symbols):
+            # Find the CSVs of this symbol that are not loaded yet
+            base_path = config.dataset_dir(symbol)
+            catalog.sync(base_path, config.data_type)
+            entries = catalog.files(base_path)
+            superseded = set(superseded_daily([entry["path"] for entry in entries]))
+            pending = [entry for entry in entries if not entry["loaded"] and entry["path"] not in superseded]
+            csv_files = [entry["path"] for entry in pending]
+            headers = {entry["path"]: bool(entry["has_header"]) for entry in pending}
             
             if not csv_files:
                 continue
                 
             self.console.print(f"Loading {len(csv_files)} files for {symbol}...")
-            
-            # Bulk insert using DuckDB's read_csv_auto
-            # We add symbol and interval columns literally
-            for csv_file in csv_files:
-                # Normalize path for SQL
-                csv_file_sql = csv_file.replace("\\", "/")
-                
-                query = f"""
-                    INSERT INTO klines 
-                    SELECT *, '{symbol}' as symbol, '{config.data_frequency}' as interval 
-                    FROM read_csv_auto('{csv_file_sql}', header=False)
-                """
-                try:
-                    con.execute(query)
-                except Exception as e:
-                    self.console.print(f"[red]Failed to load {csv_file}: {e}[/]")
+
+            try:
+                self.insert_klines(con, csv_files, symbol, config.data_frequency, headers)
+                catalog.mark(csv_files, loaded=1)
+            except Exception:
+                # Isolate the broken file(s) by loading one at a time
+                for csv_file in csv_files:
+                    try:
+                        self.insert_klines(con, [csv_file], symbol, config.data_frequency, headers)
+                        catalog.mark([csv_file], loaded=1)
+                    except Exception as e:
+                        self.console.print(f"[red]Failed to load {csv_file}: {e}[/]")
+
+    def insert_klines(self, con, csv_files: List[str], symbol: str, interval: str,
+                       headers: Optional[Dict[str, bool]] = None):
+        """
+        Replace the rows of one symbol in the periods of the CSV (or compacted
+        Parquet) files, atomically and sorted. Files without a period in their
+        name replace the range of their rows.
+        """
+        columns_sql = ", ".join(f"'{name}': '{dtype}'" for name, dtype in KLINES_CSV_COLUMNS.items())
+        # Some archives start with a column header row, read those separately
+        groups = {True: [], False: []}
+        parquet_files = []
+        for csv_file in csv_files:
+            if csv_file.endswith(".parquet"):
+                # Months merged by the compactor, with the CSV column names
+                parquet_files.append(csv_file.replace("\\", "/"))
+                continue
+            header = headers[csv_file] if headers and csv_file in headers else self._has_header(csv_file)
+            groups[header].append(csv_file.replace("\\", "/"))
+
+        sources = []
+        if parquet_files:
+            files_sql = ", ".join(f"'{path}'" for path in parquet_files)
+            sources.append(klines_select_sql(f"read_parquet([{files_sql}], filename=true)", symbol, interval,
+                                             source=True))
+        for header, paths in groups.items():
+            if paths:
+                files_sql = ", ".join(f"'{path}'" for path in paths)
+                source_sql = f"read_csv([{files_sql}], header={header}, columns={{{columns_sql}}}, filename=true)"
+                sources.append(klines_select_sql(source_sql, symbol, interval, source=True))
+
+        con.execute(f"""
+            CREATE OR REPLACE TEMP TABLE klines_staged AS
+            {" UNION ALL ".join(sources)}
+            ORDER BY open_time
+        """)
+        # Every file replaces its own day or month; compacted Parquet files
+        # (which may lack days of their month) and files without a period in
+        # their name replace the range of their rows
+        ranges = []
+        for path, lo, hi in con.execute(
+                "SELECT filename, min(open_time), max(open_time) FROM klines_staged GROUP BY filename").fetchall():
+            bounds = None if path.endswith(".parquet") else period_range(path)
+            ranges.append(bounds or (lo, hi + 1))
+        try:
+            con.execute("BEGIN TRANSACTION")
+            con.execute("CREATE OR REPLACE TEMP TABLE klines_ranges (lo BIGINT, hi BIGINT)")
+            if ranges:
+                con.executemany("INSERT INTO klines_ranges VALUES (?, ?)", ranges)
+            con.execute("""
+                DELETE FROM klines USING klines_ranges r
+                WHERE klines.symbol = ? AND klines.interval = ?
+                  AND klines.open_time >= r.lo AND klines.open_time < r.hi
+            """, [symbol, interval])
+            con.execute("INSERT INTO klines SELECT * EXCLUDE (filename) FROM klines_staged ORDER BY open_time")
+            record_load(con, symbol, interval, ranges)
+            con.execute("COMMIT")
+        except Exception:
+            con.execute("ROLLBACK")
+            raise
+        finally:
+            con.execute("DROP TABLE IF EXISTS klines_staged")
+            con.execute("DROP TABLE IF EXISTS klines_ranges")
+
+    def _has_header(self, csv_file: str) -> bool:
+        """Whether a CSV file starts with a column header row."""
+        with open(csv_file, "rb") as f:
+            first = f.read(1)
+        return bool(first) and not first.isdigit()
+
+    def cluster_klines(self, con) -> None:
+        """Rewrite the klines table fully ordered by (symbol, interval, open_time)."""
+        ensure_klines_schema(con)
+        con.execute("CREATE OR REPLACE TABLE klines AS SELECT * FROM klines ORDER BY symbol, interval, open_time")
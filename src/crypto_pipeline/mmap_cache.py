@@ -0,0 +1,201 @@
+import json
+import os
+import numpy as np
+from typing import Dict, List, Optional
+from rich.console import Console
+from .config import AppConfig
+from .timeutils import TimeLike, to_epoch_ms
+
+# Fixed-width column files written per (interval, symbol)
+MMAP_COLUMNS = {
+    "open_time": np.int64,
+    "open": np.float64,
+    "high": np.float64,
+    "low": np.float64,
+    "close": np.float64,
+    "volume": np.float64,
+    "close_time": np.int64,
+    "quote_asset_volume": np.float64,
+    "number_of_trades": np.int64,
+    "taker_buy_base_asset_volume": np.float64,
+    "taker_buy_quote_asset_volume": np.float64,
+}
+
+
+class MmapKlines:
+    """Memory-mapped klines of one symbol and interval."""
+
+    def __init__(self, path: str, index: Dict):
+        self.path = path
+        self.index = index
+        self.rows = index["rows"]
+        self.columns: Dict[str, np.ndarray] = {}
+        for name, dtype in MMAP_COLUMNS.items():
+            if self.rows:
+                self.columns[name] = np.memmap(os.path.join(path, f"{name}.bin"), dtype=dtype, mode="r", shape=(self.rows,))
+            else:
+                self.columns[name] = np.empty(0, dtype=dtype)
+
+    def __len__(self) -> int:
+        return self.rows
+
+    def __getitem__(self, column: str) -> np.ndarray:
+        return self.columns[column]
+
+    def row_range(self, start: TimeLike = None, end: TimeLike = None) -> slice:
+        """Rows with start <= open_time < end, found by binary search."""
+        open_time = self.columns["open_time"]
+        start_ms, end_ms = to_epoch_ms(start), to_epoch_ms(end)
+        lo = 0 if start_ms is None else int(np.searchsorted(open_time, start_ms, side="left"))
+        hi = self.rows if end_ms is None else int(np.searchsorted(open_time, end_ms, side="left"))
+        return slice(lo, hi)
+
+    def slice(self, start: TimeLike = None, end: TimeLike = None,
+              columns: Optional[List[str]] = None) -> Dict[str, np.ndarray]:
+        """Zero-copy views of the requested columns for start <= open_time < end."""
+        rows = self.row_range(start, end)
+        return {c: self.columns[c][rows] for c in (columns or MMAP_COLUMNS)}
+
+
+class MmapKlineCache:
+    """
+    Columnar binary export of loaded klines for fast, repeated reads.
+
+    Each (interval, symbol) directory holds one raw native-endian file per
+    column plus index.json with the row count, time bounds, the first row
+    and a checksum of every month. Refreshes append rows newer than the
+    cached ones and rewrite the cache from the first month whose rows changed
+    in the database; the index is replaced atomically after the columns are
+    written, so readers never see a partial write.
+
+    Usage:
+        cache = MmapKlineCache("./kline_cache")
+        btc = cache.open("BTCUSDT", "1m")
+        window = btc.slice("2024-01-01", "2024-02-01", ["open_time", "close"])
+    """
+
+    def __init__(self, cache_dir: str):
+        self.console = Console()
+        self.cache_dir = cache_dir
+
+    def _dir(self, symbol: str, interval: str) -> str:
+        return os.path.join(self.cache_dir, interval, symbol)
+
+    def read_index(self, symbol: str, interval: str) -> Dict:
+        path = os.path.join(self._dir(symbol, interval), "index.json")
+        if not os.path.exists(path):
+            return {"rows": 0, "first_open_time": None, "last_open_time": None, "months": {}}
+        with open(path, "r") as f:
+            return json.load(f)
+
+    def open(self, symbol: str, interval: str) -> MmapKlines:
+        """Memory-map the cached klines of a symbol."""
+        return MmapKlines(self._dir(symbol, interval), self.read_index(symbol, interval))
+
+    def refresh(self, symbols: List[str], config: AppConfig, con=None) -> int:
+        """Sync the cache with the klines of config.db_path, read through `con` if given. Returns rows written."""
+        if not config.db_path or config.data_type != "klines":
+            return 0
+
+        self.console.print(f"[bold blue]Refreshing mmap kline cache: {self.cache_dir}...[/]")
+        written = 0
+        try:
+            own = con is None
+            if own:
+                import duckdb
+                con = duckdb.connect(config.db_path, read_only=True)
+            try:
+                for symbol in symbols:
+                    written += self.refresh_symbol(con, symbol, config.data_frequency)
+            finally:
+                if own:
+                    con.close()
+            self.console.print(f"[bold green]Cached {written} new or changed klines.[/]")
+        except Exception as e:
+            self.console.print(f"[bold red]Error refreshing mmap cache: {e}[/]")
+        return written
+
+    def refresh_symbol(self, con, symbol: str, interval: str) -> int:
+        """
+        Bring the cached klines of one symbol in line with the database. Returns rows written.
+
+        Rows newer than the cached ones are appended. When the cached rows of
+        a month no longer match the database (replaced by an archive,
+        backfilled, re-published), the cache is rewritten from that month on.
+        """
+        path = self._dir(symbol, interval)
+        index = self.read_index(symbol, interval)
+        last = index["last_open_time"]
+        # Caches written before checksums were kept are rewritten once
+        cached = index.get("checksums", None if index["rows"] else {})
+
+        # Count and hash of each month, in full and over the rows the cache holds
+        row_hash = f"hash({', '.join(MMAP_COLUMNS)})"
+        old = "open_time <= ?" if last is not None else "false"
+        stats = con.execute(f"""
+            SELECT strftime(epoch_ms(open_time), '%Y-%m') AS month, min(open_time), max(open_time),
+                   count(*), bit_xor({row_hash}),
+                   count(*) FILTER (WHERE {old}), bit_xor({row_hash}) FILTER (WHERE {old})
+            FROM klines WHERE symbol = ? AND interval = ?
+            GROUP BY month ORDER BY month
+        """, ([last] * 2 if last is not None else []) + [symbol, interval]).fetchall()
+        checksums = {month: [count, checksum] for month, _, _, count, checksum, _, _ in stats}
+        current = {month: [count, checksum] for month, _, _, _, _, count, checksum in stats if count}
+        changed = sorted(month for month in set(current) | set(index["months"])
+                         if cached is None or current.get(month) != cached.get(month))
+
+        rows, months = index["rows"], dict(index["months"])
+        query = f"SELECT {', '.join(MMAP_COLUMNS)} FROM klines WHERE symbol = ? AND interval = ?"
+        params = [symbol, interval]
+        if changed:
+            # Rewrite from the first row of the first changed month on
+            first = changed[0]
+            rows = min([offset for month, offset in months.items() if month >= first], default=rows)
+            months = {month: offset for month, offset in months.items() if month < first}
+            query += " AND open_time >= ?"
+            params.append(to_epoch_ms(f"{first}-01"))
+        elif last is not None:
+            query += " AND open_time > ?"
+            params.append(last)
+        data = con.execute(query + " ORDER BY open_time", params).fetchnumpy()
+        count = len(data["open_time"])
+        if not count and not changed:
+            return 0
+
+        os.makedirs(path, exist_ok=True)
+        for name, dtype in MMAP_COLUMNS.items():
+            column_path = os.path.join(path, f"{name}.bin")
+            values = np.ascontiguousarray(data[name], dtype=dtype).tobytes()
+            if changed:
+                # Rewritten as a new file, readers keep mapping the old one
+                prefix = b""
+                if os.path.exists(column_path):
+                    with open(column_path, "rb") as f:
+                        prefix = f.read(rows * np.dtype(dtype).itemsize)
+                with open(column_path + ".tmp", "wb") as f:
+                    f.write(prefix + values)
+                os.replace(column_path + ".tmp", column_path)
+                continue
+            with open(column_path, "ab") as f:
+                # Drop bytes of an earlier append whose index update never happened
+                f.truncate(rows * np.dtype(dtype).itemsize)
+                f.write(values)
+
+        open_time = np.asarray(data["open_time"])
+        month_keys, first_rows = np.unique(open_time.astype("datetime64[ms]").astype("datetime64[M]"), return_index=True)
+        for month, offset in zip(month_keys.astype(str), first_rows):
+            months.setdefault(month, rows + int(offset))
+
+        # The cache now holds exactly the rows of the database
+        index.update({
+            "rows": rows + count,
+            "first_open_time": stats[0][1] if stats else None,
+            "last_open_time": stats[-1][2] if stats else None,
+            "months": months,
+            "checksums": checksums,
+        })
+        tmp_path = os.path.join(path, "index.json.tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(index, f)
+        os.replace(tmp_path, os.path.join(path, "index.json"))
+        return count
@@ -0,0 +1,192 @@
+import json
+import os
+import numpy as np
+from typing import Dict, List, Optional, Sequence
+from .loader import KLINES_CSV_COLUMNS
+from .timeutils import INTERVAL_MS, INTERVAL_OFFSET_MS, TimeLike, to_epoch_ms
+
+# Cells (rows x symbols) per block, about 64 MB per float64 field
+BLOCK_CELLS = 8_000_000
+
+DAY_MS = 86_400_000
+
+
+def ffill(block: np.ndarray, carry: np.ndarray) -> np.ndarray:
+    """Forward-fill NaNs down the rows of a block, starting from the `carry` row."""
+    filled = np.vstack([carry[None, :], block])
+    rows = np.where(np.isnan(filled), 0, np.arange(len(filled))[:, None])
+    np.maximum.accumulate(rows, axis=0, out=rows)
+    return filled[rows, np.arange(filled.shape[1])][1:]
+
+
+class Panel:
+    """Memory-mapped time x symbol matrices of one interval."""
+
+    def __init__(self, path: str, index: Dict):
+        self.path = path
+        self.index = index
+        self.symbols: List[str] = index["symbols"]
+        self.fields: List[str] = index["fields"]
+        self.rows: int = index["rows"]
+        self.step = INTERVAL_MS[index["interval"]]
+
+    def __getitem__(self, field: str) -> np.ndarray:
+        if field not in self.fields:
+            raise KeyError(field)
+        shape = (self.rows, len(self.symbols))
+        if not self.rows:
+            return np.empty(shape)
+        return np.memmap(os.path.join(self.path, f"{field}.bin"), dtype=np.float64, mode="r", shape=shape)
+
+    def times(self) -> np.ndarray:
+        """Open time (epoch ms) of every row."""
+        return self.index["start_time"] + np.arange(self.rows, dtype=np.int64) * self.step
+
+    def row_range(self, start: TimeLike = None, end: TimeLike = None) -> slice:
+        """Rows with start <= open_time < end."""
+        start_ms, end_ms = to_epoch_ms(start), to_epoch_ms(end)
+        first = self.index["start_time"]
+        lo = 0 if start_ms is None else int(np.clip(-(-(start_ms - first) // self.step), 0, self.rows))
+        hi = self.rows if end_ms is None else int(np.clip(-(-(end_ms - first) // self.step), 0, self.rows))
+        return slice(lo, hi)
+
+
+class PanelBuilder:
+    """
+    Builds aligned time x symbol matrices of kline fields from the klines table.
+
+    Every (interval, field) is one raw float64 file of rows x symbols in
+    row-major order next to index.json with the symbols (column order),
+    fields, fill policy, first open time and row count. The time axis is the
+    regular interval grid; missing klines are NaN, or carry the last value
+    with fill="ffill". Blocks of rows are queried, filled and written one at
+    a time, so memory is bounded by BLOCK_CELLS. Updates rewrite only the
+    last `lookback_ms` of rows, to pick up late data, and append new ones.
+
+    Usage:
+        builder = PanelBuilder("crypto_data.duckdb", "./panels")
+        builder.build(["BTCUSDT", "ETHUSDT"], "1h", ["close", "volume"], start="2024-01-01")
+        panel = builder.open("1h")
+        closes = panel["close"][panel.row_range("2024-03-01", "2024-04-01")]
+    """
+
+    def __init__(self, db_path: str, panel_dir: str):
+        self.db_path = db_path
+        self.panel_dir = panel_dir
+
+    def _dir(self, interval: str) -> str:
+        return os.path.join(self.panel_dir, interval)
+
+    def read_index(self, interval: str) -> Optional[Dict]:
+        path = os.path.join(self._dir(interval), "index.json")
+        if not os.path.exists(path):
+            return None
+        with open(path, "r") as f:
+            return json.load(f)
+
+    def open(self, interval: str) -> Panel:
+        index = self.read_index(interval)
+        if index is None:
+            raise FileNotFoundError(f"No panel for {interval} in {self.panel_dir}")
+        return Panel(self._dir(interval), index)
+
+    def build(self, symbols: Sequence[str], interval: str, fields: Sequence[str] = ("close", "volume"),
+              start: TimeLike = None, end: TimeLike = None, fill: str = "ffill",
+              lookback_ms: int = DAY_MS) -> int:
+        """Create or extend the panel of an interval up to `end`. Returns the row count."""
+        if interval not in INTERVAL_MS:
+            raise ValueError(f"Panels need a fixed-length interval, got {interval}")
+        unknown = [f for f in fields if f not in KLINES_CSV_COLUMNS]
+        if unknown:
+            raise ValueError(f"Unknown kline fields: {unknown}")
+        if fill not in ("ffill", "nan"):
+            raise ValueError("fill must be 'ffill' or 'nan'")
+
+        symbols, fields = list(symbols), list(fields)
+        index = self.read_index(interval)
+        if index is not None and (index["symbols"], index["fields"], index["fill"]) != (symbols, fields, fill):
+            raise ValueError(f"The {interval} panel in {self.panel_dir} was built with other symbols, "
+                             "fields or fill policy; use another panel_dir")
+
+        import duckdb
+        con = duckdb.connect(self.db_path, read_only=True)
+        try:
+            return self._build(con, symbols, interval, fields, start, end, fill, lookback_ms, index)
+        finally:
+            con.close()
+
+    def _build(self, con, symbols: List[str], interval: str, fields: List[str], start: TimeLike,
+               end: TimeLike, fill: str, lookback_ms: int, index: Optional[Dict]) -> int:
+        step = INTERVAL_MS[interval]
+        offset = INTERVAL_OFFSET_MS.get(interval, 0)
+        placeholders = ", ".join("?" for _ in symbols)
+        first, last = con.execute(
+            f"SELECT min(open_time), max(open_time) FROM klines WHERE interval = ? AND symbol IN ({placeholders})",
+            [interval] + symbols
+        ).fetchone()
+        if first is None:
+            return index["rows"] if index else 0
+
+        if index is None:
+            start_ms = to_epoch_ms(start) if start is not None else first
+            start_ms = -(-(start_ms - offset) // step) * step + offset
+            index = {"symbols": symbols, "fields": fields, "fill": fill, "interval": interval,
+                     "start_time": start_ms, "rows": 0}
+        start_ms = index["start_time"]
+        end_ms = to_epoch_ms(end) if end is not None else last + step
+        total_rows = max(0, -(-(end_ms - start_ms) // step))
+
+        # Rewrite the trailing rows, late klines may have arrived since
+        resume_row = min(max(0, index["rows"] - lookback_ms // step), total_rows)
+        path = self._dir(interval)
+        os.makedirs(path, exist_ok=True)
+        n = len(symbols)
+        carry = {f: self._row(path, f, resume_row - 1, n) for f in fields}
+
+        order = np.argsort(np.array(symbols, dtype=object))
+        sorted_symbols = np.array(symbols, dtype=object)[order]
+        block_rows = max(1, BLOCK_CELLS // n)
+
+        handles = {}
+        for f in fields:
+            file_path = os.path.join(path, f"{f}.bin")
+            handles[f] = open(file_path, "r+b" if os.path.exists(file_path) else "w+b")
+        try:
+            for block_start in range(resume_row, total_rows, block_rows):
+                block_end = min(block_start + block_rows, total_rows)
+                t0 = start_ms + block_start * step
+                data = con.execute(f"""
+                    SELECT symbol, open_time, {', '.join(fields)} FROM klines
+                    WHERE interval = ? AND symbol IN ({placeholders}) AND open_time >= ? AND open_time < ?
+                """, [interval] + symbols + [t0, start_ms + block_end * step]).fetchnumpy()
+
+                rows = (np.asarray(data["open_time"]) - t0) // step
+                cols = order[np.searchsorted(sorted_symbols, np.asarray(data["symbol"], dtype=object))]
+                for f in fields:
+                    block = np.full((block_end - block_start, n), np.nan)
+                    block[rows, cols] = np.asarray(data[f], dtype=np.float64)
+                    if fill == "ffill":
+                        block = ffill(block, carry[f])
+                        carry[f] = block[-1]
+                    handles[f].seek(block_start * n * 8)
+                    handles[f].write(np.ascontiguousarray(block).tobytes())
+            for handle in handles.values():
+                handle.truncate(total_rows * n * 8)
+        finally:
+            for handle in handles.values():
+                handle.close()
+
+        index["rows"] = total_rows
+        tmp_path = os.path.join(path, "index.json.tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(index, f)
+        os.replace(tmp_path, os.path.join(path, "index.json"))
+        return total_rows
+
+    def _row(self, path: str, field: str, row: int, n: int) -> np.ndarray:
+        """One stored row of a field (NaNs before the first row), the carry for forward fill."""
+        if row < 0:
+            return np.full(n, np.nan)
+        with open(os.path.join(path, f"{field}.bin"), "rb") as f:
+            f.seek(row * n * 8)
+            return np.frombuffer(f.read(n * 8), dtype=np.float64).copy()
@@ -0,0 +1,62 @@
+import re
+from typing import List, Optional, Tuple
+from .timeutils import next_month_ms, to_epoch_ms
+
+DAY_MS = 86_400_000
+
+PERIOD_PATTERN = re.compile(r"(\d{4}-\d{2}(?:-\d{2})?)\.(?:zip|csv|parquet)$")
+
+
+def archive_period(name: str) -> Optional[str]:
+    """Date covered by an archive or CSV: "YYYY-MM" for monthly, "YYYY-MM-DD" for daily files."""
+    match = PERIOD_PATTERN.search(name)
+    return match.group(1) if match else None
+
+
+def period_range(name: str) -> Optional[Tuple[int, int]]:
+    """[start, end) in epoch ms of the day or month an archive or CSV covers."""
+    period = archive_period(name)
+    if not period:
+        return None
+    if len(period) == 7:
+        start = to_epoch_ms(f"{period}-01")
+        return start, next_month_ms(start)
+    start = to_epoch_ms(period)
+    return start, start + DAY_MS
+
+
+def select_hybrid(monthly: List[Tuple[str, int]], daily: List[Tuple[str, int]]) -> List[Tuple[str, int]]:
+    """
+    Combine monthly and daily listings of one symbol.
+
+    Every monthly archive is kept; daily archives are kept only for months
+    without a monthly archive, i.e. the current month and any month whose
+    monthly file is not published yet.
+    """
+    months = {archive_period(url) for url, _ in monthly}
+    return monthly + [(url, size) for url, size in daily
+                      if (archive_period(url) or "")[:7] not in months]
+
+
+def compacted_path(path: str) -> Optional[str]:
+    """Monthly Parquet file the daily CSV (or archive) `path` is compacted into, None for monthly files."""
+    period = archive_period(path)
+    if not period or len(period) != 10:
+        return None
+    return path[:path.rindex("-")] + ".parquet"
+
+
+def superseded_daily(paths: List[str]) -> List[str]:
+    """
+    Daily CSVs among `paths` whose month is also covered by a monthly CSV
+    among them, and compacted monthly Parquet files with such a CSV.
+    """
+    # Daily and monthly files of a dataset share the "<SYMBOL>-<frequency>-" stem
+    monthly = set()
+    for path in paths:
+        period = archive_period(path)
+        if period and len(period) == 7 and path.endswith(".csv"):
+            monthly.add(path[:-len(".csv")])
+    return [path for path in paths
+            if ((archive_period(path) or "").count("-") == 2 and path[:-len("-DD.csv")] in monthly)
+            or (path.endswith(".parquet") and path[:-len(".parquet")] in monthly)]
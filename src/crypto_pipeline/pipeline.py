@@ -1,8 +1,33 @@
-from typing import Union, Dict
+from typing import Union, Dict, List, Optional, Tuple
 from rich.console import Console
-from rich.progress import Progress
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from rich.progress import Progress, TaskID
+from concurrent.futures import Executor, Future, ThreadPoolExecutor, as_completed
+from contextlib import nullcontext
 import os
+import threading
+from .config import AppConfig
+from .symbol_fetcher import SymbolFetcher
+from .downloader import Downloader
+from .extractor import Extractor
+from .verifier import Verifier
+from .loader import DuckDBLoader
+from .schema_monitor import SAMPLE_BYTES, SchemaMonitor
+from .scheduler import DownloadScheduler
+from .journal import RunJournal, default_journal_path, LISTED, DOWNLOADED, EXTRACTED, FAILED, VERIFIED, LOADED
+
+def package_version() -> str:
+    """Version of the installed package, from its metadata."""
+    from importlib.metadata import PackageNotFoundError, version
+    try:
+        return version("crypto-analytical-pipeline")
+    except PackageNotFoundError:
+        return "unknown"
+
+class Pipeline:
+    """
+    Main pipeline orchestrator.
+
+    Usage:
         config = { ... }
         pipeline = Pipeline(config)
         pipeline.run()
@@ -26,28 +51,327 @@ import os
         self.verifier = Verifier()
         self.loader = DuckDBLoader()
         self.schema_monitor = SchemaMonitor()
+        self.resampler = None
+        if self.config.derive_from:
+            from .resampler import KlineResampler
+            self.resampler = KlineResampler()
+        self.bar_aggregator = None
+        if self.config.bars:
+            from .bars import BarAggregator
+            self.bar_aggregator = BarAggregator()
+        self.tail_syncer = None
+        if self.config.tail_sync:
+            from .tail_sync import TailSyncer
+            self.tail_syncer = TailSyncer()
+        self.compactor = None
+        if self.config.compact:
+            from .compactor import Compactor
+            self.compactor = Compactor()
+        self.profiler = None
+        if self.config.profile_dir:
+            from .profiler import StageProfiler
+            self.profiler = StageProfiler(self.config.profile_dir)
+        self.journal: Optional[RunJournal] = None
+
+    def run(self, resume: bool = False, retry_failed: bool = False):
+        """
+        Execute the pipeline.
 
-    def run(self):
-        """Execute the pipeline."""
-        self.console.print(f"[bold green]Starting Pipeline (v0.5.0)[/]")
+        Every run keeps a journal of its units; `resume` continues an
+        interrupted run and `retry_failed` reprocesses only failed units.
+        """
+        self.console.print(f"[bold green]Starting Pipeline (v{package_version()})[/]")
         self.console.print(f"Asset Type: {self.config.asset_type}")
         self.console.print(f"Time Period: {self.config.time_period}")
+
+        if self.config.derive_from:
+            self._run_derived()
+            return
+
+        if resume or retry_failed:
+            self._recover(retry_failed)
+            return
+
+        # 0-1. Schema check, symbols and batching
+        current_batch = self._prepare()
+        if current_batch is None:
+            return
+
+        self.journal = RunJournal(default_journal_path(self.config))
+        try:
+            # 2-3. List, Download & Extract, downloads start with the first listing page
+            self._stream(current_batch)
+
+            # 4-5. Verify & Load
+            self._finalize(current_batch)
+        finally:
+            self._close_journal()
         
-        # 0. Schema Check
-        if not self.schema_monitor.check_schema(self.config):
+        self.console.print("[bold green]\nPipeline execution completed successfully.[/]")
+
+    def _recover(self, retry_failed: bool):
+        """Continue the journaled run of this dataset and batch, or retry its failed units."""
+        journal_path = default_journal_path(self.config)
+        state = RunJournal.replay(journal_path)
+        if state is None:
+            self.console.print(f"[bold red]No journal found at {journal_path}[/]")
+            return
+
+        if retry_failed or state.listing_complete:
+            if retry_failed:
+                download_urls = state.failed()
+                symbols = sorted({self.symbol_from_url(url) for url in download_urls})
+            else:
+                download_urls = state.pending()
+                symbols = [symbol for symbol in state.batch if state.symbols.get(symbol) != LOADED]
+            if not self.schema_monitor.check_schema(self.config, download_urls[0] if download_urls else None):
+                self.console.print("[bold red]Aborting pipeline due to schema mismatch.[/]")
+                return
+            self.journal = RunJournal(journal_path, append=True)
+        else:
+            # Interrupted while listing: list again, skipping what was already extracted
+            symbols = self._prepare()
+            if symbols is None:
+                return
+            extracted = set(state.with_state(EXTRACTED))
+            with self._stage("list"):
+                listed = self.downloader.download(symbols, self.config)
+            download_urls = [url for url in listed if url not in extracted]
+            self.journal = RunJournal(journal_path, append=True)
+            self.journal.record_listing(symbols, download_urls)
+
+        self.console.print(f"[bold green]{'Retrying' if retry_failed else 'Resuming'} {len(download_urls)} files "
+                           f"for {len(symbols)} symbols from {journal_path}[/]")
+        try:
+            self._transfer(download_urls)
+            if symbols:
+                self._finalize(symbols)
+        finally:
+            self._close_journal()
+        self.console.print("[bold green]\nPipeline execution completed successfully.[/]")
+
+    def _close_journal(self):
+        """Close the journal and point at --retry-failed when units failed."""
+        if self.journal is None:
+            return
+        self.journal.close()
+        state = RunJournal.replay(self.journal.path)
+        failed = state.failed() if state else []
+        if failed:
+            self.console.print(f"[bold red]{len(failed)} files failed, see {self.journal.path}. "
+                               f"Re-run with --retry-failed to process only those.[/]")
+        self.journal = None
+
+    def _stage(self, name: str):
+        """Profiling scope of a pipeline stage, a no-op unless profile_dir is set."""
+        return self.profiler.stage(name) if self.profiler is not None else nullcontext()
+
+    def _journal(self, unit: str, state: str, reason: Optional[str] = None):
+        if self.journal is not None:
+            self.journal.record(unit, state, reason)
+
+    def plan(self, plan_path: Optional[str] = None) -> Optional["DownloadPlan"]:
+        """List the batch without downloading, print the estimate and save the plan."""
+        from .planner import Planner, default_plan_path
+        current_batch = self._prepare()
+        if current_batch is None:
+            return None
+
+        with self._stage("list"):
+            plan = Planner(self.downloader).plan(current_batch, self.config)
+        Planner.print_plan(plan, self.console)
+        plan_path = plan_path or default_plan_path(self.config)
+        plan.save(plan_path)
+        self.console.print(f"[bold green]Plan saved to {plan_path}[/]")
+        return plan
+
+    def execute(self, plan_path: Optional[str] = None):
+        """Download, extract, verify and load the pending files of a saved plan, skipping listing."""
+        from .planner import DownloadPlan, default_plan_path, format_bytes
+        plan_path = plan_path or default_plan_path(self.config)
+        plan = DownloadPlan.load(plan_path)
+        if plan.dataset != self.config.dataset_key:
+            raise ValueError(f"Plan {plan_path} is for {plan.dataset}, not {self.config.dataset_key}")
+
+        self.console.print(f"[bold green]Executing plan {plan_path}: {len(plan.items)} files, "
+                           f"{format_bytes(plan.pending_bytes)}[/]")
+        if not self.schema_monitor.check_schema(self.config, plan.items[0].url if plan.items else None):
             self.console.print("[bold red]Aborting pipeline due to schema mismatch.[/]")
             return
 
+        self.journal = RunJournal(default_journal_path(self.config))
+        try:
+            self.journal.record_listing(plan.symbols, [item.url for item in plan.items])
+            self._transfer([item.url for item in plan.items], {item.url: item.size for item in plan.items})
+            self._finalize(plan.symbols)
+        finally:
+            self._close_journal()
+        self.console.print("[bold green]\nPipeline execution completed successfully.[/]")
+
+    def _prepare(self) -> Optional[List[str]]:
+        """Check the schema, fetch symbols and return the current batch (None to abort)."""
         # Create directory
         os.makedirs(self.config.destination_dir, exist_ok=True)
 
-        # 1. Fetch Symbols
+        # 0-1. Schema Check and Fetch Symbols, concurrently as both are network bound
+        with self._stage("fetch"), ThreadPoolExecutor(max_workers=2, thread_name_prefix="fetch") as executor:
+            schema_future = executor.submit(self.schema_monitor.check_schema, self.config)
+            symbols_future = executor.submit(self.fetcher.get_symbols, self.config)
+            schema_ok = schema_future.result()
+            symbols = symbols_future.result()
+
+        if not schema_ok:
+            self.console.print("[bold red]Aborting pipeline due to schema mismatch.[/]")
+            return None
+        if not symbols:
+            self.console.print("[bold red]No symbols found[/]")
+            return None
+
+        current_batch = self.select_batch(symbols)
+        self.console.print(f"\n[bold green]Processing batch {self.config.batch_number}/{self.config.total_batches} ({len(current_batch)} symbols)[/]")
+        return current_batch
+
+    def _stream(self, symbols: List[str]):
+        """
+        List the symbols and download and extract their archives in one pass.
+
+        Every listing page is journaled and its archives are submitted for
+        download right away, so transfers start with the first page instead
+        of after the whole listing phase. Without a reference schema
+        fingerprint yet, the first listed archive is sampled before any
+        download starts. The listing is marked complete in the journal once
+        every symbol was listed.
+        """
+        self.console.print(f"[blue]Fetching URLs for {len(symbols)} symbols...[/]")
+        lock = threading.Lock()
+        futures = []
+        with Progress() as progress, self._stage("download"), self._stage("extract"):
+            list_task = progress.add_task("[blue]Listing...", total=len(symbols))
+            dl_task = progress.add_task("[cyan]Downloading...", total=0)
+            ex_task = progress.add_task("[green]Extracting...", total=0)
+
+            with ThreadPoolExecutor(max_workers=self.config.max_workers, thread_name_prefix="list") as list_executor, \
+                 ThreadPoolExecutor(max_workers=self.config.max_workers, thread_name_prefix="download") as dl_executor, \
+                 ThreadPoolExecutor(max_workers=self.config.max_extract_workers,
+                                    thread_name_prefix="extract") as ex_executor:
+                scheduler = DownloadScheduler(dl_executor, self.config.download_order)
+                with self._stage("list"):
+                    listings = self.submit_listings(symbols, list_executor, scheduler, ex_executor,
+                                                    progress, dl_task, ex_task, lock, futures)
+                    for future in as_completed(listings):
+                        future.result()
+                        progress.advance(list_task)
+                if self.journal is not None:
+                    self.journal.record_listing_complete(symbols)
+
+                # No listing is running anymore, so futures is complete
+                for _ in as_completed(futures):
+                    pass
+        self.extractor.close()
+        self.downloader.report_cache(self.config)
+
+    def submit_listings(self, symbols: List[str], list_executor: Executor, scheduler: DownloadScheduler,
+                        ex_executor: Executor, progress: Progress, dl_task: TaskID, ex_task: TaskID,
+                        lock: threading.Lock, futures: List[Future]) -> List[Future]:
+        """
+        Submit the listing of every symbol and return the listing futures.
+
+        Each listing page is journaled and its archives are queued on
+        `scheduler` as soon as it arrives; their download futures are
+        appended to `futures` under `lock`.
+        """
+        def on_page(page: List[Tuple[str, int]]):
+            with lock:
+                if not self.schema_monitor.has_reference(self.config):
+                    self.schema_monitor.check_schema(self.config, page[0][0])
+                for url, _ in page:
+                    self._journal(url, LISTED)
+                progress.update(dl_task, total=progress.tasks[dl_task].total + len(page))
+                progress.update(ex_task, total=progress.tasks[ex_task].total + len(page))
+                futures.extend(scheduler.submit_many(page, self.process_download,
+                                                     ex_executor, progress, dl_task, ex_task))
+
+        return [list_executor.submit(self.downloader.list_objects, symbol, self.config, on_page)
+                for symbol in symbols]
+
+    def _transfer(self, download_urls: List[str], sizes: Optional[Dict[str, int]] = None):
+        """Download all URLs in the configured order and extract them concurrently."""
+        with Progress() as progress, self._stage("download"), self._stage("extract"):
+            dl_task = progress.add_task("[cyan]Downloading...", total=len(download_urls))
+            ex_task = progress.add_task("[green]Extracting...", total=len(download_urls))
+            
+            with ThreadPoolExecutor(max_workers=self.config.max_workers, thread_name_prefix="download") as dl_executor, \
+                 ThreadPoolExecutor(max_workers=self.config.max_extract_workers,
+                                    thread_name_prefix="extract") as ex_executor:
+                scheduler = DownloadScheduler(dl_executor, self.config.download_order)
+                futures = scheduler.submit_many([(url, (sizes or {}).get(url)) for url in download_urls],
+                                                self.process_download, ex_executor, progress, dl_task, ex_task)
+                for _ in as_completed(futures):
+                    pass
+        self.extractor.close()
+        self.downloader.report_cache(self.config)
+
+    def _finalize(self, symbols: List[str], con=None):
+        """
+        Verify and load the batch, refresh derived caches, then compact closed months.
+
+        With `con`, every database stage goes through that DuckDB connection
+        instead of opening its own.
+        """
+        # 4. Verify
+        with self._stage("verify"):
+            self.verifier.verify(symbols, self.config)
+        if self.journal is not None:
+            self.journal.record_symbols(symbols, VERIFIED)
+        
+        # 5. Load
+        with self._stage("load"):
+            self.loader.load(symbols, self.config, con)
+            if self.bar_aggregator:
+                self.bar_aggregator.flush(self.config, con)
+            if self.config.tail_sync:
+                self.tail_syncer.sync(symbols, self.config, con=con)
+        if self.journal is not None:
+            self.journal.record_symbols(symbols, LOADED)
+        with self._stage("after_load"):
+            self.after_load(symbols, con)
+
+        # 6. Compact closed months once their files are verified and loaded
+        if self.compactor is not None:
+            with self._stage("compact"):
+                self.compactor.compact(symbols, self.config)
+
+    def compact(self, symbols: Optional[List[str]] = None) -> int:
+        """Compact the closed months of `symbols`, by default of every symbol of the dataset on disk."""
+        from .compactor import Compactor
+        compactor = self.compactor or Compactor()
+        if symbols is None:
+            symbols = compactor.local_symbols(self.config)
+        return compactor.compact(symbols, self.config)
+
+    def _run_derived(self):
+        """Build the configured interval from already loaded klines instead of downloading it."""
         symbols = self.fetcher.get_symbols(self.config)
         if not symbols:
             self.console.print("[bold red]No symbols found[/]")
             return
 
-        # Batching
+        current_batch = self.select_batch(symbols)
+        self.resampler.derive(current_batch, self.config)
+        self.after_load(current_batch)
+        self.console.print("[bold green]\nPipeline execution completed successfully.[/]")
+
+    def after_load(self, symbols: List[str], con=None):
+        """Refresh derived features and read caches once new data is in the database (through `con` if given)."""
+        if self.config.features:
+            from .features import FeatureEngine  # duckdb is only needed here
+            FeatureEngine().update(symbols, self.config, con)
+        if self.config.mmap_cache_dir:
+            from .mmap_cache import MmapKlineCache  # numpy is only needed here
+            MmapKlineCache(self.config.mmap_cache_dir).refresh(symbols, self.config, con)
+
+    def select_batch(self, symbols: List[str]) -> List[str]:
+        """Return the slice of symbols handled by the configured batch."""
         batch_size_total = len(symbols) // self.config.total_batches
         remainder = len(symbols) % self.config.total_batches
         batches = []
@@ -57,48 +381,77 @@ import os
             batches.append(symbols[start:end])
             start = end
 
-        current_batch = batches[self.config.batch_number-1]
-        self.console.print(f"\n[bold green]Processing batch {self.config.batch_number}/{self.config.total_batches} ({len(current_batch)} symbols)[/]")
+        return batches[self.config.batch_number-1]
 
-        # 2. Download
-        download_urls = self.downloader.download(current_batch, self.config)
-        
-        # 3. Download & Extract Execution
-        with Progress() as progress:
-            dl_task = progress.add_task("[cyan]Downloading...", total=len(download_urls))
-            ex_task = progress.add_task("[green]Extracting...", total=len(download_urls))
-            
-            with ThreadPoolExecutor(max_workers=self.config.max_workers) as dl_executor, \
-                 ThreadPoolExecutor(max_workers=self.config.max_extract_workers) as ex_executor:
-                
-                def process_download(url):
-                    parts = url.split('/')
-                    if self.config.asset_type == "spot":
-                        symbol = parts[7]
-                    elif self.config.asset_type == "option":
-                        symbol = parts[7]
-                    else:
-                        symbol = parts[8]
-                    final_path = os.path.join(self.config.destination_dir, self.config.asset_type, symbol, self.config.data_frequency)
-                    os.makedirs(final_path, exist_ok=True)
-                    
-                    try:
-                        content = self.downloader.download_file(url, final_path, self.config)
-                        ex_executor.submit(self.extractor.extract, content, final_path, self.config).add_done_callback(
-                            lambda _: progress.advance(ex_task)
-                        )
-                        progress.advance(dl_task)
-                    except Exception:
-                        pass # Error handled in downloader
-
-                futures = [dl_executor.submit(process_download, url) for url in download_urls]
-                for _ in as_completed(futures):
-                    pass
+    def symbol_from_url(self, url: str) -> str:
+        """Extract the symbol from a data.binance.vision download URL."""
+        parts = url.split('/')
+        if self.config.asset_type in ("spot", "option"):
+            return parts[7]
+        return parts[8]
 
-        # 4. Verify
-        self.verifier.verify(current_batch, self.config)
-        
-        # 5. Load
-        self.loader.load(current_batch, self.config)
-        
-        self.console.print("[bold green]\nPipeline execution completed successfully.[/]")
+    def extract_archive(self, archive: Union[bytes, str], final_path: str, url: str) -> int:
+        """
+        Extract one archive and, when bars are configured, aggregate its trades right away.
+        `archive` is the archive's content, or in process mode the path it was spooled to.
+        """
+        try:
+            if isinstance(archive, str):
+                count = self.extractor.extract_path(archive, final_path, self.config)
+            else:
+                count = self.extractor.extract(archive, final_path, self.config)
+        except Exception as e:
+            self._journal(url, FAILED, f"extract: {e}")
+            return 0
+        if self.bar_aggregator:
+            csv_path = os.path.join(final_path, os.path.basename(url).replace(".zip", ".csv"))
+            try:
+                if os.path.exists(csv_path):
+                    self.bar_aggregator.aggregate_file(csv_path, self.symbol_from_url(url), self.config)
+            except Exception as e:
+                self.console.print(f"[bold red]Error aggregating {os.path.basename(csv_path)}: {e}[/]")
+                self._journal(url, FAILED, f"aggregate: {e}")
+                return count
+        self._journal(url, EXTRACTED)
+        return count
+
+    def quarantine_archive(self, archive: Union[bytes, str], url: str):
+        """Keep an archive (content or spooled path) whose layout drifted in the quarantine directory instead of extracting it."""
+        reason = self.schema_monitor.drift_reasons.get(url, "schema drift")
+        quarantine_dir = os.path.join(self.config.destination_dir, "quarantine")
+        os.makedirs(quarantine_dir, exist_ok=True)
+        quarantine_path = os.path.join(quarantine_dir, os.path.basename(url))
+        if isinstance(archive, str):
+            os.replace(archive, quarantine_path)
+        else:
+            with open(quarantine_path, "wb") as f:
+                f.write(archive)
+        self._journal(url, FAILED, f"schema: {reason}")
+
+    def process_download(self, url: str, ex_executor: Executor, progress: Progress, dl_task: TaskID, ex_task: TaskID):
+        """Download one archive and hand it to the extraction executor."""
+        final_path = self.config.dataset_dir(self.symbol_from_url(url))
+        os.makedirs(final_path, exist_ok=True)
+
+        try:
+            if self.config.extract_mode == "process":
+                # Written straight to the spool file the worker process extracts
+                archive = self.extractor.spool_path(self.config)
+                self.downloader.download_to(url, archive, self.config)
+                with open(archive, "rb") as f:
+                    head = f.read(SAMPLE_BYTES)
+            else:
+                archive = head = self.downloader.download_file(url, final_path, self.config)
+            self._journal(url, DOWNLOADED)
+            if not self.schema_monitor.check_archive(head, url, self.config):
+                self.quarantine_archive(archive, url)
+                progress.advance(dl_task)
+                progress.advance(ex_task)
+                return
+            ex_executor.submit(self.extract_archive, archive, final_path, url).add_done_callback(
+                lambda _: progress.advance(ex_task)
+            )
+            progress.advance(dl_task)
+        except Exception as e:
+            # Reported by the downloader, kept in the journal for --retry-failed
+            self._journal(url, FAILED, f"download: {e}")
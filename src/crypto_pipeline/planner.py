@@ -0,0 +1,255 @@
+import calendar
+import json
+import os
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, List, Optional, Set, Tuple
+from pydantic import BaseModel
+from rich.console import Console
+from .catalog import read_compacted_days
+from .config import AppConfig
+from .downloader import Downloader
+from .periods import archive_period, compacted_path
+
+# Request latency assumed when nothing could be measured
+DEFAULT_LATENCY_S = 0.2
+# Bytes read from one archive to measure the per-stream rate
+PROBE_BYTES = 2 * 1024 * 1024
+
+
+def default_plan_path(config: AppConfig) -> str:
+    """Where plans of a dataset and batch are saved by default."""
+    name = config.dataset_key.replace("/", "-")
+    return os.path.join(config.destination_dir, f"plan-{name}-{config.batch_number}of{config.total_batches}.json")
+
+
+def format_bytes(size: float) -> str:
+    for unit in ("B", "KB", "MB", "GB", "TB"):
+        if size < 1024 or unit == "TB":
+            return f"{size:.1f} {unit}"
+        size /= 1024
+
+
+def format_seconds(seconds: float) -> str:
+    minutes, secs = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}h{minutes:02d}m{secs:02d}s" if hours else f"{minutes}m{secs:02d}s"
+
+
+class PlanItem(BaseModel):
+    """One archive still to be downloaded."""
+    url: str
+    symbol: str
+    size: int
+
+
+class SymbolPlan(BaseModel):
+    """Listing totals of one symbol."""
+    symbol: str
+    files: int = 0
+    bytes: int = 0
+    pending_files: int = 0
+    pending_bytes: int = 0
+
+
+class DownloadPlan(BaseModel):
+    """Result of a dry run: what a batch would transfer and how long it should take."""
+    dataset: str
+    created_at: float
+    symbols: List[str]
+    items: List[PlanItem]
+    per_symbol: List[SymbolPlan]
+    total_files: int
+    total_bytes: int
+    pending_files: int
+    pending_bytes: int
+    bandwidth_bps: float
+    latency_s: float
+    estimated_seconds: float
+    # Where bandwidth_bps comes from, and what it assumes
+    bandwidth_source: str = ""
+
+    def save(self, path: str) -> None:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as f:
+            f.write(self.model_dump_json(indent=2))
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> "DownloadPlan":
+        with open(path, "r") as f:
+            return cls(**json.load(f))
+
+
+class Planner:
+    """
+    Dry-run planner.
+
+    Lists the archives of a batch (sizes come from the S3 listing), subtracts
+    those already extracted on disk or loaded into DuckDB, and estimates wall
+    time as transfer time at the aggregate bandwidth plus per-request latency
+    spread over the download workers. Bandwidth is taken from
+    config.bandwidth_mbps or measured by downloading one pending archive.
+    """
+
+    def __init__(self, downloader: Optional[Downloader] = None):
+        self.console = Console()
+        self.downloader = downloader or Downloader()
+
+    def plan(self, symbols: List[str], config: AppConfig) -> DownloadPlan:
+        """Build the plan of a batch of symbols."""
+        listing = self._list(symbols, config)
+        loaded = self._loaded_periods(symbols, config)
+        compacted = read_compacted_days(config)
+
+        per_symbol = {symbol: SymbolPlan(symbol=symbol) for symbol in symbols}
+        items: List[PlanItem] = []
+        for symbol, url, size in listing:
+            entry = per_symbol[symbol]
+            entry.files += 1
+            entry.bytes += size
+            if self._is_done(url, symbol, config, loaded, compacted):
+                continue
+            entry.pending_files += 1
+            entry.pending_bytes += size
+            items.append(PlanItem(url=url, symbol=symbol, size=size))
+
+        bandwidth_bps, latency_s, bandwidth_source = self._bandwidth(items, config)
+        pending_bytes = sum(item.size for item in items)
+        estimated = pending_bytes / bandwidth_bps + len(items) * latency_s / config.max_workers
+
+        return DownloadPlan(
+            dataset=config.dataset_key,
+            created_at=time.time(),
+            symbols=symbols,
+            items=items,
+            per_symbol=list(per_symbol.values()),
+            total_files=len(listing),
+            total_bytes=sum(size for _, _, size in listing),
+            pending_files=len(items),
+            pending_bytes=pending_bytes,
+            bandwidth_bps=bandwidth_bps,
+            bandwidth_source=bandwidth_source,
+            latency_s=latency_s,
+            estimated_seconds=estimated,
+        )
+
+    @staticmethod
+    def print_plan(plan: DownloadPlan, console: Console) -> None:
+        """Print per-symbol and total files and bytes with the wall time estimate."""
+        from rich.table import Table
+        table = Table(title=f"Plan for {plan.dataset}")
+        for column in ("Symbol", "Files", "Size", "Pending files", "Pending size"):
+            table.add_column(column, justify="left" if column == "Symbol" else "right")
+        for entry in plan.per_symbol:
+            table.add_row(entry.symbol, str(entry.files), format_bytes(entry.bytes),
+                          str(entry.pending_files), format_bytes(entry.pending_bytes))
+        table.add_row("[bold]Total[/]", str(plan.total_files), format_bytes(plan.total_bytes),
+                      str(plan.pending_files), format_bytes(plan.pending_bytes))
+        console.print(table)
+        source = f" ({plan.bandwidth_source})" if plan.bandwidth_source else ""
+        console.print(f"Bandwidth: {format_bytes(plan.bandwidth_bps)}/s{source}, latency: {plan.latency_s * 1000:.0f} ms")
+        console.print(f"[bold]Estimated wall time: {format_seconds(plan.estimated_seconds)}[/]")
+
+    def _list(self, symbols: List[str], config: AppConfig) -> List[Tuple[str, str, int]]:
+        """(symbol, url, size) of every archive of the batch."""
+        listing = []
+        self.console.print(f"[blue]Listing {len(symbols)} symbols...[/]")
+        with ThreadPoolExecutor(max_workers=config.max_workers) as executor:
+            futures = {executor.submit(self.downloader.list_objects, symbol, config): symbol
+                       for symbol in symbols}
+            for future in as_completed(futures):
+                symbol = futures[future]
+                listing.extend((symbol, url, size) for url, size in future.result())
+        return sorted(listing)
+
+    def _is_done(self, url: str, symbol: str, config: AppConfig, loaded: Dict[str, Set[str]],
+                 compacted: Set[Tuple[str, str]]) -> bool:
+        csv_path = os.path.join(config.dataset_dir(symbol), os.path.basename(url).replace(".zip", ".csv"))
+        if os.path.exists(csv_path):
+            return True
+        period = archive_period(url)
+        parquet = compacted_path(csv_path)
+        if parquet is not None and (parquet, period) in compacted and os.path.exists(parquet):
+            return True
+
+        days = loaded.get(symbol)
+        if not period or not days:
+            return False
+        if len(period) == 10:
+            return period in days
+        year, month = int(period[:4]), int(period[5:7])
+        month_days = {f"{period}-{day:02d}" for day in range(1, calendar.monthrange(year, month)[1] + 1)}
+        return month_days <= days
+
+    def _loaded_periods(self, symbols: List[str], config: AppConfig) -> Dict[str, Set[str]]:
+        """Days with klines already in the database, per symbol."""
+        if config.data_type != "klines" or not config.db_path or not os.path.exists(config.db_path):
+            return {}
+        import duckdb
+        loaded: Dict[str, Set[str]] = defaultdict(set)
+        try:
+            con = duckdb.connect(config.db_path, read_only=True)
+            rows = con.execute(f"""
+                SELECT DISTINCT symbol, strftime(open_ts, '%Y-%m-%d') FROM klines
+                WHERE interval = ? AND symbol IN ({', '.join('?' for _ in symbols)})
+            """, [config.data_frequency] + symbols).fetchall()
+            con.close()
+        except Exception as e:
+            self.console.print(f"[yellow]Could not read loaded periods: {e}[/]")
+            return {}
+        for symbol, day in rows:
+            loaded[symbol].add(day)
+        return loaded
+
+    def _bandwidth(self, items: List[PlanItem], config: AppConfig) -> Tuple[float, float, str]:
+        """
+        Aggregate bytes/s, per-request latency and where the bandwidth comes from.
+
+        With bandwidth_mbps set nothing is downloaded. Otherwise at most
+        PROBE_BYTES of one median-sized archive are read, with a range request,
+        and the rate of that one stream is assumed to scale linearly with the
+        download workers, up to max_bandwidth_mbps when it is set.
+        """
+        link_bps = config.bandwidth_mbps * 1_000_000 / 8 if config.bandwidth_mbps else None
+        if config.max_bandwidth_mbps:
+            # Downloads never exceed the configured budget
+            limit_bps = config.max_bandwidth_mbps * 1_000_000 / 8
+            link_bps = min(link_bps, limit_bps) if link_bps else limit_bps
+        latency_s = DEFAULT_LATENCY_S
+        stream_bps = None
+
+        if items and not config.bandwidth_mbps:
+            sample = sorted(items, key=lambda item: item.size)[len(items) // 2]
+            try:
+                started = time.monotonic()
+                response = self.downloader.http.get(sample.url, headers={"Range": f"bytes=0-{PROBE_BYTES - 1}"},
+                                                    stream=True)
+                try:
+                    response.raise_for_status()
+                    latency_s = response.elapsed.total_seconds()
+                    # Servers ignoring the range are cut off after PROBE_BYTES as well
+                    received = 0
+                    for chunk in response.iter_content(64 * 1024):
+                        received += len(chunk)
+                        if received >= PROBE_BYTES:
+                            break
+                    total_s = time.monotonic() - started
+                finally:
+                    response.close()
+                stream_bps = received / max(total_s - latency_s, 1e-3)
+            except Exception as e:
+                self.console.print(f"[yellow]Bandwidth measurement failed: {e}[/]")
+
+        if stream_bps:
+            source = f"{format_bytes(stream_bps)}/s measured on one stream, assumed to scale linearly to {config.max_workers} workers"
+            if link_bps and link_bps < stream_bps * config.max_workers:
+                return link_bps, latency_s, f"{source}, capped by max_bandwidth_mbps"
+            return stream_bps * config.max_workers, latency_s, source
+        if config.bandwidth_mbps:
+            return link_bps, latency_s, "bandwidth_mbps"
+        if link_bps:
+            return link_bps, latency_s, "max_bandwidth_mbps, not measured"
+        return 10_000_000.0, latency_s, "default, not measured"
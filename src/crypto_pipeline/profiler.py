@@ -0,0 +1,224 @@
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from contextlib import contextmanager
+from typing import Iterator, List, Optional, Tuple
+from rich.console import Console
+
+# Frames kept per traced allocation; one is enough to group them by line
+TRACE_FRAMES = 1
+
+# Innermost frames of threads waiting for work, which are not sampled
+IDLE_FRAMES = {
+    ("threading.py", "wait"), ("threading.py", "_wait_for_tstate_lock"),
+    ("queue.py", "get"), ("selectors.py", "select"), ("thread.py", "_worker"),
+}
+
+Function = Tuple[str, int, str]
+
+
+def _function(frame) -> Function:
+    code = frame.f_code
+    return code.co_filename, code.co_firstlineno, code.co_name
+
+
+def _is_idle(frame) -> bool:
+    return (os.path.basename(frame.f_code.co_filename), frame.f_code.co_name) in IDLE_FRAMES
+
+
+def _format_function(function: Function) -> str:
+    filename, line, name = function
+    return f"{name} ({filename}:{line})"
+
+
+def _mib(size: int) -> str:
+    return f"{size / 2**20:.1f} MiB"
+
+
+def _max_rss() -> Optional[int]:
+    """Peak resident set size of the process in bytes, where the platform reports it."""
+    try:
+        import resource
+    except ImportError:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss if sys.platform == "darwin" else rss * 1024
+
+
+class _Stage:
+    """Samples and snapshots collected while one stage is running."""
+
+    def __init__(self, name: str, owner: int):
+        self.name = name
+        self.owner = owner
+        self.started = time.perf_counter()
+        self.cpu_started = time.process_time()
+        self.snapshot = tracemalloc.take_snapshot()
+        self.traced_start = tracemalloc.get_traced_memory()[0]
+        self.traced_peak = self.traced_start
+        self.samples = 0
+        self.self_counts: Counter = Counter()
+        self.total_counts: Counter = Counter()
+        self.concurrent: set = set()
+
+    def add_sample(self, frame) -> None:
+        self.samples += 1
+        self.self_counts[_function(frame)] += 1
+        seen = set()
+        while frame is not None:
+            function = _function(frame)
+            if function not in seen:
+                seen.add(function)
+                self.total_counts[function] += 1
+            frame = frame.f_back
+
+
+class StageProfiler:
+    """
+    Per-stage CPU and memory profiler of pipeline runs.
+
+    Every `stage` scope is profiled on its own and writes one report to
+    `<output_dir>/<run start>/<stage>.txt` when it ends:
+
+    - hot functions, from stacks sampled every `interval` seconds by a
+      background thread. Threads of executors created with
+      `thread_name_prefix=<stage>` are counted for that stage, the thread
+      that opened a stage and any other busy thread for the most recently
+      opened stage. Threads waiting for work are not sampled.
+    - top allocators, as the growth between tracemalloc snapshots taken at
+      the start and end of the stage, with the peak of traced memory.
+
+    Stages may overlap, e.g. listing, downloading and extracting in a
+    streamed run: samples are still attributed by thread, but memory
+    figures then include the allocations of the concurrent stages, which
+    the report names. The sampler and tracemalloc only run while a stage
+    is open.
+    """
+
+    def __init__(self, output_dir: str, interval: float = 0.01, top: int = 25):
+        self.console = Console()
+        self.run_dir = os.path.join(output_dir, time.strftime("%Y%m%dT%H%M%S"))
+        self.interval = interval
+        self.top = top
+        self._lock = threading.Lock()
+        self._active: List[_Stage] = []
+        self._reports: Counter = Counter()
+        self._sampler: Optional[threading.Thread] = None
+        self._stop: Optional[threading.Event] = None
+        self._started_tracing = False
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        """Profile the enclosed block as stage `name` and write its report when it ends."""
+        with self._lock:
+            if not self._active:
+                self._start()
+            entry = _Stage(name, threading.get_ident())
+            for other in self._active:
+                other.concurrent.add(name)
+                entry.concurrent.add(other.name)
+            self._active.append(entry)
+        try:
+            yield
+        finally:
+            sampler = None
+            with self._lock:
+                self._active.remove(entry)
+                report = self._report(entry)
+                if not self._active:
+                    sampler = self._stop_sampling()
+            # The sampler takes the lock itself, so it is joined after releasing it
+            if sampler is not None and sampler is not threading.current_thread():
+                sampler.join()
+            path = self._write(name, report)
+            self.console.print(f"[dim]Profile of stage {name} written to {path}[/]")
+
+    def _start(self) -> None:
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(TRACE_FRAMES)
+            self._started_tracing = True
+        self._stop = threading.Event()
+        self._sampler = threading.Thread(target=self._sample_loop, args=(self._stop,), name="profiler", daemon=True)
+        self._sampler.start()
+
+    def _stop_sampling(self) -> Optional[threading.Thread]:
+        """Signal the sampler to stop and detach it; the caller holds the lock and joins it afterwards."""
+        self._stop.set()
+        sampler, self._sampler = self._sampler, None
+        if self._started_tracing:
+            tracemalloc.stop()
+            self._started_tracing = False
+        return sampler
+
+    def _sample_loop(self, stop: threading.Event) -> None:
+        own = threading.get_ident()
+        while not stop.wait(self.interval):
+            frames = sys._current_frames()
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            traced = tracemalloc.get_traced_memory()[0] if tracemalloc.is_tracing() else 0
+            with self._lock:
+                if not self._active:
+                    continue
+                for entry in self._active:
+                    entry.traced_peak = max(entry.traced_peak, traced)
+                for ident, frame in frames.items():
+                    if ident == own or _is_idle(frame):
+                        continue
+                    entry = self._stage_of(ident, names.get(ident, ""))
+                    if entry is not None:
+                        entry.add_sample(frame)
+
+    def _stage_of(self, ident: int, thread_name: str) -> Optional[_Stage]:
+        """The stage a thread works for: by executor name prefix, by owner, else the latest stage."""
+        prefix = thread_name.rsplit("_", 1)[0]
+        for entry in reversed(self._active):
+            if entry.name == prefix:
+                return entry
+        for entry in reversed(self._active):
+            if entry.owner == ident:
+                return entry
+        return self._active[-1]
+
+    def _report(self, entry: _Stage) -> str:
+        wall = time.perf_counter() - entry.started
+        cpu = time.process_time() - entry.cpu_started
+        # The profiler's own bookkeeping is left out of the allocators
+        snapshot = tracemalloc.take_snapshot().filter_traces(
+            [tracemalloc.Filter(False, __file__), tracemalloc.Filter(False, tracemalloc.__file__)])
+        traced = tracemalloc.get_traced_memory()[0]
+        entry.traced_peak = max(entry.traced_peak, traced)
+        allocators = [stat for stat in snapshot.compare_to(entry.snapshot, "lineno") if stat.size_diff > 0]
+        rss = _max_rss()
+
+        lines = [f"Stage: {entry.name}",
+                 f"Wall time: {wall:.3f} s, process CPU time: {cpu:.3f} s",
+                 f"Samples: {entry.samples} every {self.interval * 1000:.0f} ms"]
+        if entry.concurrent:
+            lines.append(f"Concurrent with: {', '.join(sorted(entry.concurrent))} (memory figures include them)")
+        lines.append(f"Traced memory: {_mib(traced - entry.traced_start)} net, "
+                     f"{_mib(entry.traced_peak)} peak"
+                     + (f", max RSS {_mib(rss)}" if rss is not None else ""))
+        for title, counts in (("Hot functions (self)", entry.self_counts),
+                              ("Hot functions (cumulative)", entry.total_counts)):
+            lines += ["", title, f"{'samples':>8} {'%':>6}  function"]
+            for function, count in counts.most_common(self.top):
+                lines.append(f"{count:>8} {100 * count / max(entry.samples, 1):>5.1f}%  {_format_function(function)}")
+        lines += ["", "Top allocators (growth)", f"{'size':>12} {'blocks':>8}  location"]
+        for stat in allocators[:self.top]:
+            frame = stat.traceback[0]
+            lines.append(f"{_mib(stat.size_diff):>12} {stat.count_diff:>+8}  {frame.filename}:{frame.lineno}")
+        return "\n".join(lines) + "\n"
+
+    def _write(self, name: str, report: str) -> str:
+        """Write a stage report; a stage run again in the same run gets a numbered report."""
+        os.makedirs(self.run_dir, exist_ok=True)
+        with self._lock:
+            self._reports[name] += 1
+            count = self._reports[name]
+        path = os.path.join(self.run_dir, f"{name}.txt" if count == 1 else f"{name}-{count}.txt")
+        with open(path, "w") as f:
+            f.write(report)
+        return path
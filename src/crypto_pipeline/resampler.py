@@ -0,0 +1,115 @@
+from typing import List, Optional
+from rich.console import Console
+from .config import AppConfig
+from .loader import ensure_klines_schema, record_load
+from .timeutils import INTERVAL_MS, INTERVAL_OFFSET_MS, is_derivable, normalize_ms_sql
+
+class KlineResampler:
+    """
+    Derives coarser kline intervals from finer ones inside DuckDB.
+
+    Aggregation is a single vectorized GROUP BY per call: first open, max high,
+    min low, last close and summed volumes, quote volumes, taker volumes and
+    trade counts. Source timestamps in ms or us are normalized to ms. Only
+    buckets after the last materialized one and fully covered by the source
+    are written, so repeated calls append new periods only.
+    """
+
+    def __init__(self):
+        self.console = Console()
+
+    def derive(self, symbols: List[str], config: AppConfig) -> int:
+        """Materialize config.data_frequency from config.derive_from klines in config.db_path."""
+        if not config.db_path:
+            self.console.print("[yellow]No database path provided. Skipping resampling.[/]")
+            return 0
+
+        self.console.print(f"[bold blue]Deriving {config.data_frequency} klines from {config.derive_from}...[/]")
+        try:
+            import duckdb
+            con = duckdb.connect(config.db_path)
+            rows = self.resample(con, config.data_frequency, config.derive_from, symbols)
+            con.close()
+            self.console.print(f"[bold green]Derived {rows} {config.data_frequency} klines.[/]")
+            return rows
+        except Exception as e:
+            self.console.print(f"[bold red]Error resampling klines: {e}[/]")
+            return 0
+
+    def resample(self, con, target: str, base: str = "1m", symbols: Optional[List[str]] = None,
+                 source: str = "klines") -> int:
+        """
+        Aggregate `base` klines from `source` into `target` klines of the klines table.
+
+        `source` is a table name or a Parquet path/glob with the klines columns.
+        Returns the number of rows inserted.
+        """
+        if not is_derivable(target, base):
+            raise ValueError(f"{target} klines cannot be derived from {base} klines.")
+
+        step = INTERVAL_MS[target]
+        offset = INTERVAL_OFFSET_MS.get(target, 0)
+        src_step = INTERVAL_MS[base]
+        source_sql = f"read_parquet('{source}')" if source.endswith(".parquet") else source
+
+        ensure_klines_schema(con)
+
+        params = [base]
+        symbol_filter = ""
+        if symbols:
+            symbol_filter = f"AND symbol IN ({', '.join('?' for _ in symbols)})"
+            params.extend(symbols)
+        params.append(target)
+
+        before = con.execute("SELECT count(*) FROM klines WHERE interval = ?", [target]).fetchone()[0]
+        last = dict(con.execute("SELECT symbol, max(open_time) FROM klines WHERE interval = ? GROUP BY symbol",
+                                [target]).fetchall())
+        con.execute(f"""
+            INSERT INTO klines
+            WITH src AS (
+                SELECT symbol, {normalize_ms_sql('open_time')} AS open_ms, open, high, low, close, volume,
+                       quote_asset_volume, number_of_trades,
+                       taker_buy_base_asset_volume, taker_buy_quote_asset_volume
+                FROM {source_sql}
+                WHERE interval = ? {symbol_filter}
+            ),
+            done AS (
+                SELECT symbol, max({normalize_ms_sql('open_time')}) AS last_open
+                FROM klines WHERE interval = ? GROUP BY symbol
+            ),
+            pending AS (
+                SELECT src.*, (src.open_ms - {offset}) // {step} * {step} + {offset} AS bucket
+                FROM src LEFT JOIN done USING (symbol)
+                WHERE done.last_open IS NULL OR src.open_ms >= done.last_open + {step}
+            ),
+            available AS (
+                SELECT symbol, max(open_ms) + {src_step} AS covered_until FROM src GROUP BY symbol
+            )
+            SELECT
+                bucket AS open_time,
+                arg_min(open, open_ms) AS open,
+                max(high) AS high,
+                min(low) AS low,
+                arg_max(close, open_ms) AS close,
+                sum(volume) AS volume,
+                bucket + {step} - 1 AS close_time,
+                sum(quote_asset_volume) AS quote_asset_volume,
+                sum(number_of_trades) AS number_of_trades,
+                sum(taker_buy_base_asset_volume) AS taker_buy_base_asset_volume,
+                sum(taker_buy_quote_asset_volume) AS taker_buy_quote_asset_volume,
+                0 AS ignore,
+                symbol,
+                '{target}' AS interval,
+                epoch_ms(bucket) AS open_ts
+            FROM pending JOIN available USING (symbol)
+            GROUP BY symbol, bucket
+            HAVING bucket + {step} <= any_value(covered_until)
+            ORDER BY symbol, open_time
+        """, params)
+        after = con.execute("SELECT count(*) FROM klines WHERE interval = ?", [target]).fetchone()[0]
+        # Rows are only appended past each symbol's last derived kline
+        for symbol, newest in con.execute(
+                "SELECT symbol, max(open_time) FROM klines WHERE interval = ? GROUP BY symbol", [target]).fetchall():
+            if newest != last.get(symbol):
+                record_load(con, symbol, target, [(last.get(symbol, -1) + 1, newest + 1)])
+        return after - before
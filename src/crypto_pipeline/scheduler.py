@@ -0,0 +1,98 @@
+import heapq
+import itertools
+import threading
+import time
+from concurrent.futures import Executor, Future
+from typing import Callable, Iterable, List, Optional, Tuple
+from .periods import archive_period
+
+# Download orders: as listed, most recent period first, largest archive first
+ORDERS = ("listing", "newest", "largest")
+
+
+def period_rank(url: str) -> int:
+    """Sortable end date of an archive's period, e.g. 20240131 for 2024-01 and 20240102 for 2024-01-02."""
+    period = archive_period(url)
+    if not period:
+        return 0
+    if len(period) == 7:
+        # A monthly archive ends after every daily archive of its month
+        return int(period.replace("-", "")) * 100 + 99
+    return int(period.replace("-", ""))
+
+
+class TokenBucket:
+    """
+    Bytes-per-second budget shared by all download workers.
+
+    Every worker takes tokens for each chunk it receives. Tokens refill at
+    `rate` bytes/s up to one second of burst. A worker that takes more than is
+    available sleeps until the debt is paid, so the aggregate rate across all
+    threads stays at `rate`.
+    """
+
+    def __init__(self, rate: float):
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+        self.rate = rate
+        self.capacity = rate
+        self._tokens = rate
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def consume(self, n: int) -> None:
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._last) * self.rate)
+            self._last = now
+            self._tokens -= n
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+        if wait:
+            time.sleep(wait)
+
+
+class DownloadScheduler:
+    """
+    Runs submitted downloads on an executor in priority order.
+
+    Each submit queues the task on a heap and schedules one executor job that
+    runs the best queued task when a worker frees up. With order="newest" the
+    most recent periods go first. With order="largest" the biggest archives
+    go first, so a few giant files do not dominate the end of the run. Ties,
+    and order="listing", keep submission order. Priorities only apply among
+    tasks queued at the same time.
+    """
+
+    def __init__(self, executor: Executor, order: str = "listing"):
+        if order not in ORDERS:
+            raise ValueError(f"order must be one of {ORDERS}")
+        self.executor = executor
+        self.order = order
+        self._heap: List[Tuple] = []
+        self._counter = itertools.count()
+        self._lock = threading.Lock()
+
+    def _priority(self, url: str, size: Optional[int]) -> int:
+        if self.order == "newest":
+            return -period_rank(url)
+        if self.order == "largest":
+            return -(size or 0)
+        return 0
+
+    def submit(self, url: str, size: Optional[int], fn: Callable, *args) -> Future:
+        """Queue fn(url, *args)."""
+        return self.submit_many([(url, size)], fn, *args)[0]
+
+    def submit_many(self, items: Iterable[Tuple[str, Optional[int]]], fn: Callable, *args) -> List[Future]:
+        """Queue fn(url, *args) for every (url, size), all ranked before the first one starts."""
+        with self._lock:
+            count = 0
+            for url, size in items:
+                heapq.heappush(self._heap, ((self._priority(url, size), next(self._counter)), url, fn, args))
+                count += 1
+        return [self.executor.submit(self._run_next) for _ in range(count)]
+
+    def _run_next(self) -> None:
+        with self._lock:
+            _, url, fn, args = heapq.heappop(self._heap)
+        fn(url, *args)
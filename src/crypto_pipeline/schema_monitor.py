@@ -1,16 +1,98 @@
+import glob
+import json
+import os
+import struct
+import threading
+import time
+import zlib
 import requests
-from typing import Dict, Any
+from typing import Dict, Any, List, Optional, Union
+from pydantic import BaseModel
 from rich.console import Console
 from .config import AppConfig
+from .timeutils import detect_unit
+
+# Bytes fetched from the start of a remote archive to fingerprint it
+SAMPLE_BYTES = 64 * 1024
+
+# REST API base URL per asset type
+REST_API_BASE = {
+    "spot": "https://api.binance.com/api/v3",
+    "um": "https://fapi.binance.com/fapi/v1",
+    "cm": "https://dapi.binance.com/dapi/v1",
+    "option": "https://eapi.binance.com/eapi/v1",
+}
+
+
+class SchemaFingerprint(BaseModel):
+    """Layout of a CSV file as published in the archives."""
+    columns: int
+    has_header: bool
+    timestamp_unit: Optional[str] = None
+
+
+def fingerprint_csv_head(data: bytes) -> Optional[SchemaFingerprint]:
+    """Fingerprint the first bytes of a CSV file. Returns None if no complete row is present."""
+    lines = [line for line in data.decode("utf-8", errors="replace").splitlines()[:3] if line.strip()]
+    # The last line of a partial read may be cut off
+    if len(lines) < 2 and not data.endswith(b"\n"):
+        return None
+    if not lines:
+        return None
+
+    first = lines[0].split(",")
+    has_header = not first[0].strip().isdigit()
+    row = lines[1].split(",") if has_header and len(lines) > 1 else first
+    timestamp = row[0].strip()
+    unit = detect_unit(int(timestamp)) if timestamp.isdigit() else None
+    # The open/transact time column is not always first (e.g. aggTrades)
+    if unit is None:
+        for field in row:
+            field = field.strip()
+            if field.isdigit() and detect_unit(int(field)):
+                unit = detect_unit(int(field))
+                break
+    return SchemaFingerprint(columns=len(row), has_header=has_header, timestamp_unit=unit)
+
+
+def csv_head_from_zip(data: bytes) -> bytes:
+    """
+    Return the leading bytes of the first member of a zip archive.
+
+    Only the local file header and the start of the compressed stream are
+    needed, so this works on a partial (Range) read of the archive.
+    """
+    if data[:4] != b"PK\x03\x04":
+        raise ValueError("Not a zip archive")
+    method, = struct.unpack("<H", data[8:10])
+    name_len, extra_len = struct.unpack("<HH", data[26:30])
+    payload = data[30 + name_len + extra_len:]
+    if method == 0:
+        return payload
+    if method == 8:
+        return zlib.decompressobj(-zlib.MAX_WBITS).decompress(payload, SAMPLE_BYTES)
+    raise ValueError(f"Unsupported zip compression method {method}")
+
 
 class SchemaMonitor:
     """
-    Monitors upstream API schema changes.
-    Fetches a single record and verifies it matches the expected structure.
+    Monitors upstream schema changes.
+
+    Fingerprints (column count, header presence, timestamp unit) are inferred
+    from the archives themselves: from files already on disk, from the first
+    bytes of each downloaded archive, or from a Range read of a sample URL.
+    They are cached per (asset_type, data_type, time_period) with a TTL, so
+    startup needs no network round trip. Files whose layout drifts from the
+    reference are flagged individually instead of aborting the run.
     """
     
-    def __init__(self):
+    def __init__(self, session: Optional[requests.Session] = None):
         self.console = Console()
+        self.http = session if session is not None else requests
+        self.drifted_files: List[str] = []
+        self.drift_reasons: Dict[str, str] = {}
+        self._references: Dict[str, SchemaFingerprint] = {}
+        self._lock = threading.Lock()
         # Expected column counts
         self.expected_columns = {
             "klines": 12,
@@ -28,9 +110,157 @@ class SchemaMonitor:
             }
         }
 
-    def check_schema(self, config: AppConfig) -> bool:
+    def check_schema(self, config: AppConfig, sample_url: Optional[str] = None) -> bool:
+        """
+        Establish the reference fingerprint of the dataset without blocking the run.
+
+        Uses the cached fingerprint while it is fresh, else fingerprints a local
+        file or a Range read of `sample_url`. Without any of those the first
+        downloaded archive becomes the reference. Returns False only when
+        config.schema_check is "api" and the REST check fails.
+        """
+        if config.schema_check == "off":
+            return True
+        if config.schema_check == "api":
+            return self.check_api_schema(config)
+
+        self.console.print("[bold blue]Checking archive schema fingerprint...[/]")
+        key = self._cache_key(config)
+        cached = self._read_cache(config).get(key)
+        if cached and time.time() - cached["checked_at"] < config.schema_cache_ttl_hours * 3600:
+            fingerprint = SchemaFingerprint(**cached["fingerprint"])
+        else:
+            fingerprint = self._fingerprint_local(config)
+            if fingerprint is None and sample_url:
+                try:
+                    fingerprint = self.fingerprint_url(sample_url)
+                except Exception as e:
+                    self.console.print(f"[yellow]Could not sample {sample_url}: {e}[/]")
+            if fingerprint is None:
+                self.console.print("[yellow]No cached fingerprint; the first listed archive will be the reference.[/]")
+                return True
+            self._write_cache(config, fingerprint)
+
+        with self._lock:
+            self._references[key] = fingerprint
+        self._check_expected(fingerprint, config)
+        self.console.print(f"[bold green]Schema fingerprint: {fingerprint.columns} columns, "
+                           f"header={fingerprint.has_header}, unit={fingerprint.timestamp_unit}[/]")
+        return True
+
+    def has_reference(self, config: AppConfig) -> bool:
+        """Whether a reference fingerprint of the dataset is established (always True unless in archive mode)."""
+        if config.schema_check != "archive":
+            return True
+        with self._lock:
+            return self._cache_key(config) in self._references
+
+    def check_archive(self, content: bytes, name: str, config: AppConfig) -> bool:
+        """
+        Compare a downloaded archive against the reference fingerprint.
+        Returns False (and flags the file) on drift.
+        """
+        if config.schema_check != "archive":
+            return True
+        try:
+            fingerprint = fingerprint_csv_head(csv_head_from_zip(content[:SAMPLE_BYTES]))
+        except Exception as e:
+            return self._flag(name, f"unreadable archive: {e}")
+        return self.check_fingerprint(fingerprint, name, config)
+
+    def check_file(self, path: str, config: AppConfig) -> bool:
+        """Compare an extracted CSV file against the reference fingerprint."""
+        if config.schema_check != "archive":
+            return True
+        with open(path, "rb") as f:
+            fingerprint = fingerprint_csv_head(f.read(SAMPLE_BYTES))
+        return self.check_fingerprint(fingerprint, path, config)
+
+    def check_fingerprint(self, fingerprint: Optional[SchemaFingerprint], name: str, config: AppConfig) -> bool:
+        """Compare a fingerprint against the reference, adopting it as reference if there is none yet."""
+        if fingerprint is None:
+            return self._flag(name, "no complete row")
+
+        key = self._cache_key(config)
+        with self._lock:
+            reference = self._references.get(key)
+            if reference is None:
+                self._references[key] = fingerprint
+        if reference is None:
+            self._write_cache(config, fingerprint)
+            return self._check_expected(fingerprint, config, name)
+
+        if fingerprint.columns != reference.columns:
+            return self._flag(name, f"expected {reference.columns} columns, got {fingerprint.columns}")
+        if fingerprint.timestamp_unit is None:
+            return self._flag(name, "unrecognized timestamp unit")
+        return True
+
+    def fingerprint_url(self, url: str) -> Optional[SchemaFingerprint]:
+        """Fingerprint a remote archive from its first bytes (HTTP Range read)."""
+        response = self.http.get(url, headers={"Range": f"bytes=0-{SAMPLE_BYTES - 1}"})
+        response.raise_for_status()
+        return fingerprint_csv_head(csv_head_from_zip(response.content))
+
+    def _fingerprint_local(self, config: AppConfig) -> Optional[SchemaFingerprint]:
+        """Fingerprint an already extracted CSV of the dataset, if there is one."""
+        pattern = os.path.join(config.dataset_dir("*"), "*.csv")
+        for path in glob.iglob(pattern):
+            with open(path, "rb") as f:
+                fingerprint = fingerprint_csv_head(f.read(SAMPLE_BYTES))
+            if fingerprint is not None:
+                return fingerprint
+        return None
+
+    def _check_expected(self, fingerprint: SchemaFingerprint, config: AppConfig, name: Optional[str] = None) -> bool:
+        expected = self._expected_count(config)
+        if expected and fingerprint.columns != expected:
+            message = f"expected {expected} columns, got {fingerprint.columns}"
+            if name:
+                return self._flag(name, message)
+            self.console.print(f"[bold red]Schema drift for {config.dataset_key}: {message}[/]")
+            return False
+        return True
+
+    def _expected_count(self, config: AppConfig) -> int:
+        expected = self.expected_columns.get(config.data_type, 0)
+        if isinstance(expected, dict):
+            return expected.get(config.asset_type, 0)
+        return expected
+
+    def _flag(self, name: str, reason: str) -> bool:
+        with self._lock:
+            self.drifted_files.append(name)
+            self.drift_reasons[name] = reason
+        self.console.print(f"[bold yellow]Schema drift in {os.path.basename(name)}: {reason}[/]")
+        return False
+
+    def _cache_key(self, config: AppConfig) -> str:
+        return f"{config.asset_type}/{config.data_type}/{config.time_period}"
+
+    def _cache_path(self, config: AppConfig) -> str:
+        return os.path.join(config.destination_dir, ".schema_fingerprints.json")
+
+    def _read_cache(self, config: AppConfig) -> Dict[str, Any]:
+        try:
+            with open(self._cache_path(config), "r") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _write_cache(self, config: AppConfig, fingerprint: SchemaFingerprint) -> None:
+        with self._lock:
+            cache = self._read_cache(config)
+            cache[self._cache_key(config)] = {"checked_at": time.time(), "fingerprint": fingerprint.model_dump()}
+            os.makedirs(config.destination_dir, exist_ok=True)
+            tmp_path = self._cache_path(config) + ".tmp"
+            with open(tmp_path, "w") as f:
+                json.dump(cache, f)
+            os.replace(tmp_path, self._cache_path(config))
+
+    def check_api_schema(self, config: AppConfig) -> bool:
         """
-        Check if the upstream API schema matches expectations.
+        Check if the upstream REST API schema matches expectations.
         Returns True if schema is valid, False otherwise.
         """
         self.console.print("[bold blue]Checking upstream API schema...[/]")
@@ -47,7 +277,7 @@ class SchemaMonitor:
                 self.console.print("[yellow]Skipping schema check: URL construction not supported for this config.[/]")
                 return True
 
-            response = requests.get(url)
+            response = self.http.get(url)
             response.raise_for_status()
             data = response.json()
 
@@ -86,15 +316,8 @@ class SchemaMonitor:
     def _get_test_url(self, config: AppConfig, symbol: str) -> str:
         """Construct a URL to fetch 1 record."""
         limit = 1
-        if config.asset_type == "spot":
-            base = "https://api.binance.com/api/v3"
-        elif config.asset_type == "um":
-            base = "https://fapi.binance.com/fapi/v1"
-        elif config.asset_type == "cm":
-            base = "https://dapi.binance.com/dapi/v1"
-        elif config.asset_type == "option":
-            base = "https://eapi.binance.com/eapi/v1"
-        else:
+        base = REST_API_BASE.get(config.asset_type)
+        if not base:
             return ""
 
         if config.data_type == "klines":
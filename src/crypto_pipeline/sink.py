@@ -0,0 +1,223 @@
+import hashlib
+import hmac
+import os
+import threading
+import requests
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import BinaryIO, Dict, Iterator, Optional, Tuple
+from urllib.parse import quote, urlparse
+from xml.etree import ElementTree
+from requests.adapters import HTTPAdapter
+from rich.console import Console
+from .config import AppConfig
+from .interfaces import ISink
+
+# S3 rejects multipart parts below 5 MiB, except the last one
+MIN_PART_BYTES = 5 * 1024 * 1024
+
+_sinks: Dict[Tuple, ISink] = {}
+_sinks_lock = threading.Lock()
+
+
+def sink_for(config: AppConfig) -> Optional[ISink]:
+    """Sink of config.sink_url, shared by all components of the process (None without one)."""
+    if not config.sink_url:
+        return None
+    key = (config.sink_url, config.s3_endpoint_url, config.s3_region, config.upload_part_mb, config.upload_workers)
+    with _sinks_lock:
+        sink = _sinks.get(key)
+        if sink is None:
+            parsed = urlparse(config.sink_url)
+            if parsed.scheme == "s3":
+                sink = S3Sink(
+                    endpoint_url=config.s3_endpoint_url or f"https://s3.{config.s3_region}.amazonaws.com",
+                    bucket=parsed.netloc,
+                    prefix=parsed.path.strip("/"),
+                    region=config.s3_region,
+                    access_key=os.environ.get("AWS_ACCESS_KEY_ID", ""),
+                    secret_key=os.environ.get("AWS_SECRET_ACCESS_KEY", ""),
+                    part_bytes=int(config.upload_part_mb * 1024 * 1024),
+                    workers=config.upload_workers,
+                )
+            elif parsed.scheme in ("", "file"):
+                sink = LocalSink(parsed.path if parsed.scheme else config.sink_url)
+            else:
+                raise ValueError(f"Unsupported sink URL {config.sink_url!r}, expected s3://bucket/prefix or a path")
+            _sinks[key] = sink
+        return sink
+
+
+def relative_key(path: str, config: AppConfig) -> str:
+    """Key of a file below destination_dir, so the sink mirrors the local partition layout."""
+    return os.path.relpath(path, config.destination_dir).replace(os.sep, "/")
+
+
+class LocalSink(ISink):
+    """Writes objects below a local directory, e.g. a mounted volume."""
+
+    def __init__(self, root: str):
+        self.root = root
+
+    def write(self, key: str, data: bytes) -> None:
+        path = os.path.join(self.root, *key.split("/"))
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def upload_file(self, key: str, local_path: str) -> None:
+        with open(local_path, "rb") as f:
+            self.write(key, f.read())
+
+    def delete(self, key: str) -> None:
+        try:
+            os.remove(os.path.join(self.root, *key.split("/")))
+        except FileNotFoundError:
+            pass
+
+
+class S3Sink(ISink):
+    """
+    Writes objects to an S3-compatible endpoint (AWS, MinIO, ...).
+
+    Requests are signed with AWS Signature Version 4 and use path-style
+    URLs over one pooled Session. Objects up to `part_bytes` take one PUT.
+    Larger ones are sent as a multipart upload with up to `workers` parts in
+    flight; a file is read one part at a time, so at most `workers` parts are
+    buffered. A failed multipart upload is aborted.
+    """
+
+    def __init__(self, endpoint_url: str, bucket: str, prefix: str = "", region: str = "us-east-1",
+                 access_key: str = "", secret_key: str = "", part_bytes: int = 16 * 1024 * 1024,
+                 workers: int = 8, session: Optional[requests.Session] = None):
+        self.console = Console()
+        self.endpoint_url = endpoint_url.rstrip("/")
+        self.host = urlparse(self.endpoint_url).netloc
+        self.bucket = bucket
+        self.prefix = prefix.strip("/")
+        self.region = region
+        self.access_key = access_key
+        self.secret_key = secret_key
+        self.part_bytes = max(part_bytes, MIN_PART_BYTES)
+        self.workers = workers
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=workers)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+        self.http = session
+        self._executor = ThreadPoolExecutor(max_workers=workers)
+
+    def close(self) -> None:
+        self._executor.shutdown()
+
+    def write(self, key: str, data: bytes) -> None:
+        if len(data) <= self.part_bytes:
+            self._request("PUT", key, body=bytes(data))
+            return
+        view = memoryview(data)
+        self._multipart(key, (bytes(view[i:i + self.part_bytes]) for i in range(0, len(data), self.part_bytes)))
+
+    def upload_file(self, key: str, local_path: str) -> None:
+        if os.path.getsize(local_path) <= self.part_bytes:
+            with open(local_path, "rb") as f:
+                self._request("PUT", key, body=f.read())
+            return
+        with open(local_path, "rb") as f:
+            self._multipart(key, self._read_parts(f))
+
+    def delete(self, key: str) -> None:
+        self._request("DELETE", key)
+
+    def _read_parts(self, f: BinaryIO) -> Iterator[bytes]:
+        while True:
+            part = f.read(self.part_bytes)
+            if not part:
+                return
+            yield part
+
+    def _multipart(self, key: str, parts: Iterator[bytes]) -> None:
+        response = self._request("POST", key, params={"uploads": ""})
+        upload_id = self._find(ElementTree.fromstring(response.content), "UploadId")
+        in_flight = threading.BoundedSemaphore(self.workers)
+        futures = []
+
+        def upload(number: int, part: bytes) -> Tuple[int, str]:
+            try:
+                response = self._request("PUT", key, params={"partNumber": str(number), "uploadId": upload_id},
+                                         body=part)
+                return number, response.headers["ETag"]
+            finally:
+                in_flight.release()
+
+        try:
+            for number, part in enumerate(parts, start=1):
+                # Blocks while `workers` parts are buffered, bounding memory
+                in_flight.acquire()
+                futures.append(self._executor.submit(upload, number, part))
+            etags = sorted(future.result() for future in futures)
+            body = "<CompleteMultipartUpload>" + "".join(
+                f"<Part><PartNumber>{n}</PartNumber><ETag>{etag}</ETag></Part>" for n, etag in etags
+            ) + "</CompleteMultipartUpload>"
+            self._request("POST", key, params={"uploadId": upload_id}, body=body.encode())
+        except Exception:
+            for future in futures:
+                future.cancel()
+            try:
+                self._request("DELETE", key, params={"uploadId": upload_id})
+            except requests.exceptions.RequestException as e:
+                self.console.print(f"[yellow]Could not abort upload of {key}: {e}[/]")
+            raise
+
+    @staticmethod
+    def _find(tree: ElementTree.Element, tag: str) -> str:
+        element = tree.find(f".//{{http://s3.amazonaws.com/doc/2006-03-01/}}{tag}")
+        if element is None:
+            element = tree.find(f".//{tag}")
+        if element is None or not element.text:
+            raise ValueError(f"No {tag} in S3 response")
+        return element.text
+
+    def _request(self, method: str, key: str, params: Optional[Dict[str, str]] = None,
+                 body: bytes = b"") -> requests.Response:
+        object_key = f"{self.prefix}/{key}" if self.prefix else key
+        path = "/" + quote(f"{self.bucket}/{object_key}", safe="/-_.~")
+        query = self._query(params or {})
+        headers = self._sign(method, path, query, body)
+        url = self.endpoint_url + path + (f"?{query}" if query else "")
+        response = self.http.request(method, url, data=body, headers=headers)
+        response.raise_for_status()
+        return response
+
+    @staticmethod
+    def _query(params: Dict[str, str]) -> str:
+        """Canonical query string, also sent as is so the signature matches."""
+        return "&".join(f"{quote(k, safe='-_.~')}={quote(v, safe='-_.~')}" for k, v in sorted(params.items()))
+
+    def _sign(self, method: str, path: str, query: str, body: bytes,
+              now: Optional[datetime] = None) -> Dict[str, str]:
+        """AWS Signature Version 4 headers of a request."""
+        now = now or datetime.now(timezone.utc)
+        amz_date = now.strftime("%Y%m%dT%H%M%SZ")
+        date = amz_date[:8]
+        payload_hash = hashlib.sha256(body).hexdigest()
+        headers = {"host": self.host, "x-amz-content-sha256": payload_hash, "x-amz-date": amz_date}
+
+        signed_headers = ";".join(sorted(headers))
+        canonical_headers = "".join(f"{name}:{headers[name]}\n" for name in sorted(headers))
+        canonical_request = "\n".join([method, path, query, canonical_headers, signed_headers, payload_hash])
+
+        scope = f"{date}/{self.region}/s3/aws4_request"
+        string_to_sign = "\n".join(["AWS4-HMAC-SHA256", amz_date, scope,
+                                    hashlib.sha256(canonical_request.encode()).hexdigest()])
+        signing_key = f"AWS4{self.secret_key}".encode()
+        for part in (date, self.region, "s3", "aws4_request"):
+            signing_key = hmac.new(signing_key, part.encode(), hashlib.sha256).digest()
+        signature = hmac.new(signing_key, string_to_sign.encode(), hashlib.sha256).hexdigest()
+
+        headers["Authorization"] = (f"AWS4-HMAC-SHA256 Credential={self.access_key}/{scope}, "
+                                    f"SignedHeaders={signed_headers}, Signature={signature}")
+        del headers["host"]  # set by requests from the URL
+        return headers
@@ -0,0 +1,204 @@
+import threading
+import numpy as np
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Dict, Hashable, Iterable, List, Optional, Tuple
+from .loader import KLINES_CSV_COLUMNS
+from .timeutils import TimeLike, to_epoch_ms, month_start_ms, next_month_ms
+
+# Columns that can be requested from the store
+KLINE_FIELDS = list(KLINES_CSV_COLUMNS) + ["open_ts"]
+
+
+def format_batch(result: Dict[str, np.ndarray], output: str):
+    """Return columns as a dict of NumPy arrays ("numpy") or a pyarrow.Table ("arrow")."""
+    if output == "numpy":
+        return result
+    if output == "arrow":
+        try:
+            import pyarrow as pa
+        except ImportError:
+            raise ImportError("pyarrow is required for output='arrow' (pip install pyarrow)")
+        return pa.table({c: pa.array(a) for c, a in result.items()})
+    raise ValueError("output must be 'numpy' or 'arrow'")
+
+
+class BlockCache:
+    """Thread-safe LRU cache of NumPy arrays bounded by their total size in bytes."""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._blocks: "OrderedDict[Hashable, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[np.ndarray]:
+        with self._lock:
+            block = self._blocks.get(key)
+            if block is None:
+                self.misses += 1
+                return None
+            self._blocks.move_to_end(key)
+            self.hits += 1
+            return block
+
+    def put(self, key: Hashable, block: np.ndarray) -> None:
+        if block.nbytes > self.max_bytes:
+            return
+        with self._lock:
+            old = self._blocks.pop(key, None)
+            if old is not None:
+                self.current_bytes -= old.nbytes
+            self._blocks[key] = block
+            self.current_bytes += block.nbytes
+            while self.current_bytes > self.max_bytes:
+                _, evicted = self._blocks.popitem(last=False)
+                self.current_bytes -= evicted.nbytes
+
+    def clear(self) -> None:
+        with self._lock:
+            self._blocks.clear()
+            self.current_bytes = 0
+
+
+class KlineStore:
+    """
+    Read API over the klines table of a DuckDB file.
+
+    Data is fetched in (symbol, interval, month, column) blocks. Each block
+    query filters on symbol, interval and an open_time range, which DuckDB
+    answers from zone maps on the clustered table. Closed months are kept in
+    an LRU cache bounded by `cache_bytes`. Results are dicts of NumPy arrays
+    (views when a range fits in one block) or Arrow tables built without
+    copying the arrays.
+
+    Usage:
+        store = KlineStore("crypto_data.duckdb")
+        bars = store.get("BTCUSDT", "1m", "2024-01-01", "2024-02-01", ["open_time", "close"])
+    """
+
+    def __init__(self, db_path: str, cache_bytes: int = 512 * 1024 * 1024):
+        import duckdb  # Lazy: iter_batches uses format_batch without DuckDB
+        self.db_path = db_path
+        self.con = duckdb.connect(db_path, read_only=True)
+        self.cache = BlockCache(cache_bytes)
+        self._lock = threading.Lock()
+
+    def close(self) -> None:
+        self.con.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def get(self, symbol: str, interval: str, start: TimeLike = None, end: TimeLike = None,
+            columns: Optional[List[str]] = None, output: str = "numpy"):
+        """
+        Return klines of one symbol with start <= open_time < end.
+
+        `output` is "numpy" (dict of arrays) or "arrow" (pyarrow.Table).
+        """
+        columns = self._check_columns(columns)
+        start_ms, end_ms = self._resolve_range(symbol, interval, to_epoch_ms(start), to_epoch_ms(end))
+        if start_ms is None or start_ms >= end_ms:
+            return self._format({c: np.array([], dtype=self._dtype(c)) for c in columns}, output)
+
+        parts: Dict[str, List[np.ndarray]] = {c: [] for c in columns}
+        for block_start in self._months(start_ms, end_ms):
+            block = self._get_block(symbol, interval, block_start, columns)
+            open_time = block["open_time"]
+            lo = np.searchsorted(open_time, start_ms, side="left")
+            hi = np.searchsorted(open_time, end_ms, side="left")
+            for c in columns:
+                parts[c].append(block[c][lo:hi])
+
+        result = {c: arrays[0] if len(arrays) == 1 else np.concatenate(arrays) for c, arrays in parts.items()}
+        return self._format(result, output)
+
+    def get_many(self, symbols: Iterable[str], interval: str, start: TimeLike = None, end: TimeLike = None,
+                 columns: Optional[List[str]] = None, output: str = "numpy") -> Dict[str, object]:
+        """Return `get` results for several symbols, keyed by symbol."""
+        return {symbol: self.get(symbol, interval, start, end, columns, output) for symbol in symbols}
+
+    def clear_cache(self) -> None:
+        """Drop all cached blocks, e.g. after new data was loaded."""
+        self.cache.clear()
+
+    def _check_columns(self, columns: Optional[List[str]]) -> List[str]:
+        if not columns:
+            return list(KLINE_FIELDS)
+        unknown = [c for c in columns if c not in KLINE_FIELDS]
+        if unknown:
+            raise ValueError(f"Unknown kline columns: {unknown}")
+        return list(columns)
+
+    def _dtype(self, column: str):
+        if column == "open_ts":
+            return "datetime64[us]"
+        return np.int64 if KLINES_CSV_COLUMNS[column] == "BIGINT" else np.float64
+
+    def _resolve_range(self, symbol: str, interval: str, start_ms: Optional[int],
+                       end_ms: Optional[int]) -> Tuple[Optional[int], Optional[int]]:
+        """Fill open ends of the range from the stored data."""
+        if start_ms is not None and end_ms is not None:
+            return start_ms, end_ms
+        with self._lock:
+            first, last = self.con.execute(
+                "SELECT min(open_time), max(open_time) FROM klines WHERE symbol = ? AND interval = ?",
+                [symbol, interval]
+            ).fetchone()
+        if first is None:
+            return None, None
+        return (start_ms if start_ms is not None else first,
+                end_ms if end_ms is not None else last + 1)
+
+    def _months(self, start_ms: int, end_ms: int) -> List[int]:
+        months = []
+        block_start = month_start_ms(start_ms)
+        while block_start < end_ms:
+            months.append(block_start)
+            block_start = next_month_ms(block_start)
+        return months
+
+    def _get_block(self, symbol: str, interval: str, block_start: int, columns: List[str]) -> Dict[str, np.ndarray]:
+        """Return the requested columns (plus open_time) of one month, using the cache."""
+        wanted = ["open_time"] + [c for c in columns if c != "open_time"]
+        block: Dict[str, np.ndarray] = {}
+        missing = []
+        for c in wanted:
+            cached = self.cache.get((symbol, interval, block_start, c))
+            if cached is None:
+                missing.append(c)
+            else:
+                block[c] = cached
+        if not missing:
+            return block
+
+        # Always refetch open_time with missing columns so rows stay aligned
+        fetch = ["open_time"] + [c for c in missing if c != "open_time"]
+        block_end = next_month_ms(block_start)
+        with self._lock:
+            fetched = self.con.execute(
+                f"""
+                SELECT {', '.join(fetch)} FROM klines
+                WHERE symbol = ? AND interval = ? AND open_time >= ? AND open_time < ?
+                ORDER BY open_time
+                """,
+                [symbol, interval, block_start, block_end]
+            ).fetchnumpy()
+
+        # The newest month may still grow, so only closed months are cached
+        closed = block_end <= to_epoch_ms(datetime.now(timezone.utc))
+        for c in fetch:
+            array = np.asarray(fetched[c])
+            block[c] = array
+            if closed:
+                self.cache.put((symbol, interval, block_start, c), array)
+        return block
+
+    def _format(self, result: Dict[str, np.ndarray], output: str):
+        return format_batch(result, output)
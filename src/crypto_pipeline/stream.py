@@ -0,0 +1,148 @@
+import io
+import zipfile
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Deque, Dict, Iterator, List, Optional, Sequence, Tuple, Union
+import numpy as np
+from .bars import AGG_TRADES_COLUMNS
+from .catalog import TIME_COLUMN
+from .config import AppConfig
+from .downloader import Downloader
+from .loader import KLINES_CSV_COLUMNS
+from .periods import period_range
+from .store import format_batch
+from .timeutils import MICROSECOND_THRESHOLD, TimeLike, to_epoch_ms
+
+# Leading trades columns; spot files carry an extra is_best_match column
+TRADES_COLUMNS = {
+    "id": "BIGINT",
+    "price": "DOUBLE",
+    "qty": "DOUBLE",
+    "quote_qty": "DOUBLE",
+    "time": "BIGINT",
+    "is_buyer_maker": "BOOLEAN",
+}
+
+STREAM_COLUMNS = {
+    "klines": KLINES_CSV_COLUMNS,
+    "aggTrades": AGG_TRADES_COLUMNS,
+    "trades": TRADES_COLUMNS,
+}
+
+# Columns holding epoch timestamps, normalized to ms like the loaded tables
+TIME_COLUMNS = {"open_time", "close_time", "transact_time", "time"}
+
+NUMPY_TYPES = {"BIGINT": "i8", "DOUBLE": "f8", "BOOLEAN": "S5"}
+
+
+def parse_csv(data: bytes, data_type: str) -> Dict[str, np.ndarray]:
+    """Parse the CSV of an archive into typed NumPy columns, times in ms."""
+    columns = STREAM_COLUMNS[data_type]
+    dtype = [(name, NUMPY_TYPES[kind]) for name, kind in columns.items()]
+    has_header = bool(data) and not data[:1].isdigit()
+    table = np.loadtxt(io.BytesIO(data), delimiter=",", dtype=dtype, usecols=range(len(columns)),
+                       skiprows=1 if has_header else 0, ndmin=1)
+    batch = {}
+    for name, kind in columns.items():
+        column = table[name]
+        if kind == "BOOLEAN":
+            column = np.char.lower(column) == b"true"
+        elif name in TIME_COLUMNS:
+            # Microsecond timestamps (spot since 2025) become milliseconds
+            column = np.where(column >= MICROSECOND_THRESHOLD, column // 1000, column)
+        batch[name] = np.ascontiguousarray(column)
+    return batch
+
+
+def iter_batches(config: Union[AppConfig, Dict], symbols: Sequence[str], start: TimeLike = None,
+                 end: TimeLike = None, readahead: int = 4, batch_rows: Optional[int] = None,
+                 output: str = "numpy", downloader: Optional[Downloader] = None
+                 ) -> Iterator[Tuple[str, object]]:
+    """
+    Stream rows with start <= time < end straight from the archives, without disk or DuckDB.
+
+    Yields (symbol, batch) with every symbol's batches in time order, one
+    batch per archive or per `batch_rows` rows. A batch is a dict of NumPy
+    arrays, or a pyarrow.Table with output="arrow". Up to `readahead`
+    archives are downloaded and parsed in the background, which bounds
+    memory to about `readahead` archives whatever the range. Archives go
+    through the shared archive cache when config.cache_dir is set.
+
+    Usage:
+        for symbol, batch in iter_batches(config, ["BTCUSDT"], "2023-01-01", "2024-01-01"):
+            train(batch["close"])
+    """
+    if isinstance(config, dict):
+        config = AppConfig(**config)
+    if config.data_type not in STREAM_COLUMNS:
+        raise ValueError(f"Streaming supports {sorted(STREAM_COLUMNS)}, not {config.data_type}")
+    if readahead < 1:
+        raise ValueError("readahead must be at least 1")
+    downloader = downloader or Downloader()
+    start_ms, end_ms = to_epoch_ms(start), to_epoch_ms(end)
+    time_column = list(STREAM_COLUMNS[config.data_type])[TIME_COLUMN[config.data_type]]
+
+    def fetch(url: str) -> Dict[str, np.ndarray]:
+        content = downloader.download_file(url, "", config)
+        parts = []
+        with zipfile.ZipFile(io.BytesIO(content)) as zip_file:
+            for member in zip_file.namelist():
+                if member.endswith(".csv"):
+                    parts.append(parse_csv(zip_file.read(member), config.data_type))
+        if not parts:
+            return {}
+        batch = {name: np.concatenate([p[name] for p in parts]) for name in parts[0]}
+        times = batch[time_column]
+        mask = np.ones(len(times), dtype=bool)
+        if start_ms is not None:
+            mask &= times >= start_ms
+        if end_ms is not None:
+            mask &= times < end_ms
+        if not mask.all():
+            batch = {name: column[mask] for name, column in batch.items()}
+        return batch
+
+    with ThreadPoolExecutor(max_workers=min(config.max_workers, readahead)) as executor:
+        work = _list_archives(downloader, config, symbols, start_ms, end_ms, executor)
+        pending: Deque[Tuple[str, Future]] = deque()
+        try:
+            for symbol, url in work:
+                pending.append((symbol, executor.submit(fetch, url)))
+                if len(pending) < readahead:
+                    continue
+                yield from _emit(*pending.popleft(), batch_rows, output)
+            while pending:
+                yield from _emit(*pending.popleft(), batch_rows, output)
+        finally:
+            # The consumer may stop early
+            for _, future in pending:
+                future.cancel()
+
+
+def _list_archives(downloader: Downloader, config: AppConfig, symbols: Sequence[str],
+                   start_ms: Optional[int], end_ms: Optional[int],
+                   executor: ThreadPoolExecutor) -> List[Tuple[str, str]]:
+    """(symbol, url) of the archives overlapping the range, per symbol in time order."""
+    work = []
+    listings = executor.map(lambda symbol: downloader.list_objects(symbol, config), symbols)
+    for symbol, objects in zip(symbols, listings):
+        ranged = []
+        for url, _ in objects:
+            bounds = period_range(url)
+            if bounds is None:
+                continue
+            if (end_ms is not None and bounds[0] >= end_ms) or (start_ms is not None and bounds[1] <= start_ms):
+                continue
+            ranged.append((bounds[0], url))
+        work.extend((symbol, url) for _, url in sorted(ranged))
+    return work
+
+
+def _emit(symbol: str, future: Future, batch_rows: Optional[int], output: str) -> Iterator[Tuple[str, object]]:
+    batch = future.result()
+    if not batch:
+        return
+    rows = len(next(iter(batch.values())))
+    step = batch_rows or rows
+    for offset in range(0, rows, step):
+        yield symbol, format_batch({name: column[offset:offset + step] for name, column in batch.items()}, output)
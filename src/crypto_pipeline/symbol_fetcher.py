@@ -1,7 +1,8 @@
 import requests
 import json
 import os
-from typing import List
+import threading
+from typing import List, Dict, Optional, Tuple
 from xml.etree import ElementTree
 from rich.console import Console
 from natsort import natsorted
@@ -9,10 +10,18 @@ from .config import AppConfig
 from .interfaces import IFetcher
 
 class SymbolFetcher(IFetcher):
-    """Fetches symbols using various strategies: API, XML (S3), or JSON file."""
+    """
+    Fetches symbols using various strategies: API, XML (S3), or JSON file.
+
+    Unfiltered symbol lists are cached per source, so one fetcher instance acts
+    as a symbol catalog shared by every dataset of a job.
+    """
     
-    def __init__(self):
+    def __init__(self, session: Optional[requests.Session] = None):
         self.console = Console()
+        self.http = session if session is not None else requests
+        self._catalog: Dict[Tuple, List[str]] = {}
+        self._catalog_lock = threading.Lock()
         self.s3_base_url = "https://s3-ap-northeast-1.amazonaws.com/data.binance.vision"
         self.api_endpoints = {
             "spot": "https://api.binance.com/api/v3/exchangeInfo",
@@ -33,6 +42,31 @@ class SymbolFetcher(IFetcher):
             self.console.print(f"[bold red]Unknown fetch method: {config.fetch_method}[/]")
             return []
 
+    def get_symbols_cached(self, config: AppConfig) -> List[str]:
+        """Like get_symbols, but reuses symbol lists already fetched from the same source."""
+        key = self._catalog_key(config)
+        with self._catalog_lock:
+            if key not in self._catalog:
+                unfiltered = config.model_copy(update={"symbol_suffix": None})
+                symbols = self.get_symbols(unfiltered)
+                if not symbols:
+                    return []
+                self._catalog[key] = symbols
+            return self._filter_symbols(self._catalog[key], config)
+
+    def clear_cache(self) -> None:
+        """Forget all cached symbol lists."""
+        with self._catalog_lock:
+            self._catalog.clear()
+
+    def _catalog_key(self, config: AppConfig) -> Tuple:
+        """Identify the upstream source a symbol list comes from."""
+        if config.fetch_method == "api":
+            return ("api", config.asset_type)
+        if config.fetch_method == "xml":
+            return ("xml", config.asset_type, config.time_period, config.data_type)
+        return (config.fetch_method, config.symbol_file)
+
     def _get_symbols_api(self, config: AppConfig) -> List[str]:
         """Fetch symbols from Binance API."""
         self.console.print(f"[bold blue]Fetching symbols for {config.asset_type} via API...[/]")
@@ -43,7 +77,7 @@ class SymbolFetcher(IFetcher):
             return []
 
         try:
-            response = requests.get(url)
+            response = self.http.get(url)
             response.raise_for_status()
             data = response.json()
             all_symbols = [s['symbol'] for s in data['symbols']]
@@ -57,12 +91,14 @@ class SymbolFetcher(IFetcher):
         """Fetch symbols from S3 XML (useful when API is blocked)."""
         self.console.print(f"[bold blue]Fetching symbols for {config.asset_type} via XML (S3)...[/]")
         
+        # Hybrid runs list symbols from the monthly tree, which also keeps delisted ones
+        time_period = "monthly" if config.time_period == "hybrid" else config.time_period
         if config.asset_type == "spot":
-            prefix = f"data/spot/{config.time_period}/{config.data_type}/"
+            prefix = f"data/spot/{time_period}/{config.data_type}/"
         elif config.asset_type == "option":
-            prefix = f"data/option/{config.time_period}/{config.data_type}/"
+            prefix = f"data/option/{time_period}/{config.data_type}/"
         else:
-            prefix = f"data/futures/{config.asset_type}/{config.time_period}/{config.data_type}/"
+            prefix = f"data/futures/{config.asset_type}/{time_period}/{config.data_type}/"
 
         delimiter = "/"
         marker = None
@@ -74,7 +110,7 @@ class SymbolFetcher(IFetcher):
                 params["marker"] = marker
 
             try:
-                response = requests.get(self.s3_base_url, params=params)
+                response = self.http.get(self.s3_base_url, params=params)
                 response.raise_for_status()
             except requests.exceptions.RequestException as e:
                 self.console.print(f"[bold red]Error fetching symbol list: {e}[/]")
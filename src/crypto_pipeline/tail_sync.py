@@ -0,0 +1,148 @@
+import csv
+import os
+import tempfile
+import time
+import requests
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, List, Optional
+from rich.console import Console
+from .config import AppConfig
+from .loader import DuckDBLoader, ensure_klines_schema
+from .scheduler import TokenBucket
+from .schema_monitor import REST_API_BASE
+
+# Rows per request, the maximum the klines endpoints return
+PAGE_LIMIT = 1000
+
+# Request weight of a klines call with limit=1000, per asset type
+KLINES_WEIGHT = {
+    "spot": 2,
+    "um": 5,
+    "cm": 5,
+    "option": 5,
+}
+
+# First wait after a failed request, doubled on every retry up to BACKOFF_MAX_SECONDS
+BACKOFF_SECONDS = 0.5
+BACKOFF_MAX_SECONDS = 30.0
+
+
+class TailSyncer:
+    """
+    Tops up the klines table from the REST klines endpoint.
+
+    Archives on data.binance.vision appear about a day late. For every
+    symbol the tail is paged with startTime and limit=1000, from the end of
+    the last stored kline up to now. Symbols are fetched concurrently, and all
+    requests draw from one budget of `rest_weight_per_minute`; HTTP 429/418
+    responses are retried after Retry-After, connection errors and 5xx
+    responses with exponential backoff, every retry drawing from the budget. Only closed klines are stored.
+    Rows are written with the loader's range replace, so the archive of a
+    day replaces its tail rows once it is loaded.
+    """
+
+    def __init__(self, session: Optional[requests.Session] = None):
+        self.console = Console()
+        self.http = session if session is not None else requests
+        self._limiters: Dict[int, TokenBucket] = {}
+
+    def base_url(self, config: AppConfig) -> str:
+        return (config.rest_base_url or REST_API_BASE[config.asset_type]).rstrip("/")
+
+    def sync(self, symbols: List[str], config: AppConfig, end_ms: Optional[int] = None, con=None) -> int:
+        """Fetch and store the klines after the last stored one of every symbol, through `con` if given. Returns rows written."""
+        if config.data_type != "klines" or not config.db_path:
+            self.console.print("[yellow]Tail sync needs klines and a db_path. Skipping.[/]")
+            return 0
+        end_ms = end_ms if end_ms is not None else int(time.time() * 1000)
+
+        own = con is None
+        if own:
+            import duckdb
+            con = duckdb.connect(config.db_path)
+        try:
+            ensure_klines_schema(con)
+            starts = self._tail_starts(con, symbols, config.data_frequency)
+            if not starts:
+                return 0
+            self.console.print(f"[blue]Syncing the REST tail of {len(starts)} symbols...[/]")
+
+            written = 0
+            loader = DuckDBLoader()
+            self._limiter(config)  # created before the workers share it
+            with tempfile.TemporaryDirectory() as tmp_dir, \
+                 ThreadPoolExecutor(max_workers=min(config.max_workers, 10)) as executor:
+                futures = {executor.submit(self.fetch, symbol, start, end_ms, config): symbol
+                           for symbol, start in starts.items()}
+                # DuckDB writes stay on this thread
+                for future in as_completed(futures):
+                    symbol = futures[future]
+                    try:
+                        rows = future.result()
+                    except Exception as e:
+                        self.console.print(f"[bold red]Tail sync failed for {symbol}: {e}[/]")
+                        continue
+                    if not rows:
+                        continue
+                    csv_path = os.path.join(tmp_dir, f"{symbol}.csv")
+                    with open(csv_path, "w", newline="") as f:
+                        csv.writer(f).writerows(rows)
+                    loader.insert_klines(con, [csv_path], symbol, config.data_frequency, {csv_path: False})
+                    written += len(rows)
+            self.console.print(f"[bold green]Tail sync wrote {written} klines.[/]")
+            return written
+        finally:
+            if own:
+                con.close()
+
+    def _tail_starts(self, con, symbols: List[str], interval: str) -> Dict[str, int]:
+        """First open_time to fetch per symbol; symbols without stored klines have no tail."""
+        if not symbols:
+            return {}
+        placeholders = ", ".join("?" for _ in symbols)
+        rows = con.execute(f"""
+            SELECT symbol, max(close_time) + 1 FROM klines
+            WHERE interval = ? AND symbol IN ({placeholders})
+            GROUP BY symbol
+        """, [interval] + list(symbols)).fetchall()
+        return {symbol: start for symbol, start in rows}
+
+    def fetch(self, symbol: str, start_ms: int, end_ms: int, config: AppConfig) -> List[List]:
+        """Page the closed klines of a symbol with start_ms <= open_time and close_time < end_ms."""
+        url = f"{self.base_url(config)}/klines"
+        rows: List[List] = []
+        while start_ms < end_ms:
+            page = self._get(url, {"symbol": symbol, "interval": config.data_frequency,
+                                   "startTime": start_ms, "limit": PAGE_LIMIT}, config)
+            closed = [row[:12] for row in page if int(row[6]) < end_ms]
+            rows.extend(closed)
+            if len(page) < PAGE_LIMIT or len(closed) < len(page):
+                break
+            start_ms = int(page[-1][6]) + 1
+        return rows
+
+    def _get(self, url: str, params: Dict, config: AppConfig) -> List:
+        limiter = self._limiter(config)
+        for attempt in range(config.retries + 1):
+            limiter.consume(KLINES_WEIGHT.get(config.asset_type, 5))
+            try:
+                response = self.http.get(url, params=params)
+                if response.status_code in (418, 429) and attempt < config.retries:
+                    # Over the weight limit: wait as long as the server asks
+                    time.sleep(float(response.headers.get("Retry-After", 1)))
+                    continue
+                response.raise_for_status()
+                return response.json()
+            except requests.exceptions.RequestException as e:
+                status = e.response.status_code if e.response is not None else None
+                if attempt == config.retries or (status is not None and status < 500):
+                    raise
+                time.sleep(min(BACKOFF_SECONDS * 2 ** attempt, BACKOFF_MAX_SECONDS))
+        return []
+
+    def _limiter(self, config: AppConfig) -> TokenBucket:
+        limiter = self._limiters.get(config.rest_weight_per_minute)
+        if limiter is None:
+            limiter = TokenBucket(config.rest_weight_per_minute / 60)
+            self._limiters[config.rest_weight_per_minute] = limiter
+        return limiter
@@ -0,0 +1,87 @@
+from datetime import date, datetime, timezone
+from typing import Optional, Union
+
+# Binance CSVs carry milliseconds, except spot files from 2025 on which use
+# microseconds. Millisecond epochs stay below 1e15 until the year 33658 and
+# microsecond epochs are above it from 2001 on, so the magnitude tells the unit.
+MICROSECOND_THRESHOLD = 10**15
+
+TimeLike = Union[int, str, date, datetime, None]
+
+
+def to_epoch_ms(value: TimeLike) -> Optional[int]:
+    """Convert epoch ms, ISO strings, dates and datetimes (naive = UTC) to epoch ms."""
+    if value is None or isinstance(value, int):
+        return value
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    if not isinstance(value, datetime):
+        value = datetime(value.year, value.month, value.day)
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return int(value.timestamp() * 1000)
+
+
+def month_start_ms(ms: int) -> int:
+    """Epoch ms of the first instant of the UTC month containing `ms`."""
+    d = datetime.fromtimestamp(ms / 1000, tz=timezone.utc)
+    return int(datetime(d.year, d.month, 1, tzinfo=timezone.utc).timestamp() * 1000)
+
+
+def next_month_ms(ms: int) -> int:
+    """Epoch ms of the first instant of the following UTC month."""
+    d = datetime.fromtimestamp(ms / 1000, tz=timezone.utc)
+    year, month = (d.year + 1, 1) if d.month == 12 else (d.year, d.month + 1)
+    return int(datetime(year, month, 1, tzinfo=timezone.utc).timestamp() * 1000)
+
+
+# Fixed-length kline intervals in milliseconds ("1M" has no fixed length)
+INTERVAL_MS = {
+    "1s": 1_000,
+    "1m": 60_000,
+    "3m": 180_000,
+    "5m": 300_000,
+    "15m": 900_000,
+    "30m": 1_800_000,
+    "1h": 3_600_000,
+    "2h": 7_200_000,
+    "4h": 14_400_000,
+    "6h": 21_600_000,
+    "8h": 28_800_000,
+    "12h": 43_200_000,
+    "1d": 86_400_000,
+    "3d": 259_200_000,
+    "1w": 604_800_000,
+}
+
+# Weekly klines open on Monday, the epoch fell on a Thursday
+INTERVAL_OFFSET_MS = {
+    "1w": 345_600_000,
+}
+
+
+def detect_unit(timestamp: int) -> Optional[str]:
+    """Return "ms" or "us" for a plausible epoch timestamp, None otherwise."""
+    # Plausible range: 2010-01-01 up to 2100-01-01
+    if 1_262_304_000_000 <= timestamp < 4_102_444_800_000:
+        return "ms"
+    if 1_262_304_000_000_000 <= timestamp < 4_102_444_800_000_000:
+        return "us"
+    return None
+
+
+def to_millis(timestamp: int) -> int:
+    """Normalize a ms or us epoch timestamp to milliseconds."""
+    return timestamp // 1000 if timestamp >= MICROSECOND_THRESHOLD else timestamp
+
+
+def normalize_ms_sql(column: str) -> str:
+    """SQL expression normalizing a ms or us epoch column to milliseconds."""
+    return f"(CASE WHEN {column} >= {MICROSECOND_THRESHOLD} THEN {column} // 1000 ELSE {column} END)"
+
+
+def is_derivable(target: str, base: str = "1m") -> bool:
+    """Whether klines of `target` can be aggregated from klines of `base`."""
+    if target not in INTERVAL_MS or base not in INTERVAL_MS:
+        return False
+    return INTERVAL_MS[target] > INTERVAL_MS[base] and INTERVAL_MS[target] % INTERVAL_MS[base] == 0
@@ -1,10 +1,10 @@
 import os
-import glob
-import csv
-from typing import List
+from typing import Dict, List
 from rich.console import Console
 from .config import AppConfig
 from .interfaces import IVerifier
+from .timeutils import detect_unit
+from .catalog import open_catalog
 
 class Verifier(IVerifier):
     """Verifies downloaded data integrity."""
@@ -18,65 +18,59 @@ class Verifier(IVerifier):
         Checks for:
         1. File existence.
         2. Column counts (Schema validation).
-        3. Timestamp format (ms vs us for Spot >= 2025).
+        3. Timestamp format (ms or us, detected from the value range).
+
+        Checks run on the statistics recorded in the file catalog, and only
+        for files not verified before.
         """
         self.console.print("[bold blue]Verifying data...[/]")
         
         error_count = 0
         total_files = 0
+        catalog = open_catalog(config)
 
         for symbol in symbols:
             # Construct path
-            if config.asset_type == "spot" or config.asset_type == "option":
-                base_path = os.path.join(config.destination_dir, config.asset_type, symbol, config.data_frequency)
-            else:
-                base_path = os.path.join(config.destination_dir, config.asset_type, symbol, config.data_frequency)
-            
-            # Get all CSV files
-            csv_files = glob.glob(os.path.join(base_path, "*.csv"))
-            total_files += len(csv_files)
+            base_path = config.dataset_dir(symbol)
+            catalog.sync(base_path, config.data_type)
+            entries = catalog.files(base_path, verified=False)
+            total_files += len(entries)
 
-            for file_path in csv_files:
-                if not self._verify_file(file_path, config):
+            passed, failed = [], []
+            for entry in entries:
+                if self._verify_entry(entry, config):
+                    passed.append(entry["path"])
+                else:
+                    failed.append(entry["path"])
                     error_count += 1
-                    self.console.print(f"[red]Verification failed for {os.path.basename(file_path)}[/]")
+                    self.console.print(f"[red]Verification failed for {os.path.basename(entry['path'])}[/]")
+            catalog.mark(passed, verified=1)
+            if failed:
+                catalog.remove(failed)
+                catalog.touch_dir(base_path)
 
         if error_count == 0:
             self.console.print(f"[bold green]Verification successful! Checked {total_files} files.[/]")
         else:
             self.console.print(f"[bold red]Verification completed with {error_count} errors.[/]")
 
-    def _verify_file(self, file_path: str, config: AppConfig) -> bool:
-        """Verify a single file."""
-        try:
-            with open(file_path, 'r') as f:
-                reader = csv.reader(f)
-                header = next(reader, None) # Check first row
-                
-                if not header:
-                    self._quarantine_file(file_path, config, "Empty file")
-                    return False # Empty file
-
-                # 1. Schema Validation (Column Count)
-                col_count = len(header)
-                expected_cols = self._get_expected_columns(config)
-                
-                if col_count != expected_cols:
-                    self._quarantine_file(file_path, config, f"Schema mismatch: Expected {expected_cols} cols, got {col_count}")
-                    return False
-
-                # 2. Timestamp Validation (First row check)
-                # Open time is usually the first column (index 0)
-                open_time = header[0]
-                if not self._is_valid_timestamp(open_time, file_path, config):
-                     self._quarantine_file(file_path, config, f"Invalid timestamp format: {open_time}")
-                     return False
+    def _verify_entry(self, entry: Dict, config: AppConfig) -> bool:
+        """Verify a file from its catalog statistics, quarantining it on failure."""
+        file_path = entry["path"]
+        if not entry["rows"]:
+            self._quarantine_file(file_path, config, "Empty file")
+            return False
 
-                return True
+        expected_cols = self._get_expected_columns(config)
+        if entry["columns"] != expected_cols:
+            self._quarantine_file(file_path, config, f"Schema mismatch: Expected {expected_cols} cols, got {entry['columns']}")
+            return False
 
-        except Exception as e:
-            self.console.print(f"  [red]Error reading file: {e}[/]")
+        # Bounds are stored in ms, so a plausible first timestamp detects as ms
+        if entry["min_time"] is None or detect_unit(entry["min_time"]) is None:
+            self._quarantine_file(file_path, config, f"Invalid timestamp format: {entry['min_time']}")
             return False
+        return True
 
     def _quarantine_file(self, file_path: str, config: AppConfig, reason: str):
         """Move invalid file to quarantine directory."""
@@ -109,30 +103,4 @@ class Verifier(IVerifier):
             else: # futures
                 return 6
         # Default fallback or throw error
-        return 0 
-
-    def _is_valid_timestamp(self, timestamp_str: str, file_path: str, config: AppConfig) -> bool:
-        """
-        Check if timestamp is valid.
-        Spot data >= 2025-01-01 uses Microseconds (16 digits).
-        Others use Milliseconds (13 digits).
-        """
-        if not timestamp_str.isdigit():
-            return False
-            
-        timestamp = int(timestamp_str)
-        digits = len(timestamp_str)
-
-        # Extract date from filename to check if it's >= 2025
-        # Filename format: SYMBOL-FREQ-YEAR-MONTH.csv or SYMBOL-FREQ-DATE.csv
-        # Quick heuristic: Check if filename contains "2025" or later
-        is_post_2025 = "2025" in file_path or "2026" in file_path # Simple check
-        
-        if config.asset_type == "spot" and is_post_2025:
-            # Expect Microseconds (16 digits)
-            # 2025-01-01 00:00:00 UTC = 1735689600000000 us
-            return digits == 16
-        else:
-            # Expect Milliseconds (13 digits)
-            # 2020-01-01 = 1577836800000 ms
-            return digits == 13
+        return 0
@@ -0,0 +1,267 @@
+import hashlib
+import os
+import shutil
+import threading
+import time
+import uuid
+from typing import List, Optional, Tuple
+from urllib.parse import urlparse
+
+# Orphaned temporary files older than this are removed during eviction
+TMP_MAX_AGE_S = 3600
+
+# Eviction frees space down to this fraction of max_bytes, so that a full
+# cache is not rescanned on every put
+EVICT_TARGET = 0.9
+
+# Bytes copied at a time by get_file and put_file
+COPY_CHUNK = 1024 * 1024
+
+
+class ZipCache:
+    """
+    Content-addressable cache of downloaded archives shared between runs and processes.
+
+    Archives are stored once under objects/ by the SHA-256 of their content;
+    refs/ maps the hash of an S3 key to the content hash. Every file is
+    written to a unique temporary name and renamed into place, so concurrent
+    processes never see partial entries. Reads refresh the object's mtime.
+    Once the cache exceeds `max_bytes`, eviction removes the least recently
+    used objects until it is back at EVICT_TARGET of the limit, together
+    with the refs pointing to them. A ref whose object was evicted or fails
+    its hash check is a miss.
+
+    Binance publishes the SHA-256 of every archive in `<archive>.CHECKSUM`,
+    the same hash objects are stored by. Passing it as `checksum` validates
+    the ref against upstream, so an archive republished under the same URL
+    is a miss instead of being served stale.
+
+    Usage:
+        cache = ZipCache("/shared/binance_zips", max_bytes=50 * 1024**3)
+        content = cache.get(url, checksum)
+        if content is None:
+            content = download(url)
+            cache.put(url, content, checksum)
+
+    `get_file` and `put_file` do the same with an archive file, copying it
+    in chunks instead of holding it in memory.
+    """
+
+    def __init__(self, cache_dir: str, max_bytes: int):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.bytes_saved = 0
+        self._lock = threading.Lock()
+        os.makedirs(os.path.join(cache_dir, "objects"), exist_ok=True)
+        os.makedirs(os.path.join(cache_dir, "refs"), exist_ok=True)
+        self._size = sum(size for _, size, _ in self._objects())
+
+    def _ref_path(self, url: str) -> str:
+        key = urlparse(url).path.lstrip("/")
+        return os.path.join(self.cache_dir, "refs", hashlib.sha1(key.encode()).hexdigest())
+
+    def _object_path(self, digest: str) -> str:
+        return os.path.join(self.cache_dir, "objects", digest[:2], digest)
+
+    def _digest(self, url: str, checksum: Optional[str]) -> Optional[str]:
+        """Content hash the ref of `url` points to, None (and the ref removed) if it differs from `checksum`."""
+        ref_path = self._ref_path(url)
+        try:
+            with open(ref_path, "r") as f:
+                digest = f.read().strip()
+        except OSError:
+            return None
+        if checksum is not None and digest != checksum:
+            # Republished upstream, the cached content is stale
+            self._remove(ref_path)
+            return None
+        return digest
+
+    def get(self, url: str, checksum: Optional[str] = None) -> Optional[bytes]:
+        """Cached content of an archive, or None. With `checksum` (upstream SHA-256) a ref to other content is a miss."""
+        digest = self._digest(url, checksum)
+        path = self._object_path(digest) if digest else None
+        try:
+            if path is None:
+                raise FileNotFoundError(url)
+            with open(path, "rb") as f:
+                content = f.read()
+        except OSError:
+            self._count(hit=False)
+            return None
+
+        if hashlib.sha256(content).hexdigest() != digest:
+            self._discard(path, len(content))
+            return None
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        self._count(hit=True, size=len(content))
+        return content
+
+    def get_file(self, url: str, dest_path: str, checksum: Optional[str] = None) -> bool:
+        """Copy the cached archive of `url` to dest_path. Returns False on a miss, leaving dest_path alone."""
+        digest = self._digest(url, checksum)
+        path = self._object_path(digest) if digest else None
+        tmp_path = f"{dest_path}.tmp-{uuid.uuid4().hex}"
+        size = 0
+        sha = hashlib.sha256()
+        try:
+            if path is None:
+                raise FileNotFoundError(url)
+            with open(path, "rb") as source, open(tmp_path, "wb") as target:
+                for chunk in iter(lambda: source.read(COPY_CHUNK), b""):
+                    sha.update(chunk)
+                    target.write(chunk)
+                    size += len(chunk)
+        except OSError:
+            self._remove(tmp_path)
+            self._count(hit=False)
+            return False
+
+        if sha.hexdigest() != digest:
+            self._remove(tmp_path)
+            self._discard(path, size)
+            return False
+        os.replace(tmp_path, dest_path)
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        self._count(hit=True, size=size)
+        return True
+
+    def put(self, url: str, content: bytes, checksum: Optional[str] = None) -> None:
+        """Store an archive and evict least recently used ones beyond the size limit.
+
+        Content not matching the upstream `checksum` is not cached.
+        """
+        if len(content) > self.max_bytes:
+            return
+        digest = hashlib.sha256(content).hexdigest()
+        if checksum is not None and digest != checksum:
+            return
+        path = self._object_path(digest)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            self._write_atomic(path, content)
+            self._store(url, digest, len(content))
+        else:
+            os.utime(path)
+            self._store(url, digest, 0)
+
+    def put_file(self, url: str, source_path: str, checksum: Optional[str] = None) -> None:
+        """Store the archive file at source_path, like `put`."""
+        size = os.path.getsize(source_path)
+        if size > self.max_bytes:
+            return
+        sha = hashlib.sha256()
+        with open(source_path, "rb") as source:
+            for chunk in iter(lambda: source.read(COPY_CHUNK), b""):
+                sha.update(chunk)
+        digest = sha.hexdigest()
+        if checksum is not None and digest != checksum:
+            return
+        path = self._object_path(digest)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.tmp-{uuid.uuid4().hex}"
+            shutil.copyfile(source_path, tmp_path)
+            os.replace(tmp_path, path)
+            self._store(url, digest, size)
+        else:
+            os.utime(path)
+            self._store(url, digest, 0)
+
+    def _store(self, url: str, digest: str, added: int) -> None:
+        """Point the ref of `url` at a stored object, accounting `added` new bytes."""
+        if added:
+            with self._lock:
+                self._size += added
+        self._write_atomic(self._ref_path(url), digest.encode())
+        if self._size > self.max_bytes:
+            self.evict()
+
+    def _discard(self, path: str, size: int) -> None:
+        """Remove an object that failed its hash check, which counts as a miss."""
+        if self._remove(path):
+            with self._lock:
+                self._size -= size
+        self._count(hit=False)
+
+    def evict(self) -> int:
+        """Remove least recently used objects and their refs until the cache is below EVICT_TARGET. Returns bytes freed."""
+        with self._lock:
+            # Rescan, other processes may have added or evicted objects
+            objects = sorted(self._objects(), key=lambda item: item[2])
+            total = sum(size for _, size, _ in objects)
+            target = self.max_bytes * EVICT_TARGET if total > self.max_bytes else self.max_bytes
+            freed = 0
+            for path, size, _ in objects:
+                if total - freed <= target:
+                    break
+                if self._remove(path):
+                    freed += size
+            self._size = total - freed
+            if freed:
+                self._prune_refs()
+            return freed
+
+    def stats(self) -> dict:
+        return {"hits": self.hits, "misses": self.misses, "bytes_saved": self.bytes_saved, "size": self._size}
+
+    def _count(self, hit: bool, size: int = 0) -> None:
+        with self._lock:
+            if hit:
+                self.hits += 1
+                self.bytes_saved += size
+            else:
+                self.misses += 1
+
+    def _objects(self) -> List[Tuple[str, int, float]]:
+        """(path, size, mtime) of every cached object, cleaning up stale temporary files."""
+        objects = []
+        for root, _, files in os.walk(os.path.join(self.cache_dir, "objects")):
+            for name in files:
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                if ".tmp-" in name:
+                    if stat.st_mtime < time.time() - TMP_MAX_AGE_S:
+                        self._remove(path)
+                    continue
+                objects.append((path, stat.st_size, stat.st_mtime))
+        return objects
+
+    def _prune_refs(self) -> None:
+        """Remove refs whose object no longer exists."""
+        refs_dir = os.path.join(self.cache_dir, "refs")
+        for name in os.listdir(refs_dir):
+            if ".tmp-" in name:
+                continue
+            path = os.path.join(refs_dir, name)
+            try:
+                with open(path, "r") as f:
+                    digest = f.read().strip()
+            except OSError:
+                continue
+            if not os.path.exists(self._object_path(digest)):
+                self._remove(path)
+
+    def _write_atomic(self, path: str, data: bytes) -> None:
+        tmp_path = f"{path}.tmp-{uuid.uuid4().hex}"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def _remove(self, path: str) -> bool:
+        try:
+            os.remove(path)
+            return True
+        except FileNotFoundError:
+            return False
@@ -0,0 +1,139 @@
+import os
+import shutil
+import tempfile
+import unittest
+from unittest.mock import patch
+import duckdb
+from crypto_pipeline.bars import BarAggregator, parse_bar_spec
+from crypto_pipeline.config import AppConfig
+
+START = 1_735_689_600_000  # 2025-01-01 00:00 UTC
+
+# (price, quantity, ms offset, is_buyer_maker)
+TRADES = [
+    (100.0, 1.0, 0, True),
+    (102.0, 2.0, 10_000, False),
+    (101.0, 1.0, 59_999, False),
+    (99.0, 4.0, 60_000, True),
+    (98.0, 1.0, 61_000, False),
+]
+
+class TestBarAggregator(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.config = AppConfig(
+            asset_type="spot",
+            time_period="daily",
+            data_type="aggTrades",
+            destination_dir=self.tmp_dir,
+            db_path=os.path.join(self.tmp_dir, "test.duckdb"),
+            bars=["time:1m", "volume:3"],
+        )
+        self.aggregator = BarAggregator()
+
+        path = self.config.dataset_dir("BTCUSDT")
+        os.makedirs(path)
+        self.csv_path = os.path.join(path, "BTCUSDT-aggTrades-2025-01-01.csv")
+        with open(self.csv_path, "w") as f:
+            for i, (price, qty, offset, maker) in enumerate(TRADES):
+                # Spot files are headerless with microsecond times and an is_best_match column
+                f.write(f"{i},{price},{qty},{i},{i},{(START + offset) * 1000},{str(maker).lower()},true\n")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def bars(self, bar_type):
+        con = duckdb.connect(self.config.db_path)
+        rows = con.execute("""
+            SELECT open_time, open, high, low, close, volume, vwap, trades, taker_buy_volume
+            FROM bars WHERE bar_type = ? ORDER BY open_time
+        """, [bar_type]).fetchall()
+        con.close()
+        return rows
+
+    def write_trades(self, day, trades):
+        """Write (agg_trade_id, quantity) trades at 100.0 one second apart into the CSV of 2025-01-<day>."""
+        day_start = START + (day - 1) * 86_400_000
+        path = os.path.join(self.config.dataset_dir("BTCUSDT"), f"BTCUSDT-aggTrades-2025-01-0{day}.csv")
+        with open(path, "w") as f:
+            for n, (trade_id, qty) in enumerate(trades):
+                f.write(f"{trade_id},100.0,{qty},{trade_id},{trade_id},{day_start + n * 1000},false,true\n")
+        return path
+
+    def test_time_and_volume_bars(self):
+        # Time bars are staged right away, volume bars once flushed
+        self.assertEqual(self.aggregator.aggregate_file(self.csv_path, "BTCUSDT", self.config), 2)
+        self.assertFalse(os.path.exists(self.csv_path))
+        self.assertEqual(self.aggregator.flush(self.config), 5)
+
+        minute_1, minute_2 = self.bars("time")
+        self.assertEqual(minute_1[:6], (START, 100.0, 102.0, 100.0, 101.0, 4.0))
+        self.assertAlmostEqual(minute_1[6], (100 + 204 + 101) / 4)
+        self.assertEqual(minute_1[7:], (3, 3.0))
+        self.assertEqual(minute_2[:6], (START + 60_000, 99.0, 99.0, 98.0, 98.0, 5.0))
+
+        # A bar closes with the trade that brings its volume to 3 or more
+        self.assertEqual([(b[0], b[5]) for b in self.bars("volume")],
+                         [(START, 3.0), (START + 59_999, 5.0), (START + 61_000, 1.0)])
+
+    def test_volume_bars_are_built_in_chunks(self):
+        with patch("crypto_pipeline.bars.CHUNK_BYTES", 24):
+            self.aggregator.aggregate_file(self.csv_path, "BTCUSDT", self.config)
+            self.aggregator.flush(self.config)
+        self.assertEqual([(b[0], b[5], b[7]) for b in self.bars("volume")],
+                         [(START, 3.0, 2), (START + 59_999, 5.0, 2), (START + 61_000, 1.0, 1)])
+
+    def test_volume_bar_is_carried_across_archives(self):
+        config = self.config.model_copy(update={"bars": ["volume:3"]})
+        os.remove(self.csv_path)
+        self.aggregator.aggregate_file(self.write_trades(1, [(0, 1.0), (1, 1.0)]), "BTCUSDT", config)
+        self.assertEqual(self.aggregator.flush(config), 0)
+
+        # The bar opened on the 1st closes with the second trade of the 2nd
+        self.aggregator.aggregate_file(self.write_trades(2, [(2, 2.0), (3, 1.0)]), "BTCUSDT", config)
+        self.assertEqual(self.aggregator.flush(config), 1)
+        self.assertEqual([(b[0], b[5], b[7]) for b in self.bars("volume")], [(START, 4.0, 3)])
+
+        # A gap in the trade ids drops the open bar and starts afresh
+        self.aggregator.aggregate_file(self.write_trades(3, [(9, 3.0)]), "BTCUSDT", config)
+        self.aggregator.flush(config)
+        self.assertEqual([(b[0], b[5]) for b in self.bars("volume")], [(START, 4.0), (START + 2 * 86_400_000, 3.0)])
+
+    def test_carried_bars_do_not_depend_on_arrival_order(self):
+        config = self.config.model_copy(update={"bars": ["volume:3"]})
+        os.remove(self.csv_path)
+        self.aggregator.aggregate_file(self.write_trades(2, [(2, 2.0), (3, 1.0)]), "BTCUSDT", config)
+        self.aggregator.aggregate_file(self.write_trades(1, [(0, 1.0), (1, 1.0)]), "BTCUSDT", config)
+        self.assertEqual(self.aggregator.flush(config), 1)
+        self.assertEqual([(b[0], b[5], b[7]) for b in self.bars("volume")], [(START, 4.0, 3)])
+
+    def test_reaggregation_replaces_bars(self):
+        config = self.config.model_copy(update={"keep_raw_trades": True})
+        for _ in range(2):
+            self.aggregator.aggregate_file(self.csv_path, "BTCUSDT", config)
+            self.aggregator.flush(config)
+        self.assertTrue(os.path.exists(self.csv_path))
+        self.assertEqual(len(self.bars("time")), 2)
+
+    def test_non_adjacent_archives_keep_bars_between(self):
+        config = self.config.model_copy(update={"bars": ["time:1m"]})
+        directory = config.dataset_dir("BTCUSDT")
+        for days in ((1,), (0, 2)):
+            for day in days:
+                path = os.path.join(directory, f"BTCUSDT-aggTrades-2025-01-0{day + 1}.csv")
+                with open(path, "w") as f:
+                    f.write(f"{day},100.0,1.0,{day},{day},{START + day * 86_400_000},true,true\n")
+                self.aggregator.aggregate_file(path, "BTCUSDT", config)
+            self.aggregator.flush(config)
+        self.assertEqual([b[0] for b in self.bars("time")], [START + day * 86_400_000 for day in range(3)])
+
+    def test_parse_bar_spec(self):
+        self.assertEqual(parse_bar_spec("dollar:1e6"), ("dollar", "1e+06"))
+        with self.assertRaises(ValueError):
+            parse_bar_spec("tick:100")
+        with self.assertRaises(ValueError):
+            AppConfig(asset_type="spot", time_period="daily", data_type="klines",
+                      data_frequency="1m", db_path="x.duckdb", bars=["time:1m"])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,105 @@
+import io
+import os
+import shutil
+import tempfile
+import unittest
+import zipfile
+from crypto_pipeline.catalog import FileCatalog, csv_stats, open_catalog
+from crypto_pipeline.config import AppConfig
+from crypto_pipeline.extractor import Extractor
+from crypto_pipeline.verifier import Verifier
+
+DAY = 86_400_000
+START = 1_704_067_200_000  # 2024-01-01 00:00 UTC
+
+def kline_csv(day, rows=3, factor=1):
+    start = START + day * DAY
+    return "".join(f"{(start + i * 60_000) * factor},1,1,1,1,1,{start + i * 60_000 + 59_999},1,1,1,1,0\n"
+                   for i in range(rows))
+
+class TestFileCatalog(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.config = AppConfig(asset_type="spot", time_period="daily", data_type="klines",
+                                data_frequency="1m", destination_dir=self.tmp_dir)
+        self.directory = self.config.dataset_dir("BTCUSDT")
+        os.makedirs(self.directory)
+        self.catalog = FileCatalog(os.path.join(self.tmp_dir, "catalog.sqlite"))
+
+    def tearDown(self):
+        self.catalog.close()
+        open_catalog(self.config).close()
+        shutil.rmtree(self.tmp_dir)
+
+    def write(self, name, content):
+        with open(os.path.join(self.directory, name), "w") as f:
+            f.write(content)
+
+    def test_csv_stats(self):
+        stats = csv_stats(("open_time,open\n" + kline_csv(0, factor=1000)).encode(), "klines")
+        self.assertEqual(stats["rows"], 3)
+        self.assertEqual(stats["columns"], 12)
+        self.assertTrue(stats["has_header"])
+        self.assertEqual((stats["min_time"], stats["max_time"]), (START, START + 120_000))
+
+    def test_extract_registers_files(self):
+        buffer = io.BytesIO()
+        with zipfile.ZipFile(buffer, "w") as zf:
+            zf.writestr("BTCUSDT-1m-2024-01-01.csv", kline_csv(0))
+        Extractor().extract(buffer.getvalue(), self.directory, self.config)
+
+        (entry,) = open_catalog(self.config).files(self.directory)
+        self.assertEqual(entry["symbol"], "BTCUSDT")
+        self.assertEqual(entry["period"], "2024-01-01")
+        self.assertEqual(entry["rows"], 3)
+        self.assertEqual(entry["crc32"], zipfile.ZipFile(buffer).getinfo("BTCUSDT-1m-2024-01-01.csv").CRC)
+
+    def test_process_extraction_matches_threads(self):
+        buffer = io.BytesIO()
+        with zipfile.ZipFile(buffer, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+            zf.writestr("BTCUSDT-1m-2024-01-01.csv", kline_csv(0))
+            zf.writestr("BTCUSDT-1m-2024-01-02.csv", kline_csv(1))
+        config = self.config.model_copy(update={"extract_mode": "process", "max_extract_workers": 2})
+        extractor = Extractor()
+        try:
+            self.assertEqual(extractor.extract(buffer.getvalue(), self.directory, config), 2)
+            # Already extracted files are left alone
+            self.assertEqual(extractor.extract(buffer.getvalue(), self.directory, config), 0)
+        finally:
+            extractor.close()
+
+        entries = open_catalog(self.config).files(self.directory)
+        self.assertEqual([e["period"] for e in entries], ["2024-01-01", "2024-01-02"])
+        self.assertEqual([e["rows"] for e in entries], [3, 3])
+        self.assertEqual(entries[1]["crc32"], zipfile.ZipFile(buffer).getinfo("BTCUSDT-1m-2024-01-02.csv").CRC)
+        with open(os.path.join(self.directory, "BTCUSDT-1m-2024-01-02.csv")) as f:
+            self.assertEqual(f.read(), kline_csv(1))
+        self.assertEqual(os.listdir(os.path.join(self.tmp_dir, ".extract_spool")), [])
+
+    def test_sync_and_range_pruning(self):
+        for day in range(3):
+            self.write(f"BTCUSDT-1m-2024-01-0{day + 1}.csv", kline_csv(day))
+        self.catalog.sync(self.directory, "klines")
+        self.assertEqual(len(self.catalog.files(self.directory)), 3)
+
+        in_range = self.catalog.files(self.directory, START + DAY, START + 2 * DAY)
+        self.assertEqual([e["period"] for e in in_range], ["2024-01-02"])
+
+        os.remove(os.path.join(self.directory, "BTCUSDT-1m-2024-01-02.csv"))
+        self.catalog.sync(self.directory, "klines")
+        self.assertEqual([e["period"] for e in self.catalog.files(self.directory)], ["2024-01-01", "2024-01-03"])
+        self.assertEqual(self.catalog.gaps(self.directory), [("2024-01-02", "2024-01-02")])
+
+    def test_verifier_checks_catalog_once(self):
+        self.write("BTCUSDT-1m-2024-01-01.csv", kline_csv(0))
+        self.write("BTCUSDT-1m-2024-01-02.csv", "1,2,3\n")
+        Verifier().verify(["BTCUSDT"], self.config)
+
+        catalog = open_catalog(self.config)
+        (entry,) = catalog.files(self.directory)
+        self.assertEqual((entry["period"], entry["verified"]), ("2024-01-01", 1))
+        self.assertTrue(os.path.exists(os.path.join(self.tmp_dir, "quarantine", "BTCUSDT-1m-2024-01-02.csv")))
+        self.assertEqual(catalog.files(self.directory, verified=False), [])
+
+if __name__ == "__main__":
+    unittest.main()
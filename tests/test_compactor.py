@@ -0,0 +1,126 @@
+import io
+import os
+import shutil
+import tempfile
+import unittest
+import zipfile
+import duckdb
+from crypto_pipeline.catalog import open_catalog
+from crypto_pipeline.compactor import Compactor
+from crypto_pipeline.config import AppConfig
+from crypto_pipeline.extractor import Extractor
+from crypto_pipeline.loader import DuckDBLoader
+from crypto_pipeline.periods import superseded_daily
+
+HOUR = 3_600_000
+DAY = 86_400_000
+JAN = 1_704_067_200_000  # 2024-01-01 00:00 UTC
+FEB = 1_706_745_600_000  # 2024-02-01 00:00 UTC
+
+
+def kline_lines(day_start, hours=3):
+    return "".join(f"{day_start + h * HOUR},1,2,0.5,{h},10,{day_start + (h + 1) * HOUR - 1},15,3,4,6,0\n"
+                   for h in range(hours))
+
+
+class TestCompactor(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.config = AppConfig(asset_type="spot", time_period="daily", data_type="klines", data_frequency="1h",
+                                destination_dir=self.tmp_dir, db_path=os.path.join(self.tmp_dir, "test.duckdb"),
+                                compact=True)
+        self.directory = self.config.dataset_dir("BTCUSDT")
+        os.makedirs(self.directory)
+        self.catalog = open_catalog(self.config)
+        for day in range(3):
+            self.write_day(JAN + day * DAY)
+        self.write_day(FEB)
+        DuckDBLoader().load(["BTCUSDT"], self.config)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def write_day(self, day_start):
+        day = 1 + (day_start - JAN) // DAY if day_start < FEB else 1 + (day_start - FEB) // DAY
+        month = "01" if day_start < FEB else "02"
+        path = os.path.join(self.directory, f"BTCUSDT-1h-2024-{month}-{day:02d}.csv")
+        with open(path, "w") as f:
+            f.write(kline_lines(day_start))
+        self.catalog.add_file(path, "klines")
+        return path
+
+    def parquet(self, month="2024-01"):
+        return os.path.join(self.directory, f"BTCUSDT-1h-{month}.parquet")
+
+    def rows(self, query):
+        con = duckdb.connect(self.config.db_path)
+        try:
+            return con.execute(query).fetchall()
+        finally:
+            con.close()
+
+    def test_closed_month_is_compacted_with_flags(self):
+        written = Compactor().compact(["BTCUSDT"], self.config, now_ms=FEB + 10 * DAY)
+        self.assertEqual(written, 1)
+        self.assertEqual(sorted(os.listdir(self.directory)),
+                         ["BTCUSDT-1h-2024-01.parquet", "BTCUSDT-1h-2024-02-01.csv"])
+
+        entries = {os.path.basename(e["path"]): e for e in self.catalog.files(self.directory)}
+        parquet = entries["BTCUSDT-1h-2024-01.parquet"]
+        self.assertEqual((parquet["rows"], parquet["columns"], parquet["period"]), (9, 12, "2024-01"))
+        self.assertEqual((parquet["min_time"], parquet["max_time"]), (JAN, JAN + 2 * DAY + 2 * HOUR))
+        self.assertEqual((parquet["verified"], parquet["loaded"]), (0, 1))
+        self.assertTrue(self.catalog.is_compacted(os.path.join(self.directory, "BTCUSDT-1h-2024-01-02.csv")))
+
+    def test_grace_period_keeps_recent_month(self):
+        self.assertEqual(Compactor().compact(["BTCUSDT"], self.config, now_ms=FEB + DAY), 0)
+        self.assertFalse(os.path.exists(self.parquet()))
+
+    def test_reload_from_parquet_matches(self):
+        before = self.rows("SELECT * EXCLUDE (open_ts) FROM klines ORDER BY open_time")
+        Compactor().compact(["BTCUSDT"], self.config, now_ms=FEB + 10 * DAY)
+        os.remove(self.config.db_path)
+        DuckDBLoader().load(["BTCUSDT"], self.config)
+        self.assertEqual(self.rows("SELECT * EXCLUDE (open_ts) FROM klines ORDER BY open_time"), before)
+
+    def test_late_day_is_merged_without_duplicates(self):
+        compactor = Compactor()
+        compactor.compact(["BTCUSDT"], self.config, now_ms=FEB + 10 * DAY)
+        late = self.write_day(JAN + 10 * DAY)
+        self.assertFalse(self.catalog.is_compacted(late))
+        compactor.compact(["BTCUSDT"], self.config, now_ms=FEB + 10 * DAY)
+
+        self.assertFalse(os.path.exists(late))
+        self.assertTrue(self.catalog.is_compacted(late))
+        con = duckdb.connect()
+        count, distinct = con.execute(f"SELECT count(*), count(DISTINCT open_time) "
+                                      f"FROM read_parquet('{self.parquet()}')").fetchone()
+        con.close()
+        self.assertEqual((count, distinct), (12, 12))
+
+    def test_extractor_skips_compacted_days(self):
+        Compactor().compact(["BTCUSDT"], self.config, now_ms=FEB + 10 * DAY)
+        buffer = io.BytesIO()
+        with zipfile.ZipFile(buffer, "w") as zip_file:
+            zip_file.writestr("BTCUSDT-1h-2024-01-02.csv", kline_lines(JAN + DAY))
+        self.assertEqual(Extractor().extract(buffer.getvalue(), self.directory, self.config), 0)
+        self.assertFalse(os.path.exists(os.path.join(self.directory, "BTCUSDT-1h-2024-01-02.csv")))
+
+    def test_archive_retention_zips_originals(self):
+        config = self.config.model_copy(update={"compact_retention": "archive"})
+        Compactor().compact(["BTCUSDT"], config, now_ms=FEB + 10 * DAY)
+        archive = os.path.join(self.tmp_dir, "archive", "spot", "BTCUSDT", "1h", "BTCUSDT-1h-2024-01.zip")
+        with zipfile.ZipFile(archive) as zip_file:
+            self.assertEqual(sorted(zip_file.namelist()),
+                             [f"BTCUSDT-1h-2024-01-0{day}.csv" for day in (1, 2, 3)])
+
+    def test_local_symbols(self):
+        self.assertEqual(Compactor().local_symbols(self.config), ["BTCUSDT"])
+
+    def test_monthly_csv_supersedes_parquet(self):
+        paths = ["/d/BTCUSDT-1h-2024-01.parquet", "/d/BTCUSDT-1h-2024-01.csv", "/d/BTCUSDT-1h-2024-02.parquet"]
+        self.assertEqual(superseded_daily(paths), ["/d/BTCUSDT-1h-2024-01.parquet"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,120 @@
+import io
+import json
+import os
+import shutil
+import tempfile
+import unittest
+import urllib.request
+import zipfile
+from unittest.mock import MagicMock
+from crypto_pipeline.daemon import Daemon
+
+PREFIX = "data/spot/daily/klines/BTCUSDT/1m/"
+BASE = "https://data.binance.vision/" + PREFIX
+
+def key(day):
+    return f"{PREFIX}BTCUSDT-1m-2024-01-0{day}.zip"
+
+def zip_bytes(url):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as zf:
+        zf.writestr(os.path.basename(url).replace(".zip", ".csv"), "1704067200000,1,1,1,1,1,1704067259999,1,1,1,1,0\n")
+    return buffer.getvalue()
+
+class TestDaemon(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.daemon = Daemon({"asset_type": "spot", "time_period": "daily", "data_type": "klines",
+                              "data_frequency": "1m", "destination_dir": self.tmp_dir, "retries": 0})
+        pipeline = self.daemon.pipeline
+        pipeline.schema_monitor = MagicMock()
+        pipeline.schema_monitor.check_schema.return_value = True
+        pipeline.fetcher = MagicMock()
+        pipeline.fetcher.get_symbols_cached.return_value = ["BTCUSDT"]
+        pipeline.verifier = MagicMock()
+        pipeline.loader = MagicMock()
+
+        # The bucket lists keys 1-2 at start; key 3 is published later
+        self.published = [key(1), key(2)]
+        self.markers = []
+
+        def fetch(prefix, config, on_page=None, marker=None):
+            self.markers.append(marker)
+            return [(f"https://data.binance.vision/{k}", 10) for k in self.published if marker is None or k > marker]
+
+        downloader = pipeline.downloader
+        downloader._fetch_objects_for_prefix = MagicMock(side_effect=fetch)
+        downloader.download_file = MagicMock(side_effect=lambda url, dest, config: zip_bytes(url))
+        self.downloaded = lambda: [c.args[0] for c in downloader.download_file.call_args_list]
+
+    def tearDown(self):
+        self.daemon.stop()
+        shutil.rmtree(self.tmp_dir)
+
+    def test_polls_only_after_newest_key(self):
+        directory = self.daemon.config.dataset_dir("BTCUSDT")
+        os.makedirs(directory)
+        open(os.path.join(directory, "BTCUSDT-1m-2024-01-01.csv"), "w").close()
+
+        self.assertEqual(self.daemon.poll(), 1)
+        self.assertEqual(self.downloaded(), [BASE + "BTCUSDT-1m-2024-01-02.zip"])
+
+        self.assertEqual(self.daemon.poll(), 0)
+        self.published.append(key(3))
+        self.assertEqual(self.daemon.poll(), 1)
+
+        self.assertEqual(self.markers, [None, key(2), key(2)])
+        self.assertEqual(self.downloaded()[-1], BASE + "BTCUSDT-1m-2024-01-03.zip")
+        self.daemon.pipeline.loader.load.assert_called_with(["BTCUSDT"], self.daemon.config, None)
+        self.assertEqual(self.daemon.metrics["archives_found_total"], 2)
+
+    def test_failed_archives_are_retried_next_poll(self):
+        downloader = self.daemon.pipeline.downloader
+        downloader.download_file.side_effect = ConnectionError("reset")
+        self.daemon.poll()
+        self.assertEqual(self.daemon.metrics["archives_failed_total"], 2)
+
+        downloader.download_file.side_effect = lambda url, dest, config: zip_bytes(url)
+        self.assertEqual(self.daemon.poll(), 2)
+        self.assertEqual(self.daemon.retry, [])
+        self.assertEqual(self.markers, [None, key(2)])
+
+    def test_retried_archive_listed_again_is_processed_once(self):
+        self.daemon.retry = [BASE + "BTCUSDT-1m-2024-01-01.zip"]
+        self.assertEqual(self.daemon.poll(), 2)
+        self.assertEqual(self.downloaded(), [BASE + "BTCUSDT-1m-2024-01-01.zip", BASE + "BTCUSDT-1m-2024-01-02.zip"])
+
+    def test_database_connection_is_kept_between_polls(self):
+        self.daemon.config.db_path = os.path.join(self.tmp_dir, "crypto.duckdb")
+        self.daemon.poll()
+        self.published.append(key(3))
+        self.daemon.poll()
+
+        connections = [c.args[2] for c in self.daemon.pipeline.loader.load.call_args_list]
+        self.assertEqual(len(connections), 2)
+        self.assertIs(connections[0], connections[1])
+        self.assertEqual(connections[0].execute("SELECT 1").fetchone(), (1,))
+        self.daemon.stop()
+        self.assertIsNone(self.daemon.con)
+
+    def test_health_and_metrics_endpoint(self):
+        port = self.daemon.start_server(0)
+        self.daemon.poll()
+
+        with urllib.request.urlopen(f"http://127.0.0.1:{port}/health") as response:
+            self.assertEqual(response.status, 200)
+            self.assertEqual(json.loads(response.read())["status"], "ok")
+        with urllib.request.urlopen(f"http://127.0.0.1:{port}/metrics") as response:
+            body = response.read().decode()
+        self.assertIn('crypto_pipeline_polls_total{dataset="spot/klines/1m"} 1', body)
+        self.assertIn("# TYPE crypto_pipeline_last_poll_seconds gauge", body)
+
+        self.daemon.pipeline.schema_monitor.check_schema.return_value = False
+        self.daemon.metrics["last_success_timestamp"] -= 3 * self.daemon.config.poll_interval_seconds
+        self.daemon.poll()
+        with self.assertRaises(urllib.error.HTTPError) as error:
+            urllib.request.urlopen(f"http://127.0.0.1:{port}/health")
+        self.assertEqual(error.exception.code, 503)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -39,3 +39,38 @@ class TestDownloader(unittest.TestCase):
         content = self.downloader.download_file("http://example.com/file.zip", "dest_path", self.config)
         self.assertEqual(content, b"success")
         self.assertEqual(mock_get.call_count, 3)
+
+    @patch('requests.get')
+    def test_listing_follows_truncated_pages(self, mock_get):
+        page = ('<ListBucketResult xmlns="http://s3.amazonaws.com/doc/2006-03-01/">'
+                '<IsTruncated>{}</IsTruncated>'
+                '<Contents><Key>{}</Key><Size>{}</Size></Contents>'
+                '</ListBucketResult>')
+        first, second = MagicMock(), MagicMock()
+        first.content = page.format("true", "data/a.zip", 10).encode()
+        second.content = page.format("false", "data/b.zip", 20).encode()
+        mock_get.side_effect = [first, second]
+
+        objects = self.downloader._fetch_objects_for_prefix("data/", self.config)
+        self.assertEqual(objects, [(f"{self.downloader.download_base_url}/data/a.zip", 10),
+                                   (f"{self.downloader.download_base_url}/data/b.zip", 20)])
+        self.assertEqual(mock_get.call_args_list[1].kwargs["params"]["marker"], "data/a.zip")
+
+    def test_hybrid_listing_uses_daily_only_without_monthly(self):
+        config = self.config.model_copy(update={"time_period": "hybrid", "data_frequency": "1m"})
+        listings = {
+            "data/spot/monthly/klines/BTCUSDT/1m/": [("m/BTCUSDT-1m-2024-01.zip", 100)],
+            "data/spot/daily/klines/BTCUSDT/1m/": [("d/BTCUSDT-1m-2024-01-31.zip", 5),
+                                                   ("d/BTCUSDT-1m-2024-02-01.zip", 5)],
+        }
+        pages = []
+
+        def fetch(prefix, c, on_page=None):
+            if on_page:
+                on_page(listings[prefix])
+            return listings[prefix]
+
+        with patch.object(self.downloader, "_fetch_objects_for_prefix", side_effect=fetch):
+            objects = self.downloader.list_objects("BTCUSDT", config, pages.append)
+        self.assertEqual(objects, [("m/BTCUSDT-1m-2024-01.zip", 100), ("d/BTCUSDT-1m-2024-02-01.zip", 5)])
+        self.assertEqual(pages, [[("m/BTCUSDT-1m-2024-01.zip", 100)], [("d/BTCUSDT-1m-2024-02-01.zip", 5)]])
@@ -0,0 +1,77 @@
+import unittest
+import duckdb
+from crypto_pipeline.config import AppConfig
+from crypto_pipeline.features import FeatureEngine, parse_feature_spec
+from crypto_pipeline.loader import ensure_klines_schema
+
+DAY = 86_400_000
+SPECS = ["ret:3", "rvol:5", "atr:4", "sma:3", "vol_z:5", "cum_volume", "max_close", "min_close"]
+
+def insert_days(con, first, last, symbol="BTCUSDT"):
+    con.execute(f"""
+        INSERT INTO klines
+        SELECT i * {DAY}, 10 + i % 7, 12 + i % 7, 9 + i % 7, 10 + (i * 3) % 11, 1 + (i * 7) % 5, i * {DAY} + {DAY - 1},
+               1, 1, 1, 1, 0, '{symbol}', '1d', NULL
+        FROM range({first}, {last}) t(i)
+    """)
+
+class TestFeatureEngine(unittest.TestCase):
+    def setUp(self):
+        self.engine = FeatureEngine()
+        self.con = duckdb.connect()
+        ensure_klines_schema(self.con)
+
+    def values(self, con):
+        return con.execute("SELECT symbol, feature, open_time, round(value, 9) FROM features ORDER BY ALL").fetchall()
+
+    def test_incremental_update_matches_full_recompute(self):
+        insert_days(self.con, 0, 40)
+        insert_days(self.con, 0, 40, "ETHUSDT")
+        first = self.engine.materialize(self.con, ["BTCUSDT", "ETHUSDT"], "1d", SPECS)
+        insert_days(self.con, 40, 50)
+        insert_days(self.con, 40, 50, "ETHUSDT")
+        second = self.engine.materialize(self.con, ["BTCUSDT", "ETHUSDT"], "1d", SPECS)
+        # Only the 10 new days and the rewritten last days are recomputed
+        self.assertLess(second, first / 2)
+
+        full = duckdb.connect()
+        ensure_klines_schema(full)
+        insert_days(full, 0, 50)
+        insert_days(full, 0, 50, "ETHUSDT")
+        self.engine.materialize(full, ["BTCUSDT", "ETHUSDT"], "1d", SPECS)
+        self.assertEqual(self.values(self.con), self.values(full))
+
+    def test_new_feature_recomputes_history(self):
+        insert_days(self.con, 0, 20)
+        self.engine.materialize(self.con, ["BTCUSDT"], "1d", ["ret:1"])
+        self.engine.materialize(self.con, ["BTCUSDT"], "1d", ["ret:1", "cum_volume"])
+        rows = dict(self.con.execute("SELECT feature, count(*) FROM features GROUP BY feature").fetchall())
+        self.assertEqual(rows, {"ret_1": 19, "cum_volume": 20})
+
+    def test_carried_infinity(self):
+        insert_days(self.con, 0, 20)
+        self.con.execute("UPDATE klines SET volume = 'inf'::DOUBLE WHERE open_time = 5 * ?", [DAY])
+        self.engine.materialize(self.con, ["BTCUSDT"], "1d", ["cum_volume"])
+        insert_days(self.con, 20, 30)
+        self.engine.materialize(self.con, ["BTCUSDT"], "1d", ["cum_volume"])
+        last = self.con.execute("SELECT value FROM features ORDER BY open_time DESC LIMIT 1").fetchone()[0]
+        self.assertEqual(last, float("inf"))
+
+    def test_rolling_values(self):
+        insert_days(self.con, 0, 6)
+        self.engine.materialize(self.con, ["BTCUSDT"], "1d", ["sma:3", "ret:1"])
+        sma = self.con.execute("SELECT value FROM features WHERE feature = 'sma_3' ORDER BY open_time").fetchall()
+        closes = [10 + (i * 3) % 11 for i in range(6)]
+        self.assertEqual([round(v, 9) for v, in sma], [round(sum(closes[i - 2:i + 1]) / 3, 9) for i in range(2, 6)])
+
+    def test_spec_validation(self):
+        self.assertEqual(parse_feature_spec("atr:14").lookback, 14)
+        for spec in ("atr", "cum_volume:5", "unknown:3", "ret:0"):
+            with self.assertRaises(ValueError):
+                parse_feature_spec(spec)
+        with self.assertRaises(ValueError):
+            AppConfig(asset_type="spot", time_period="daily", data_type="klines", data_frequency="1d",
+                      features=["ret:5"])
+
+if __name__ == "__main__":
+    unittest.main()
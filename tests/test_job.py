@@ -0,0 +1,108 @@
+import io
+import os
+import shutil
+import tempfile
+import unittest
+import zipfile
+from unittest.mock import patch, MagicMock
+from crypto_pipeline.config import AppConfig, JobConfig
+from crypto_pipeline.job import JobRunner
+from crypto_pipeline.journal import RunJournal, default_journal_path, EXTRACTED, LOADED
+from crypto_pipeline.symbol_fetcher import SymbolFetcher
+
+BASE = "https://data.binance.vision/data/spot/daily/klines"
+
+class TestJobConfig(unittest.TestCase):
+    def test_defaults_and_expansion(self):
+        job = JobConfig(
+            defaults={"time_period": "monthly", "destination_dir": "job_data"},
+            datasets=[
+                {"asset_type": ["spot", "um"], "data_type": "klines", "data_frequency": ["1m", "1h"]},
+                {"asset_type": "spot", "data_type": "aggTrades"},
+            ],
+            max_workers=8,
+        )
+        self.assertEqual(len(job.datasets), 5)
+        self.assertEqual(job.datasets[0].dataset_key, "spot/klines/1m")
+        self.assertEqual(job.datasets[3].dataset_key, "um/klines/1h")
+        self.assertTrue(all(d.destination_dir == "job_data" for d in job.datasets))
+        self.assertEqual(job.max_workers, 8)
+
+    def test_empty_job_fails(self):
+        with self.assertRaises(ValueError):
+            JobConfig(datasets=[])
+
+class TestSymbolCatalog(unittest.TestCase):
+    @patch('requests.get')
+    def test_symbols_fetched_once_per_source(self, mock_get):
+        mock_response = MagicMock()
+        mock_response.json.return_value = {"symbols": [{"symbol": "BTCUSDT"}, {"symbol": "ETHBTC"}]}
+        mock_get.return_value = mock_response
+
+        fetcher = SymbolFetcher()
+        base = dict(asset_type="spot", time_period="daily", data_type="klines")
+        usdt = fetcher.get_symbols_cached(AppConfig(**base, data_frequency="1m", symbol_suffix=["USDT"]))
+        btc = fetcher.get_symbols_cached(AppConfig(**base, data_frequency="1h", symbol_suffix=["BTC"]))
+
+        self.assertEqual(usdt, ["BTCUSDT"])
+        self.assertEqual(btc, ["ETHBTC"])
+        self.assertEqual(mock_get.call_count, 1)
+
+def zip_bytes(archive_url):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as zf:
+        zf.writestr(os.path.basename(archive_url).replace(".zip", ".csv"),
+                    "1704067200000,1,1,1,1,1,1704067259999,1,1,1,1,0\n")
+    return buffer.getvalue()
+
+class TestJobRunner(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_pool_per_host_used(self):
+        runner = JobRunner([
+            {"asset_type": "spot", "time_period": "monthly", "data_type": "klines", "data_frequency": "1m"},
+            {"asset_type": "um", "time_period": "monthly", "data_type": "klines", "data_frequency": "1m"},
+            {"asset_type": "um", "time_period": "monthly", "data_type": "klines", "data_frequency": "1h"},
+        ])
+        # data.binance.vision, the S3 listing host, api.binance.com and fapi.binance.com
+        self.assertEqual(runner.session.get_adapter("https://data.binance.vision")._pool_connections, 4)
+
+    def test_downloads_are_scheduled_and_journaled_per_dataset(self):
+        base = {"asset_type": "spot", "time_period": "daily", "data_type": "klines",
+                "destination_dir": self.tmp_dir, "schema_check": "off"}
+        runner = JobRunner({"datasets": [{**base, "data_frequency": "1m", "download_order": "newest"},
+                                         {**base, "data_frequency": "1h"}],
+                            "max_workers": 1, "profile_dir": os.path.join(self.tmp_dir, "profiles")})
+        runner.fetcher.get_symbols_cached = MagicMock(return_value=["BTCUSDT"])
+
+        def list_objects(symbol, config, on_page=None):
+            page = [(f"{BASE}/{symbol}/{config.data_frequency}/{symbol}-{config.data_frequency}-2024-01-0{day}.zip", 100)
+                    for day in (1, 2)]
+            on_page(page)
+            return page
+
+        runner.downloader.list_objects = MagicMock(side_effect=list_objects)
+        runner.downloader.download_file = MagicMock(side_effect=lambda url, dest, config: zip_bytes(url))
+        for pipeline in runner.pipelines:
+            pipeline.verifier = MagicMock()
+            pipeline.loader = MagicMock()
+        runner.run()
+
+        downloaded = [c.args[0] for c in runner.downloader.download_file.call_args_list]
+        self.assertEqual([os.path.basename(u) for u in downloaded if "-1m-" in u],
+                         ["BTCUSDT-1m-2024-01-02.zip", "BTCUSDT-1m-2024-01-01.zip"])
+        for pipeline in runner.pipelines:
+            state = RunJournal.replay(default_journal_path(pipeline.config))
+            self.assertTrue(state.listing_complete)
+            self.assertEqual(set(state.units.values()), {EXTRACTED})
+            self.assertEqual(state.symbols, {"BTCUSDT": LOADED})
+            pipeline.loader.load.assert_called_once_with(["BTCUSDT"], pipeline.config, None)
+        reports = os.listdir(runner.profiler.run_dir)
+        self.assertTrue({"fetch.txt", "list.txt", "download.txt", "extract.txt", "load.txt"} <= set(reports))
+
+if __name__ == "__main__":
+    unittest.main()
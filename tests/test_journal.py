@@ -0,0 +1,97 @@
+import io
+import os
+import shutil
+import tempfile
+import unittest
+import zipfile
+from unittest.mock import MagicMock
+from crypto_pipeline.journal import RunJournal, default_journal_path, EXTRACTED, FAILED, LOADED
+from crypto_pipeline.pipeline import Pipeline
+
+BASE = "https://data.binance.vision/data/spot/daily/klines/BTCUSDT/1m"
+URLS = [f"{BASE}/BTCUSDT-1m-2024-01-01.zip", f"{BASE}/BTCUSDT-1m-2024-01-02.zip"]
+
+def zip_bytes(url):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as zf:
+        zf.writestr(os.path.basename(url).replace(".zip", ".csv"), "1704067200000,1,1,1,1,1,1704067259999,1,1,1,1,0\n")
+    return buffer.getvalue()
+
+class TestRunJournal(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.pipeline = Pipeline({"asset_type": "spot", "time_period": "daily", "data_type": "klines",
+                                  "data_frequency": "1m", "destination_dir": self.tmp_dir})
+        self.pipeline.schema_monitor = MagicMock()
+        self.pipeline.schema_monitor.check_schema.return_value = True
+        self.pipeline.fetcher = MagicMock()
+        self.pipeline.fetcher.get_symbols.return_value = ["BTCUSDT"]
+        self.pipeline.verifier = MagicMock()
+        self.pipeline.loader = MagicMock()
+        self.pipeline.downloader = MagicMock()
+        self.pipeline.downloader.download.return_value = URLS
+        self.pipeline.downloader.list_objects.side_effect = self.list_objects
+        self.journal_path = default_journal_path(self.pipeline.config)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    @staticmethod
+    def list_objects(symbol, config, on_page=None):
+        objects = [(url, 100) for url in URLS]
+        if on_page:
+            on_page(objects)
+        return objects
+
+    def test_replay_ignores_torn_line(self):
+        journal = RunJournal(self.journal_path)
+        journal.record_listing(["BTCUSDT"], URLS)
+        journal.record(URLS[0], EXTRACTED)
+        journal.record(URLS[1], FAILED, "download: timeout")
+        journal.close()
+        with open(self.journal_path, "a") as f:
+            f.write('{"unit": "x", "sta')
+
+        state = RunJournal.replay(self.journal_path)
+        self.assertTrue(state.listing_complete)
+        self.assertEqual(state.units, {URLS[0]: EXTRACTED, URLS[1]: FAILED})
+        self.assertEqual(state.reasons[URLS[1]], "download: timeout")
+        self.assertEqual(state.pending(), [URLS[1]])
+
+    def test_retry_failed_reprocesses_only_failed_units(self):
+        def flaky(url, dest, config):
+            if url == URLS[1]:
+                raise ConnectionError("timeout")
+            return zip_bytes(url)
+        self.pipeline.downloader.download_file.side_effect = flaky
+        self.pipeline.run()
+
+        state = RunJournal.replay(self.journal_path)
+        self.assertEqual(state.units[URLS[0]], EXTRACTED)
+        self.assertEqual(state.units[URLS[1]], FAILED)
+        self.assertIn("timeout", state.reasons[URLS[1]])
+
+        self.pipeline.downloader.download_file.reset_mock(side_effect=True)
+        self.pipeline.downloader.download_file.side_effect = lambda url, dest, config: zip_bytes(url)
+        self.pipeline.run(retry_failed=True)
+
+        self.assertEqual([c.args[0] for c in self.pipeline.downloader.download_file.call_args_list], [URLS[1]])
+        state = RunJournal.replay(self.journal_path)
+        self.assertEqual(state.failed(), [])
+        self.assertEqual(state.symbols["BTCUSDT"], LOADED)
+
+    def test_resume_skips_extracted_units(self):
+        journal = RunJournal(self.journal_path)
+        journal.record_listing(["BTCUSDT"], URLS)
+        journal.record(URLS[0], EXTRACTED)
+        journal.close()
+        self.pipeline.downloader.download_file.side_effect = lambda url, dest, config: zip_bytes(url)
+
+        self.pipeline.run(resume=True)
+
+        self.pipeline.downloader.download.assert_not_called()
+        self.assertEqual([c.args[0] for c in self.pipeline.downloader.download_file.call_args_list], [URLS[1]])
+        self.assertEqual(RunJournal.replay(self.journal_path).units[URLS[1]], EXTRACTED)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,117 @@
+import os
+import shutil
+import tempfile
+import unittest
+import duckdb
+from crypto_pipeline.loader import DuckDBLoader, ensure_klines_schema
+from crypto_pipeline.config import AppConfig
+
+MINUTE = 60_000
+START = 1_735_689_600_000  # 2025-01-01 00:00 UTC
+
+def kline_line(open_time, factor=1):
+    return f"{open_time * factor},1,2,0.5,1.5,10,{(open_time + MINUTE - 1) * factor},15,3,4,6,0\n"
+
+class TestDuckDBLoader(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.config = AppConfig(
+            asset_type="spot",
+            time_period="daily",
+            data_type="klines",
+            data_frequency="1m",
+            destination_dir=self.tmp_dir,
+            db_path=os.path.join(self.tmp_dir, "test.duckdb")
+        )
+        self.loader = DuckDBLoader()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def write_csv(self, symbol, name, lines):
+        path = self.config.dataset_dir(symbol)
+        os.makedirs(path, exist_ok=True)
+        with open(os.path.join(path, name), "w") as f:
+            f.writelines(lines)
+
+    def test_mixed_units_are_normalized_and_sorted(self):
+        # Newer file in microseconds, older in milliseconds, both out of order
+        self.write_csv("BTCUSDT", "BTCUSDT-1m-2025-01-02.csv",
+                       [kline_line(START + (1440 + i) * MINUTE, 1000) for i in (1, 0)])
+        self.write_csv("BTCUSDT", "BTCUSDT-1m-2025-01-01.csv",
+                       [kline_line(START + i * MINUTE) for i in (1, 0)])
+
+        self.loader.load(["BTCUSDT"], self.config)
+
+        con = duckdb.connect(self.config.db_path)
+        rows = con.execute("SELECT open_time, close_time, open_ts FROM klines").fetchall()
+        con.close()
+
+        self.assertEqual([r[0] for r in rows],
+                         [START, START + MINUTE, START + 1440 * MINUTE, START + 1441 * MINUTE])
+        self.assertEqual(rows[2][1], START + 1441 * MINUTE - 1)
+        self.assertEqual(str(rows[0][2]), "2025-01-01 00:00:00")
+
+    def test_monthly_file_replaces_daily_rows(self):
+        self.write_csv("BTCUSDT", "BTCUSDT-1m-2025-01-01.csv", [kline_line(START + i * MINUTE) for i in range(2)])
+        self.loader.load(["BTCUSDT"], self.config)
+        # Reloading the same files does not duplicate rows
+        self.loader.load(["BTCUSDT"], self.config)
+
+        # The monthly file covers the daily one and is preferred over it
+        self.write_csv("BTCUSDT", "BTCUSDT-1m-2025-01.csv", [kline_line(START + i * MINUTE, 1000) for i in range(3)])
+        self.loader.load(["BTCUSDT"], self.config)
+
+        con = duckdb.connect(self.config.db_path)
+        rows = con.execute("SELECT open_time FROM klines ORDER BY open_time").fetchall()
+        con.close()
+        self.assertEqual([r[0] for r in rows], [START + i * MINUTE for i in range(3)])
+
+    def test_non_adjacent_files_keep_loaded_days_between(self):
+        def write_day(day):
+            self.write_csv("BTCUSDT", f"BTCUSDT-1m-2025-01-{day:02d}.csv",
+                           [kline_line(START + (day - 1) * 1440 * MINUTE + i * MINUTE) for i in range(2)])
+
+        for day in (1, 2, 3, 4, 6, 10):
+            write_day(day)
+        self.loader.load(["BTCUSDT"], self.config)
+        # Days 5 and 11 arrive later, pending files with loaded days 6 and 10 between them
+        for day in (5, 11):
+            write_day(day)
+        self.loader.load(["BTCUSDT"], self.config)
+
+        con = duckdb.connect(self.config.db_path)
+        days = con.execute("SELECT (open_time - ?) // ? + 1, count(*) FROM klines GROUP BY ALL ORDER BY 1",
+                           [START, 1440 * MINUTE]).fetchall()
+        con.close()
+        self.assertEqual(days, [(day, 2) for day in (1, 2, 3, 4, 5, 6, 10, 11)])
+
+    def test_loads_are_logged_per_file_period(self):
+        day = 1440 * MINUTE
+        self.write_csv("BTCUSDT", "BTCUSDT-1m-2025-01-01.csv", [kline_line(START)])
+        self.write_csv("BTCUSDT", "BTCUSDT-1m-2025-01-03.csv", [kline_line(START + 2 * day)])
+        self.loader.load(["BTCUSDT"], self.config)
+
+        con = duckdb.connect(self.config.db_path)
+        loads = con.execute("SELECT load_id, symbol, interval, lo, hi FROM kline_loads ORDER BY lo").fetchall()
+        con.close()
+        self.assertEqual(loads, [(1, "BTCUSDT", "1m", START, START + day),
+                                 (1, "BTCUSDT", "1m", START + 2 * day, START + 3 * day)])
+
+    def test_legacy_table_is_migrated(self):
+        con = duckdb.connect()
+        con.execute("""
+            CREATE TABLE klines (open_time BIGINT, open DOUBLE, high DOUBLE, low DOUBLE, close DOUBLE,
+                volume DOUBLE, close_time BIGINT, quote_asset_volume DOUBLE, number_of_trades BIGINT,
+                taker_buy_base_asset_volume DOUBLE, taker_buy_quote_asset_volume DOUBLE, ignore DOUBLE,
+                symbol VARCHAR, interval VARCHAR)
+        """)
+        con.execute("INSERT INTO klines VALUES (?, 1, 1, 1, 1, 1, ?, 1, 1, 1, 1, 0, 'BTCUSDT', '1m')",
+                    [START * 1000, (START + MINUTE - 1) * 1000])
+
+        ensure_klines_schema(con)
+
+        self.assertEqual(con.execute("SELECT open_time, close_time FROM klines").fetchone(),
+                         (START, START + MINUTE - 1))
+        self.assertEqual(str(con.execute("SELECT open_ts FROM klines").fetchone()[0]), "2025-01-01 00:00:00")
+        con.close()
@@ -0,0 +1,96 @@
+import os
+import shutil
+import tempfile
+import unittest
+import duckdb
+import numpy as np
+from crypto_pipeline.config import AppConfig
+from crypto_pipeline.loader import ensure_klines_schema
+from crypto_pipeline.mmap_cache import MmapKlineCache
+
+MINUTE = 60_000
+FEB = 1_706_745_600_000  # 2024-02-01 00:00 UTC
+
+class TestMmapKlineCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.config = AppConfig(
+            asset_type="spot",
+            time_period="monthly",
+            data_type="klines",
+            data_frequency="1m",
+            db_path=os.path.join(self.tmp_dir, "cache.duckdb")
+        )
+        self.cache = MmapKlineCache(os.path.join(self.tmp_dir, "mmap"))
+        con = duckdb.connect(self.config.db_path)
+        ensure_klines_schema(con)
+        con.close()
+        self.insert(FEB - 30 * MINUTE, FEB + 30 * MINUTE)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def insert(self, start, end):
+        con = duckdb.connect(self.config.db_path)
+        con.execute(f"""
+            INSERT INTO klines
+            SELECT t, 1, 2, 0.5, t / {MINUTE}, 1, t + {MINUTE} - 1, 1, 3, 1, 1, 0, 'BTCUSDT', '1m', epoch_ms(t)
+            FROM range({start}, {end}, {MINUTE}) r(t)
+        """)
+        con.close()
+
+    def test_export_and_slice(self):
+        self.assertEqual(self.cache.refresh(["BTCUSDT"], self.config), 60)
+
+        btc = self.cache.open("BTCUSDT", "1m")
+        self.assertEqual(len(btc), 60)
+        self.assertIsInstance(btc["close"], np.memmap)
+        self.assertEqual(btc.index["months"], {"2024-01": 0, "2024-02": 30})
+
+        window = btc.slice(FEB - MINUTE, FEB + MINUTE, ["open_time", "number_of_trades"])
+        np.testing.assert_array_equal(window["open_time"], [FEB - MINUTE, FEB])
+        np.testing.assert_array_equal(window["number_of_trades"], [3, 3])
+        self.assertEqual(len(btc.slice("2024-02-01")["close"]), 30)
+
+    def test_incremental_refresh(self):
+        self.cache.refresh(["BTCUSDT"], self.config)
+        self.insert(FEB + 30 * MINUTE, FEB + 40 * MINUTE)
+
+        self.assertEqual(self.cache.refresh(["BTCUSDT"], self.config), 10)
+        self.assertEqual(self.cache.refresh(["BTCUSDT"], self.config), 0)
+
+        btc = self.cache.open("BTCUSDT", "1m")
+        self.assertEqual(len(btc), 70)
+        self.assertTrue(np.all(np.diff(btc["open_time"]) == MINUTE))
+
+    def test_changed_rows_are_rewritten(self):
+        self.cache.refresh(["BTCUSDT"], self.config)
+        btc = self.cache.open("BTCUSDT", "1m")
+        con = duckdb.connect(self.config.db_path)
+        # An archive replaces a January row, older data is backfilled
+        con.execute("UPDATE klines SET close = 42 WHERE open_time = ?", [FEB - 10 * MINUTE])
+        con.close()
+        self.insert(FEB - 40 * MINUTE, FEB - 30 * MINUTE)
+
+        # January and everything after it is rewritten
+        self.assertEqual(self.cache.refresh(["BTCUSDT"], self.config), 70)
+        self.assertEqual(self.cache.refresh(["BTCUSDT"], self.config), 0)
+
+        refreshed = self.cache.open("BTCUSDT", "1m")
+        self.assertEqual(len(refreshed), 70)
+        self.assertEqual(refreshed.index["first_open_time"], FEB - 40 * MINUTE)
+        self.assertEqual(refreshed.slice(FEB - 10 * MINUTE, FEB - 9 * MINUTE)["close"][0], 42)
+        self.assertTrue(np.all(np.diff(refreshed["open_time"]) == MINUTE))
+        # Maps opened before the refresh still read the old file
+        self.assertEqual(len(btc["close"]), 60)
+
+    def test_only_changed_month_is_rewritten(self):
+        self.cache.refresh(["BTCUSDT"], self.config)
+        con = duckdb.connect(self.config.db_path)
+        con.execute("UPDATE klines SET volume = 7 WHERE open_time = ?", [FEB + MINUTE])
+        con.close()
+        self.assertEqual(self.cache.refresh(["BTCUSDT"], self.config), 30)
+        self.assertEqual(self.cache.open("BTCUSDT", "1m")["volume"][31], 7)
+
+    def test_missing_symbol_is_empty(self):
+        self.assertEqual(len(self.cache.open("ETHUSDT", "1m").slice()["close"]), 0)
@@ -35,3 +35,13 @@ def test_spot_monthly_passes():
     )
     assert config.asset_type == "spot"
     assert config.time_period == "monthly"
+
+def test_option_hybrid_fails():
+    """Test that option asset type with hybrid time period fails validation."""
+    with pytest.raises(ValidationError):
+        AppConfig(
+            asset_type="option",
+            time_period="hybrid",
+            data_type="klines",
+            data_frequency="1d"
+        )
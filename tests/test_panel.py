@@ -0,0 +1,68 @@
+import os
+import shutil
+import tempfile
+import unittest
+import duckdb
+import numpy as np
+from crypto_pipeline.loader import ensure_klines_schema
+from crypto_pipeline.panel import PanelBuilder, ffill
+
+HOUR = 3_600_000
+START = 1_704_067_200_000  # 2024-01-01 00:00 UTC
+
+class TestPanelBuilder(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.db_path = os.path.join(self.tmp_dir, "test.duckdb")
+        con = duckdb.connect(self.db_path)
+        ensure_klines_schema(con)
+        con.close()
+        self.builder = PanelBuilder(self.db_path, os.path.join(self.tmp_dir, "panels"))
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def insert(self, symbol, hours):
+        con = duckdb.connect(self.db_path)
+        for h in hours:
+            con.execute("""
+                INSERT INTO klines (open_time, close, volume, symbol, interval)
+                VALUES (?, ?, ?, ?, '1h')
+            """, [START + h * HOUR, 100.0 + h, 1.0, symbol])
+        con.close()
+
+    def test_aligned_panel_with_fill_policies(self):
+        self.insert("BTCUSDT", [0, 1, 2, 3])
+        self.insert("ETHUSDT", [1, 3])
+
+        self.assertEqual(self.builder.build(["ETHUSDT", "BTCUSDT"], "1h", ["close"]), 4)
+        panel = self.builder.open("1h")
+        np.testing.assert_array_equal(panel.times(), START + np.arange(4) * HOUR)
+        np.testing.assert_array_equal(panel["close"][:, 1], [100, 101, 102, 103])
+        # ETH: NaN before its first kline, then carried forward
+        np.testing.assert_array_equal(panel["close"][:, 0], [np.nan, 101, 101, 103])
+
+        nan_builder = PanelBuilder(self.db_path, os.path.join(self.tmp_dir, "nan_panels"))
+        nan_builder.build(["ETHUSDT"], "1h", ["close"], fill="nan")
+        np.testing.assert_array_equal(nan_builder.open("1h")["close"][:, 0], [101, np.nan, 103])
+
+    def test_incremental_update_appends_and_refreshes_tail(self):
+        self.insert("BTCUSDT", [0, 1])
+        self.builder.build(["BTCUSDT"], "1h", ["close"])
+        # A late kline for a stored row and a new one
+        self.insert("BTCUSDT", [2, 4])
+        self.builder.build(["BTCUSDT"], "1h", ["close"])
+
+        panel = self.builder.open("1h")
+        np.testing.assert_array_equal(panel["close"][:, 0], [100, 101, 102, 102, 104])
+        self.assertEqual(panel.row_range(START + 2 * HOUR, START + 4 * HOUR), slice(2, 4))
+
+        with self.assertRaises(ValueError):
+            self.builder.build(["ETHUSDT"], "1h", ["close"])
+
+    def test_ffill_uses_carry(self):
+        block = np.array([[np.nan, 1.0], [2.0, np.nan]])
+        np.testing.assert_array_equal(ffill(block, np.array([5.0, np.nan])), [[5.0, 1.0], [2.0, 1.0]])
+
+if __name__ == "__main__":
+    unittest.main()
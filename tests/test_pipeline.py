@@ -0,0 +1,140 @@
+import io
+import os
+import re
+import shutil
+import tempfile
+import threading
+import unittest
+import zipfile
+from unittest.mock import MagicMock
+from crypto_pipeline.journal import RunJournal, default_journal_path, EXTRACTED, FAILED
+from crypto_pipeline.pipeline import Pipeline, package_version
+from crypto_pipeline.schema_monitor import SchemaMonitor
+
+BASE = "https://data.binance.vision/data/spot/daily/klines"
+
+def url(symbol, day):
+    return f"{BASE}/{symbol}/1m/{symbol}-1m-2024-01-0{day}.zip"
+
+def zip_bytes(archive_url, row="1704067200000,1,1,1,1,1,1704067259999,1,1,1,1,0\n"):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as zf:
+        zf.writestr(os.path.basename(archive_url).replace(".zip", ".csv"), row)
+    return buffer.getvalue()
+
+class TestPackageVersion(unittest.TestCase):
+    def test_version_comes_from_package_metadata(self):
+        root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        with open(os.path.join(root, "pyproject.toml")) as f:
+            declared = re.search(r'^version = "([^"]+)"', f.read(), re.MULTILINE).group(1)
+        self.assertEqual(package_version(), declared)
+
+class TestBootstrap(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.pipeline = Pipeline({"asset_type": "spot", "time_period": "daily", "data_type": "klines",
+                                  "data_frequency": "1m", "destination_dir": self.tmp_dir, "max_workers": 2})
+        self.pipeline.schema_monitor = MagicMock()
+        self.pipeline.fetcher = MagicMock()
+        self.pipeline.verifier = MagicMock()
+        self.pipeline.loader = MagicMock()
+        self.pipeline.downloader = MagicMock()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_schema_check_and_symbols_run_concurrently(self):
+        both_started = threading.Barrier(2, timeout=5)
+
+        def check_schema(config):
+            both_started.wait()
+            return True
+
+        def get_symbols(config):
+            both_started.wait()
+            return ["BTCUSDT", "ETHUSDT"]
+
+        self.pipeline.schema_monitor.check_schema.side_effect = check_schema
+        self.pipeline.fetcher.get_symbols.side_effect = get_symbols
+        self.assertEqual(self.pipeline._prepare(), ["BTCUSDT", "ETHUSDT"])
+
+    def test_schema_mismatch_aborts(self):
+        self.pipeline.schema_monitor.check_schema.return_value = False
+        self.pipeline.fetcher.get_symbols.return_value = ["BTCUSDT"]
+        self.assertIsNone(self.pipeline._prepare())
+
+    def test_downloads_start_with_first_listing_page(self):
+        first_download = threading.Event()
+
+        def list_objects(symbol, config, on_page=None):
+            first_page = [(url(symbol, 1), 100)]
+            on_page(first_page)
+            # The second page of a symbol is only listed once its first page is downloading
+            self.assertTrue(first_download.wait(5))
+            second_page = [(url(symbol, 2), 100)]
+            on_page(second_page)
+            return first_page + second_page
+
+        def download_file(archive_url, dest, config):
+            first_download.set()
+            return zip_bytes(archive_url)
+
+        self.pipeline.schema_monitor.check_schema.return_value = True
+        self.pipeline.fetcher.get_symbols.return_value = ["BTCUSDT"]
+        self.pipeline.downloader.list_objects.side_effect = list_objects
+        self.pipeline.downloader.download_file.side_effect = download_file
+        self.pipeline.run()
+
+        self.pipeline.downloader.download.assert_not_called()
+        state = RunJournal.replay(default_journal_path(self.pipeline.config))
+        self.assertTrue(state.listing_complete)
+        self.assertEqual(state.batch, ["BTCUSDT"])
+        self.assertEqual(state.units, {url("BTCUSDT", 1): EXTRACTED, url("BTCUSDT", 2): EXTRACTED})
+        self.pipeline.loader.load.assert_called_once_with(["BTCUSDT"], self.pipeline.config, None)
+
+    def test_drifted_archive_is_quarantined_and_journaled(self):
+        drifted = url("BTCUSDT", 2)
+        archives = {url("BTCUSDT", 1): zip_bytes(url("BTCUSDT", 1)),
+                    drifted: zip_bytes(drifted, "1704153600000,1,1,1,1,1,1704239999999,1,1,1,1,0,extra\n")}
+        # Cold fingerprint cache: the first listed archive is sampled with a Range read
+        monitor = SchemaMonitor(session=MagicMock())
+        monitor.http.get.return_value.content = archives[url("BTCUSDT", 1)]
+        self.pipeline.schema_monitor = monitor
+        self.pipeline.fetcher.get_symbols.return_value = ["BTCUSDT"]
+        self.pipeline.downloader.list_objects.side_effect = lambda symbol, config, on_page: on_page(
+            [(archive_url, 100) for archive_url in archives])
+        self.pipeline.downloader.download_file.side_effect = lambda archive_url, dest, config: archives[archive_url]
+        self.pipeline.run()
+
+        self.assertEqual(monitor.http.get.call_args.args[0], url("BTCUSDT", 1))
+        self.assertIn("Range", monitor.http.get.call_args.kwargs["headers"])
+        state = RunJournal.replay(default_journal_path(self.pipeline.config))
+        self.assertEqual(state.units, {url("BTCUSDT", 1): EXTRACTED, drifted: FAILED})
+        self.assertTrue(os.path.exists(os.path.join(self.tmp_dir, "quarantine", os.path.basename(drifted))))
+        self.assertEqual(os.listdir(self.pipeline.config.dataset_dir("BTCUSDT")), ["BTCUSDT-1m-2024-01-01.csv"])
+    def test_process_mode_extracts_from_the_downloaded_file(self):
+        self.pipeline.config.extract_mode = "process"
+        self.pipeline.config.max_extract_workers = 1
+        self.pipeline.schema_monitor.check_schema.return_value = True
+        self.pipeline.schema_monitor.check_archive.return_value = True
+        self.pipeline.fetcher.get_symbols.return_value = ["BTCUSDT"]
+        self.pipeline.downloader.list_objects.side_effect = lambda symbol, config, on_page: on_page(
+            [(url(symbol, 1), 100)])
+        spooled = []
+
+        def download_to(archive_url, path, config):
+            spooled.append(path)
+            with open(path, "wb") as f:
+                f.write(zip_bytes(archive_url))
+
+        self.pipeline.downloader.download_to.side_effect = download_to
+        self.pipeline.run()
+
+        self.pipeline.downloader.download_file.assert_not_called()
+        self.assertEqual(os.listdir(self.pipeline.config.dataset_dir("BTCUSDT")), ["BTCUSDT-1m-2024-01-01.csv"])
+        # The spool file was handed to the worker process and removed afterwards
+        self.assertEqual(len(spooled), 1)
+        self.assertFalse(os.path.exists(spooled[0]))
+
+if __name__ == "__main__":
+    unittest.main()
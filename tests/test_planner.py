@@ -0,0 +1,101 @@
+import os
+import tempfile
+import unittest
+from unittest.mock import MagicMock
+from crypto_pipeline.catalog import catalog_path, open_catalog
+from crypto_pipeline.config import AppConfig
+from crypto_pipeline.planner import PROBE_BYTES, Planner, DownloadPlan, format_bytes
+
+BASE = "https://data.binance.vision/data/spot/daily/klines"
+
+
+class TestPlanner(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.config = AppConfig(
+            asset_type="spot",
+            time_period="daily",
+            data_type="klines",
+            data_frequency="1m",
+            destination_dir=self.tmp.name,
+            max_workers=4,
+            bandwidth_mbps=8.0,
+        )
+        listing = {
+            "BTCUSDT": [(f"{BASE}/BTCUSDT/1m/BTCUSDT-1m-2024-01-01.zip", 1000),
+                        (f"{BASE}/BTCUSDT/1m/BTCUSDT-1m-2024-01-02.zip", 3000)],
+            "ETHUSDT": [(f"{BASE}/ETHUSDT/1m/ETHUSDT-1m-2024-01-01.zip", 500)],
+        }
+        self.downloader = MagicMock()
+        self.downloader.list_objects.side_effect = lambda symbol, config: listing[symbol]
+        self.downloader.http.get.side_effect = Exception("offline")
+
+        # First BTC day is already extracted
+        btc_dir = self.config.dataset_dir("BTCUSDT")
+        os.makedirs(btc_dir)
+        open(os.path.join(btc_dir, "BTCUSDT-1m-2024-01-01.csv"), "w").close()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_plan_subtracts_existing_files(self):
+        plan = Planner(self.downloader).plan(["BTCUSDT", "ETHUSDT"], self.config)
+
+        self.assertEqual(plan.total_files, 3)
+        self.assertEqual(plan.total_bytes, 4500)
+        self.assertEqual(plan.pending_files, 2)
+        self.assertEqual(plan.pending_bytes, 3500)
+        self.assertEqual([item.url.rsplit("/", 1)[1] for item in plan.items],
+                         ["BTCUSDT-1m-2024-01-02.zip", "ETHUSDT-1m-2024-01-01.zip"])
+        btc = next(entry for entry in plan.per_symbol if entry.symbol == "BTCUSDT")
+        self.assertEqual((btc.files, btc.pending_files, btc.pending_bytes), (2, 1, 3000))
+
+        # 8 Mbit/s = 1 MB/s, plus 2 requests * 0.2 s latency over 4 workers
+        self.assertEqual(plan.bandwidth_bps, 1_000_000)
+        self.assertAlmostEqual(plan.estimated_seconds, 3500 / 1_000_000 + 2 * 0.2 / 4)
+        # The configured bandwidth is not measured
+        self.downloader.http.get.assert_not_called()
+        # A dry run does not create the file catalog
+        self.assertFalse(os.path.exists(catalog_path(self.config)))
+
+    def test_compacted_days_are_done(self):
+        btc_dir = self.config.dataset_dir("BTCUSDT")
+        parquet = os.path.join(btc_dir, "BTCUSDT-1m-2024-01.parquet")
+        open(parquet, "w").close()
+        catalog = open_catalog(self.config)
+        catalog.add_compacted(parquet, ["2024-01-02"])
+
+        plan = Planner(self.downloader).plan(["BTCUSDT", "ETHUSDT"], self.config)
+        self.assertEqual([item.url.rsplit("/", 1)[1] for item in plan.items], ["ETHUSDT-1m-2024-01-01.zip"])
+
+    def test_measurement_reads_a_bounded_range(self):
+        response = MagicMock()
+        response.elapsed.total_seconds.return_value = 0.1
+        response.iter_content.return_value = iter([b"x" * 1024 * 1024] * 100)
+        self.downloader.http.get.side_effect = None
+        self.downloader.http.get.return_value = response
+        config = self.config.model_copy(update={"bandwidth_mbps": None})
+
+        plan = Planner(self.downloader).plan(["BTCUSDT", "ETHUSDT"], config)
+
+        _, kwargs = self.downloader.http.get.call_args
+        self.assertEqual(kwargs["headers"], {"Range": f"bytes=0-{PROBE_BYTES - 1}"})
+        self.assertTrue(kwargs["stream"])
+        # Reading stops at PROBE_BYTES even if the server ignores the range
+        self.assertEqual(len(list(response.iter_content.return_value)), 100 - PROBE_BYTES // (1024 * 1024))
+        response.close.assert_called_once()
+        self.assertGreater(plan.bandwidth_bps, 0)
+        self.assertIn("assumed to scale linearly to 4 workers", plan.bandwidth_source)
+
+    def test_plan_round_trip(self):
+        plan = Planner(self.downloader).plan(["BTCUSDT", "ETHUSDT"], self.config)
+        path = os.path.join(self.tmp.name, "plan.json")
+        plan.save(path)
+        self.assertEqual(DownloadPlan.load(path), plan)
+
+    def test_format_bytes(self):
+        self.assertEqual(format_bytes(1536), "1.5 KB")
+
+
+if __name__ == "__main__":
+    unittest.main()
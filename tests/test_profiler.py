@@ -0,0 +1,71 @@
+import os
+import shutil
+import tempfile
+import time
+import tracemalloc
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from crypto_pipeline.pipeline import Pipeline
+from crypto_pipeline.profiler import StageProfiler
+
+
+def busy_allocation(seconds=0.3):
+    blocks = []
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        blocks.append(bytearray(1024))
+    return blocks
+
+
+class TestStageProfiler(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def read(self, profiler, name):
+        with open(os.path.join(profiler.run_dir, f"{name}.txt")) as f:
+            return f.read()
+
+    def test_report_has_hot_functions_and_allocators(self):
+        profiler = StageProfiler(self.tmp_dir, interval=0.005)
+        with profiler.stage("extract"):
+            blocks = busy_allocation()
+        report = self.read(profiler, "extract")
+        self.assertIn("Stage: extract", report)
+        self.assertIn("busy_allocation", report)
+        self.assertIn("test_profiler.py", report.split("Top allocators")[1])
+        self.assertTrue(blocks)
+        self.assertFalse(tracemalloc.is_tracing())
+
+    def test_executor_threads_are_attributed_by_prefix(self):
+        profiler = StageProfiler(self.tmp_dir, interval=0.005)
+        with profiler.stage("download"), profiler.stage("extract"):
+            with ThreadPoolExecutor(max_workers=1, thread_name_prefix="download") as executor:
+                executor.submit(busy_allocation).result()
+        self.assertIn("busy_allocation", self.read(profiler, "download"))
+        extract = self.read(profiler, "extract")
+        self.assertNotIn("busy_allocation", extract)
+        self.assertIn("Concurrent with: download", extract)
+
+    def test_repeated_stage_gets_numbered_report(self):
+        profiler = StageProfiler(self.tmp_dir)
+        for _ in range(2):
+            with profiler.stage("verify"):
+                pass
+        self.assertEqual(sorted(os.listdir(profiler.run_dir)), ["verify-2.txt", "verify.txt"])
+
+    def test_pipeline_profiles_finalize_stages(self):
+        config = {"asset_type": "spot", "time_period": "daily", "data_type": "klines", "data_frequency": "1d",
+                  "destination_dir": self.tmp_dir}
+        self.assertIsNone(Pipeline(config).profiler)
+
+        pipeline = Pipeline({**config, "profile_dir": os.path.join(self.tmp_dir, "profiles")})
+        pipeline._finalize(["BTCUSDT"])
+        self.assertEqual(sorted(os.listdir(pipeline.profiler.run_dir)),
+                         ["after_load.txt", "load.txt", "verify.txt"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,58 @@
+import unittest
+import duckdb
+from crypto_pipeline.resampler import KlineResampler
+from crypto_pipeline.loader import ensure_klines_schema
+
+MINUTE = 60_000
+START = 1_704_067_200_000  # 2024-01-01 00:00 UTC
+
+def insert_minutes(con, start_ms, count, unit_factor=1, symbol="BTCUSDT"):
+    rows = []
+    for i in range(count):
+        t = start_ms + i * MINUTE
+        price = 100.0 + i
+        rows.append((t * unit_factor, price, price + 0.5, price - 0.5, price + 0.25, 1.0,
+                     (t + MINUTE - 1) * unit_factor, price, 2, 0.5, price / 2, 0.0, symbol, "1m", None))
+    con.executemany("INSERT INTO klines VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+
+class TestKlineResampler(unittest.TestCase):
+    def setUp(self):
+        self.con = duckdb.connect()
+        ensure_klines_schema(self.con)
+        self.resampler = KlineResampler()
+
+    def tearDown(self):
+        self.con.close()
+
+    def test_ohlcv_aggregation(self):
+        insert_minutes(self.con, START, 10)
+        rows = self.resampler.resample(self.con, "5m", "1m")
+        self.assertEqual(rows, 2)
+
+        first = self.con.execute("""
+            SELECT open_time, open, high, low, close, volume, close_time, number_of_trades, taker_buy_base_asset_volume
+            FROM klines WHERE interval = '5m' ORDER BY open_time
+        """).fetchone()
+        self.assertEqual(first, (START, 100.0, 104.5, 99.5, 104.25, 5.0, START + 5 * MINUTE - 1, 10, 2.5))
+
+    def test_incomplete_bucket_is_skipped_then_appended(self):
+        insert_minutes(self.con, START, 7)
+        self.assertEqual(self.resampler.resample(self.con, "5m", "1m"), 1)
+
+        insert_minutes(self.con, START + 7 * MINUTE, 3)
+        self.assertEqual(self.resampler.resample(self.con, "5m", "1m"), 1)
+        self.assertEqual(self.resampler.resample(self.con, "5m", "1m"), 0)
+
+        opens = [r[0] for r in self.con.execute("SELECT open_time FROM klines WHERE interval = '5m' ORDER BY 1").fetchall()]
+        self.assertEqual(opens, [START, START + 5 * MINUTE])
+
+    def test_microsecond_source(self):
+        insert_minutes(self.con, START, 60, unit_factor=1000)
+        self.assertEqual(self.resampler.resample(self.con, "1h", "1m"), 1)
+        open_time, open_price = self.con.execute("SELECT open_time, open FROM klines WHERE interval = '1h'").fetchone()
+        self.assertEqual(open_time, START)
+        self.assertEqual(open_price, 100.0)
+
+    def test_not_derivable(self):
+        with self.assertRaises(ValueError):
+            self.resampler.resample(self.con, "1m", "5m")
@@ -0,0 +1,63 @@
+import threading
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor, wait
+from unittest.mock import MagicMock
+from crypto_pipeline.config import AppConfig
+from crypto_pipeline.downloader import Downloader
+from crypto_pipeline.scheduler import DownloadScheduler, TokenBucket, period_rank
+
+BASE = "https://data.binance.vision/data/spot"
+
+class TestTokenBucket(unittest.TestCase):
+    def test_rate_is_shared_by_threads(self):
+        bucket = TokenBucket(1_000_000)
+        bucket.consume(1_000_000)  # drain the burst
+        started = time.monotonic()
+        threads = [threading.Thread(target=bucket.consume, args=(100_000,)) for _ in range(3)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertGreaterEqual(time.monotonic() - started, 0.28)
+
+    def test_downloader_streams_through_limiter(self):
+        response = MagicMock()
+        response.iter_content.return_value = [b"a" * 10, b"b" * 5]
+        session = MagicMock()
+        session.get.return_value = response
+        downloader = Downloader(session=session)
+        config = AppConfig(asset_type="spot", time_period="daily", data_type="klines",
+                           data_frequency="1d", max_bandwidth_mbps=100)
+
+        self.assertEqual(downloader.download_file("http://example.com/a.zip", "dest", config), b"a" * 10 + b"b" * 5)
+        session.get.assert_called_once_with("http://example.com/a.zip", stream=True)
+        self.assertIs(downloader.limiter_for(config), downloader.limiter_for(config.model_copy()))
+
+class TestDownloadScheduler(unittest.TestCase):
+    def run_order(self, order, items):
+        started = []
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            gate = threading.Event()
+            executor.submit(gate.wait)  # keep the worker busy until everything is queued
+            scheduler = DownloadScheduler(executor, order)
+            futures = scheduler.submit_many(items, started.append)
+            gate.set()
+            wait(futures)
+        return started
+
+    def test_newest_first(self):
+        urls = [f"{BASE}/monthly/klines/BTCUSDT/1m/BTCUSDT-1m-2024-01.zip",
+                f"{BASE}/daily/klines/BTCUSDT/1m/BTCUSDT-1m-2024-02-02.zip",
+                f"{BASE}/daily/klines/BTCUSDT/1m/BTCUSDT-1m-2024-02-01.zip"]
+        started = self.run_order("newest", [(url, 1) for url in urls])
+        self.assertEqual(started, [urls[1], urls[2], urls[0]])
+        self.assertGreater(period_rank(urls[0]), period_rank(f"{BASE}/x/BTCUSDT-1m-2024-01-31.zip"))
+
+    def test_largest_first_keeps_listing_order_on_ties(self):
+        items = [("a", 10), ("b", 300), ("c", 10), ("d", 50)]
+        self.assertEqual(self.run_order("largest", items), ["b", "d", "a", "c"])
+        self.assertEqual(self.run_order("listing", items), ["a", "b", "c", "d"])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,7 +1,12 @@
 
+import io
+import os
+import shutil
+import tempfile
 import unittest
+import zipfile
 from unittest.mock import patch, MagicMock
-from crypto_pipeline.schema_monitor import SchemaMonitor
+from crypto_pipeline.schema_monitor import SchemaMonitor, fingerprint_csv_head, csv_head_from_zip
 from crypto_pipeline.config import AppConfig
 
 class TestSchemaMonitor(unittest.TestCase):
@@ -15,21 +20,77 @@ class TestSchemaMonitor(unittest.TestCase):
         )
 
     @patch('requests.get')
-    def test_check_schema_success(self, mock_get):
+    def test_check_api_schema_success(self, mock_get):
         mock_response = MagicMock()
         # Klines expects 12 columns
         mock_response.json.return_value = [[1, 2, 3, 4, 5, 6, 7, 8, 9, 10, 11, 12]]
         mock_get.return_value = mock_response
 
-        result = self.monitor.check_schema(self.config)
+        result = self.monitor.check_api_schema(self.config)
         self.assertTrue(result)
 
     @patch('requests.get')
-    def test_check_schema_failure(self, mock_get):
+    def test_check_api_schema_failure(self, mock_get):
         mock_response = MagicMock()
         # Return 11 columns (invalid)
         mock_response.json.return_value = [[1, 2, 3, 4, 5, 6, 7, 8, 9, 10, 11]]
         mock_get.return_value = mock_response
 
-        result = self.monitor.check_schema(self.config)
+        result = self.monitor.check_api_schema(self.config)
         self.assertFalse(result)
+
+def make_zip(csv_text: str) -> bytes:
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as zf:
+        zf.writestr("BTCUSDT-1d-2025-01-01.csv", csv_text)
+    return buffer.getvalue()
+
+KLINE_ROW = "1735689600000000,1,2,0.5,1.5,10,1735775999999999,15,3,4,6,0\n"
+
+class TestSchemaFingerprint(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.monitor = SchemaMonitor()
+        self.config = AppConfig(
+            asset_type="spot",
+            time_period="daily",
+            data_type="klines",
+            data_frequency="1d",
+            destination_dir=self.tmp_dir
+        )
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_fingerprint_from_partial_zip(self):
+        content = make_zip("open_time,open,high,low,close,volume,close_time,a,b,c,d,ignore\n" + KLINE_ROW * 5000)
+        fingerprint = fingerprint_csv_head(csv_head_from_zip(content[:2048]))
+        self.assertEqual(fingerprint.columns, 12)
+        self.assertTrue(fingerprint.has_header)
+        self.assertEqual(fingerprint.timestamp_unit, "us")
+
+    @patch('requests.get')
+    def test_startup_uses_cache_without_network(self, mock_get):
+        self.assertTrue(self.monitor.check_archive(make_zip(KLINE_ROW), "a.zip", self.config))
+
+        # A fresh monitor reuses the cached fingerprint and never calls the API
+        monitor = SchemaMonitor()
+        self.assertTrue(monitor.check_schema(self.config))
+        mock_get.assert_not_called()
+        self.assertEqual(monitor._references["spot/klines/daily"].columns, 12)
+
+    def test_drift_is_flagged_per_file(self):
+        self.assertTrue(self.monitor.check_archive(make_zip(KLINE_ROW), "good.zip", self.config))
+        self.assertFalse(self.monitor.check_archive(make_zip("1735689600000,1,2,3\n"), "bad.zip", self.config))
+        self.assertFalse(self.monitor.check_archive(b"not a zip", "broken.zip", self.config))
+        self.assertEqual(self.monitor.drifted_files, ["bad.zip", "broken.zip"])
+
+    def test_expired_cache_falls_back_to_local_files(self):
+        self.config.schema_cache_ttl_hours = 0
+        path = self.config.dataset_dir("BTCUSDT")
+        os.makedirs(path)
+        with open(os.path.join(path, "BTCUSDT-1d-2025-01-01.csv"), "w") as f:
+            f.write(KLINE_ROW)
+
+        self.assertTrue(self.monitor.check_schema(self.config))
+        self.assertEqual(self.monitor._references["spot/klines/daily"].timestamp_unit, "us")
@@ -0,0 +1,171 @@
+import hashlib
+import io
+import os
+import re
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+import uuid
+import zipfile
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import patch
+from urllib.parse import parse_qs, unquote, urlparse
+from crypto_pipeline.catalog import open_catalog
+from crypto_pipeline.config import AppConfig
+from crypto_pipeline.extractor import Extractor
+from crypto_pipeline.sink import MIN_PART_BYTES, S3Sink
+
+class FakeS3(BaseHTTPRequestHandler):
+    """Path-style S3 stand-in: PUT/DELETE objects and the multipart upload calls."""
+    protocol_version = "HTTP/1.1"
+
+    def do_PUT(self):
+        key, query, body = self._parse()
+        if "partNumber" in query:
+            if self.server.fail_part == int(query["partNumber"]):
+                return self._reply(500)
+            with self.server.lock:
+                self.server.active += 1
+                self.server.max_active = max(self.server.max_active, self.server.active)
+            time.sleep(0.05)
+            with self.server.lock:
+                self.server.active -= 1
+            self.server.uploads[query["uploadId"]][int(query["partNumber"])] = body
+            return self._reply(200, headers={"ETag": f'"{hashlib.md5(body).hexdigest()}"'})
+        if self.server.fail_put:
+            return self._reply(500)
+        self.server.objects[key] = body
+        self._reply(200)
+
+    def do_POST(self):
+        key, query, body = self._parse()
+        if "uploads" in query:
+            upload_id = uuid.uuid4().hex
+            self.server.uploads[upload_id] = {}
+            return self._reply(200, f"<InitiateMultipartUploadResult><UploadId>{upload_id}</UploadId>"
+                                    f"</InitiateMultipartUploadResult>".encode())
+        parts = self.server.uploads.pop(query["uploadId"])
+        numbers = [int(n) for n in re.findall(r"<PartNumber>(\d+)</PartNumber>", body.decode())]
+        self.server.objects[key] = b"".join(parts[n] for n in numbers)
+        self._reply(200, b"<CompleteMultipartUploadResult/>")
+
+    def do_DELETE(self):
+        key, query, _ = self._parse()
+        if "uploadId" in query:
+            self.server.uploads.pop(query["uploadId"], None)
+            self.server.aborted += 1
+        else:
+            self.server.objects.pop(key, None)
+        self._reply(204)
+
+    def _parse(self):
+        url = urlparse(self.path)
+        body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        assert self.headers["x-amz-content-sha256"] == hashlib.sha256(body).hexdigest()
+        assert self.headers["Authorization"].startswith("AWS4-HMAC-SHA256 Credential=minio/")
+        query = {k: v[0] for k, v in parse_qs(url.query, keep_blank_values=True).items()}
+        return unquote(url.path), query, body
+
+    def _reply(self, status, body=b"", headers=None):
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+class TestS3Sink(unittest.TestCase):
+    def setUp(self):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), FakeS3)
+        self.server.objects, self.server.uploads = {}, {}
+        self.server.lock = threading.Lock()
+        self.server.active = self.server.max_active = self.server.aborted = 0
+        self.server.fail_part = None
+        self.server.fail_put = False
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.endpoint = f"http://127.0.0.1:{self.server.server_port}"
+        self.sink = S3Sink(self.endpoint, "lake", "binance", access_key="minio", secret_key="secret",
+                           part_bytes=MIN_PART_BYTES, workers=3)
+        self.tmp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        self.sink.close()
+        self.server.shutdown()
+        self.server.server_close()
+        shutil.rmtree(self.tmp_dir)
+
+    def test_small_object_single_put(self):
+        self.sink.write("spot/BTCUSDT/1m/a b.csv", b"1,2,3\n")
+        self.assertEqual(self.server.objects, {"/lake/binance/spot/BTCUSDT/1m/a b.csv": b"1,2,3\n"})
+        self.sink.delete("spot/BTCUSDT/1m/a b.csv")
+        self.assertEqual(self.server.objects, {})
+
+    def test_large_file_parallel_multipart(self):
+        content = os.urandom(MIN_PART_BYTES * 3 + 1234)
+        path = os.path.join(self.tmp_dir, "big.csv")
+        with open(path, "wb") as f:
+            f.write(content)
+        self.sink.upload_file("spot/big.csv", path)
+
+        self.assertEqual(self.server.objects["/lake/binance/spot/big.csv"], content)
+        self.assertGreater(self.server.max_active, 1)
+        self.assertEqual(self.server.uploads, {})
+
+    def test_failed_part_aborts_upload(self):
+        self.server.fail_part = 2
+        with self.assertRaises(Exception):
+            self.sink.write("spot/big.csv", os.urandom(MIN_PART_BYTES * 2 + 1))
+        self.assertEqual(self.server.aborted, 1)
+        self.assertEqual(self.server.objects, {})
+
+    def test_extractor_mirrors_local_layout(self):
+        config = AppConfig(asset_type="spot", time_period="daily", data_type="klines", data_frequency="1m",
+                           destination_dir=self.tmp_dir, sink_url="s3://lake/binance", s3_endpoint_url=self.endpoint)
+        buffer = io.BytesIO()
+        with zipfile.ZipFile(buffer, "w") as zf:
+            zf.writestr("BTCUSDT-1m-2024-01-01.csv", "1704067200000,1,1,1,1,1,1704067259999,1,1,1,1,0\n")
+        dest = config.dataset_dir("BTCUSDT")
+        os.makedirs(dest)
+        with patch.dict(os.environ, {"AWS_ACCESS_KEY_ID": "minio", "AWS_SECRET_ACCESS_KEY": "secret"}):
+            Extractor().extract(buffer.getvalue(), dest, config)
+        open_catalog(config).close()
+        self.assertEqual(list(self.server.objects), ["/lake/binance/spot/BTCUSDT/1m/BTCUSDT-1m-2024-01-01.csv"])
+
+    def test_failed_upload_is_extracted_again(self):
+        config = AppConfig(asset_type="spot", time_period="daily", data_type="klines", data_frequency="1m",
+                           destination_dir=self.tmp_dir, sink_url="s3://lake/binance", s3_endpoint_url=self.endpoint)
+        buffer = io.BytesIO()
+        with zipfile.ZipFile(buffer, "w") as zf:
+            zf.writestr("BTCUSDT-1m-2024-01-01.csv", "1704067200000,1,1,1,1,1,1704067259999,1,1,1,1,0\n")
+        dest = config.dataset_dir("BTCUSDT")
+        os.makedirs(dest)
+        with patch.dict(os.environ, {"AWS_ACCESS_KEY_ID": "minio", "AWS_SECRET_ACCESS_KEY": "secret"}):
+            for mode in ("thread", "process"):
+                mode_config = config.model_copy(update={"extract_mode": mode})
+                extractor = Extractor()
+                try:
+                    self.server.fail_put = True
+                    with self.assertRaises(Exception):
+                        extractor.extract(buffer.getvalue(), dest, mode_config)
+                    self.assertEqual(os.listdir(dest), [])
+                    self.assertEqual(open_catalog(config).files(dest), [])
+
+                    # The next run extracts and uploads the archive
+                    self.server.fail_put = False
+                    self.assertEqual(extractor.extract(buffer.getvalue(), dest, mode_config), 1)
+                finally:
+                    extractor.close()
+                self.assertEqual(list(self.server.objects), ["/lake/binance/spot/BTCUSDT/1m/BTCUSDT-1m-2024-01-01.csv"])
+                self.assertEqual(len(open_catalog(config).files(dest)), 1)
+                os.remove(os.path.join(dest, "BTCUSDT-1m-2024-01-01.csv"))
+                open_catalog(config).sync(dest, "klines")
+                self.server.objects.clear()
+        open_catalog(config).close()
+
+if __name__ == "__main__":
+    unittest.main()
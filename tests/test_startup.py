@@ -0,0 +1,74 @@
+import os
+import re
+import subprocess
+import sys
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Startup budgets, as cumulative import time reported by `python -X importtime`
+# (interpreter startup itself is excluded)
+HELP_BUDGET_MS = 150
+NOOP_RUN_BUDGET_MS = 1000
+
+HEAVY_MODULES = {"duckdb", "numpy", "prefect", "rich", "pydantic", "requests", "natsort", "yaml", "pyarrow"}
+
+# A real run with nothing to do: the journal of the previous run is complete,
+# so resuming it lists, downloads and loads nothing, and any network access fails
+NOOP_RUN = """
+import tempfile
+from crypto_pipeline.pipeline import Pipeline
+from crypto_pipeline.journal import RunJournal, default_journal_path, EXTRACTED, LOADED
+pipeline = Pipeline({"asset_type": "spot", "time_period": "daily", "data_type": "klines", "data_frequency": "1d",
+                     "destination_dir": tempfile.mkdtemp(), "schema_check": "off"})
+journal = RunJournal(default_journal_path(pipeline.config))
+journal.record_listing(["BTCUSDT"], ["https://data.binance.vision/x.zip"])
+journal.record("https://data.binance.vision/x.zip", EXTRACTED)
+journal.record_listing_complete(["BTCUSDT"])
+journal.record_symbols(["BTCUSDT"], LOADED)
+journal.close()
+pipeline.fetcher.http = pipeline.downloader.http = pipeline.schema_monitor.http = None
+pipeline.run(resume=True)
+"""
+
+def import_profile(*args, stdout=None):
+    """Return ({top-level module: cumulative us}, all imported modules) for a Python invocation."""
+    result = subprocess.run([sys.executable, "-X", "importtime", *args], cwd=ROOT,
+                            capture_output=True, text=True, check=True)
+    if stdout is not None:
+        stdout.append(result.stdout)
+    top_level, modules = {}, set()
+    for line in result.stderr.splitlines():
+        match = re.match(r"import time:\s+\d+ \|\s+(\d+) \|( +)(\S+)$", line)
+        if not match:
+            continue
+        modules.add(match.group(3))
+        if len(match.group(2)) == 1:
+            top_level[match.group(3)] = int(match.group(1))
+    return top_level, modules
+
+def import_ms(profile, baseline):
+    return sum(us for name, us in profile.items() if name not in baseline) / 1000
+
+class TestStartup(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.baseline, _ = import_profile("-c", "pass")
+
+    def test_help_imports_no_heavy_dependencies(self):
+        profile, modules = import_profile("main.py", "--help")
+        self.assertFalse(HEAVY_MODULES & {m.split(".")[0] for m in modules})
+        self.assertLess(import_ms(profile, self.baseline), HELP_BUDGET_MS)
+
+    def test_noop_run_without_db_skips_duckdb(self):
+        stdout = []
+        profile, modules = import_profile("-c", NOOP_RUN, stdout=stdout)
+        self.assertIn("Pipeline execution completed successfully", stdout[0])
+        top = {m.split(".")[0] for m in modules}
+        self.assertNotIn("duckdb", top)
+        self.assertNotIn("numpy", top)
+        self.assertNotIn("prefect", top)
+        # Stages the run does not reach stay unimported
+        self.assertNotIn("multiprocessing", top)
+        self.assertFalse({"crypto_pipeline.planner", "crypto_pipeline.resampler"} & modules)
+        self.assertLess(import_ms(profile, self.baseline), NOOP_RUN_BUDGET_MS)
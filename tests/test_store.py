@@ -0,0 +1,69 @@
+import os
+import shutil
+import tempfile
+import unittest
+import duckdb
+import numpy as np
+from crypto_pipeline.loader import ensure_klines_schema
+from crypto_pipeline.store import KlineStore, BlockCache
+
+MINUTE = 60_000
+JAN = 1_704_067_200_000  # 2024-01-01 00:00 UTC
+FEB = 1_706_745_600_000  # 2024-02-01 00:00 UTC
+
+class TestKlineStore(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.db_path = os.path.join(self.tmp_dir, "store.duckdb")
+        con = duckdb.connect(self.db_path)
+        ensure_klines_schema(con)
+        # Last hour of January and first hour of February for two symbols
+        for symbol, base in (("BTCUSDT", 100.0), ("ETHUSDT", 10.0)):
+            con.execute(f"""
+                INSERT INTO klines
+                SELECT t, {base}, {base}, {base}, {base} + (t - {FEB}) / {MINUTE}, 1, t + {MINUTE} - 1, 1, 1, 1, 1, 0,
+                       '{symbol}', '1m', epoch_ms(t)
+                FROM range({FEB - 60 * MINUTE}, {FEB + 60 * MINUTE}, {MINUTE}) r(t)
+            """)
+        con.close()
+        self.store = KlineStore(self.db_path)
+
+    def tearDown(self):
+        self.store.close()
+        shutil.rmtree(self.tmp_dir)
+
+    def test_range_across_months(self):
+        bars = self.store.get("BTCUSDT", "1m", FEB - 2 * MINUTE, FEB + 2 * MINUTE, ["open_time", "close"])
+        np.testing.assert_array_equal(bars["open_time"], [FEB - 2 * MINUTE, FEB - MINUTE, FEB, FEB + MINUTE])
+        np.testing.assert_array_equal(bars["close"], [98.0, 99.0, 100.0, 101.0])
+        self.assertEqual(list(bars), ["open_time", "close"])
+
+    def test_open_range_and_iso_dates(self):
+        self.assertEqual(len(self.store.get("BTCUSDT", "1m", columns=["close"])["close"]), 120)
+        self.assertEqual(len(self.store.get("BTCUSDT", "1m", "2024-02-01", None, ["close"])["close"]), 60)
+        self.assertEqual(len(self.store.get("DOGEUSDT", "1m", columns=["close"])["close"]), 0)
+
+    def test_closed_months_are_cached(self):
+        self.store.get("BTCUSDT", "1m", JAN, FEB, ["close"])
+        misses = self.store.cache.misses
+        self.store.get("BTCUSDT", "1m", FEB - 10 * MINUTE, FEB, ["close"])
+        self.assertEqual(self.store.cache.misses, misses)
+
+    def test_get_many_arrow(self):
+        tables = self.store.get_many(["BTCUSDT", "ETHUSDT"], "1m", FEB, FEB + MINUTE, ["close"], output="arrow")
+        self.assertEqual(tables["ETHUSDT"].column("close").to_pylist(), [10.0])
+
+    def test_unknown_column(self):
+        with self.assertRaises(ValueError):
+            self.store.get("BTCUSDT", "1m", columns=["price"])
+
+class TestBlockCache(unittest.TestCase):
+    def test_size_based_lru_eviction(self):
+        cache = BlockCache(max_bytes=16 * 8 * 2)
+        cache.put("a", np.zeros(16))
+        cache.put("b", np.zeros(16))
+        cache.get("a")
+        cache.put("c", np.zeros(16))
+        self.assertIsNotNone(cache.get("a"))
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.current_bytes, 16 * 8 * 2)
@@ -0,0 +1,128 @@
+import io
+import subprocess
+import sys
+import threading
+import unittest
+import zipfile
+from unittest.mock import MagicMock
+import numpy as np
+from crypto_pipeline.config import AppConfig
+from crypto_pipeline.stream import iter_batches, parse_csv
+from crypto_pipeline.timeutils import MICROSECOND_THRESHOLD, to_millis
+
+MINUTE = 60_000
+JAN = 1_704_067_200_000  # 2024-01-01 00:00 UTC
+DAY = 86_400_000
+BASE = "https://data.binance.vision/data/spot/daily/klines"
+
+
+def kline_zip(day_start: int, header: bool = False, micros: bool = False) -> bytes:
+    lines = ["open_time,open,high,low,close,volume,close_time,quote_volume,count,"
+             "taker_buy_volume,taker_buy_quote_volume,ignore"] if header else []
+    for i in range(3):
+        t = day_start + i * 8 * 60 * MINUTE
+        scale = 1000 if micros else 1
+        lines.append(f"{t * scale},1,2,0.5,{i},10,{(t + MINUTE - 1) * scale},10,5,1,1,0")
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as zip_file:
+        zip_file.writestr("data.csv", "\n".join(lines) + "\n")
+    return buffer.getvalue()
+
+
+class TestIterBatches(unittest.TestCase):
+    def setUp(self):
+        self.config = AppConfig(asset_type="spot", time_period="daily", data_type="klines",
+                                data_frequency="1m", destination_dir="unused")
+        self.downloader = MagicMock()
+        self.archives = {}
+        for symbol in ("BTCUSDT", "ETHUSDT"):
+            for day in range(3):
+                date = f"2024-01-0{day + 1}"
+                url = f"{BASE}/{symbol}/1m/{symbol}-1m-{date}.zip"
+                self.archives[url] = kline_zip(JAN + day * DAY, header=day == 0)
+        # Listed out of order, as S3 can return across prefixes
+        self.downloader.list_objects.side_effect = lambda symbol, config: [
+            (url, 100) for url in sorted(self.archives, reverse=True) if f"/{symbol}/" in url]
+        self.downloader.download_file.side_effect = lambda url, dest, config: self.archives[url]
+
+    def test_batches_in_time_order_per_symbol(self):
+        batches = list(iter_batches(self.config, ["BTCUSDT", "ETHUSDT"], downloader=self.downloader))
+        self.assertEqual([s for s, _ in batches], ["BTCUSDT"] * 3 + ["ETHUSDT"] * 3)
+        times = np.concatenate([b["open_time"] for s, b in batches if s == "BTCUSDT"])
+        self.assertTrue(np.all(np.diff(times) > 0))
+        self.assertEqual(len(times), 9)
+        self.assertEqual(batches[0][1]["close"].dtype, np.float64)
+        self.assertEqual(batches[0][1]["ignore"].dtype, np.float64)
+
+    def test_range_skips_archives_and_filters_rows(self):
+        start, end = JAN + DAY + 8 * 60 * MINUTE, JAN + 2 * DAY + 8 * 60 * MINUTE
+        batches = list(iter_batches(self.config, ["BTCUSDT"], start, end, downloader=self.downloader))
+        times = np.concatenate([b["open_time"] for _, b in batches])
+        np.testing.assert_array_equal(times, [start, start + 8 * 60 * MINUTE, JAN + 2 * DAY])
+        downloaded = [c.args[0] for c in self.downloader.download_file.call_args_list]
+        self.assertEqual(len(downloaded), 2)
+        self.assertFalse(any("2024-01-01" in url for url in downloaded))
+
+    def test_batch_rows_splits_archives(self):
+        batches = list(iter_batches(self.config, ["BTCUSDT"], batch_rows=2, downloader=self.downloader))
+        self.assertEqual([len(b["open_time"]) for _, b in batches], [2, 1, 2, 1, 2, 1])
+
+    def test_readahead_is_bounded(self):
+        in_flight = []
+        lock = threading.Lock()
+
+        def download(url, dest, config):
+            with lock:
+                in_flight.append(url)
+            return self.archives[url]
+
+        self.downloader.download_file.side_effect = download
+        stream = iter_batches(self.config, ["BTCUSDT", "ETHUSDT"], readahead=2, downloader=self.downloader)
+        next(stream)
+        # Consumer holds one archive, at most one more is fetched ahead
+        self.assertLessEqual(len(in_flight), 2)
+        stream.close()
+
+    def test_arrow_output(self):
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            self.skipTest("pyarrow not installed")
+        batches = list(iter_batches(self.config, ["ETHUSDT"], output="arrow", downloader=self.downloader))
+        self.assertEqual(batches[0][1].num_rows, 3)
+        self.assertIn("close", batches[0][1].column_names)
+
+    def test_rejects_unsupported_data_type(self):
+        config = self.config.model_copy(update={"data_type": "bookTicker"})
+        with self.assertRaises(ValueError):
+            next(iter_batches(config, ["BTCUSDT"], downloader=self.downloader))
+
+    def test_does_not_import_duckdb(self):
+        code = ("import sys, crypto_pipeline.stream; "
+                "sys.exit(1 if 'duckdb' in sys.modules else 0)")
+        self.assertEqual(subprocess.run([sys.executable, "-c", code]).returncode, 0)
+
+
+class TestParseCsv(unittest.TestCase):
+    def test_microsecond_times_and_booleans(self):
+        data = f"1,100.5,2,200,{JAN * 1000},True\n2,101,1,101,{JAN + 1},false\n".encode()
+        batch = parse_csv(data, "trades")
+        np.testing.assert_array_equal(batch["time"], [JAN, JAN + 1])
+        np.testing.assert_array_equal(batch["is_buyer_maker"], [True, False])
+
+    def test_unit_threshold_matches_loader(self):
+        # Same cut-off as timeutils.to_millis, which the loader and catalog use
+        times = [5 * 10**14, MICROSECOND_THRESHOLD, JAN]
+        data = "".join(f"{i},1,1,1,{t},true\n" for i, t in enumerate(times)).encode()
+        batch = parse_csv(data, "trades")
+        np.testing.assert_array_equal(batch["time"], [to_millis(t) for t in times])
+
+    def test_header_and_micros_in_klines(self):
+        data = zipfile.ZipFile(io.BytesIO(kline_zip(JAN, header=True, micros=True))).read("data.csv")
+        batch = parse_csv(data, "klines")
+        self.assertEqual(batch["open_time"][0], JAN)
+        self.assertEqual(batch["close_time"][0], JAN + MINUTE - 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,124 @@
+import json
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+from unittest.mock import MagicMock, patch
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+import duckdb
+import requests
+from crypto_pipeline.config import AppConfig
+from crypto_pipeline.loader import DuckDBLoader, ensure_klines_schema
+from crypto_pipeline.tail_sync import PAGE_LIMIT, TailSyncer
+
+MINUTE = 60_000
+DAY = 1440 * MINUTE
+START = 1_704_067_200_000  # 2024-01-01 00:00 UTC
+NOW = START + DAY + 2500 * MINUTE + 30_000  # mid-way through a minute, 2500 minutes after day one
+
+def kline(open_time, close):
+    return [open_time, str(close), str(close), str(close), str(close), "1", open_time + MINUTE - 1,
+            "1", 1, "1", "1", "0"]
+
+class FakeKlinesAPI(BaseHTTPRequestHandler):
+    """GET /api/v3/klines over a 1m series ending at NOW, rejecting the first call with 429."""
+    requests = []
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        params = {k: v[0] for k, v in parse_qs(url.query).items()}
+        FakeKlinesAPI.requests.append(params)
+        if len(FakeKlinesAPI.requests) == 1:
+            self.send_response(429)
+            self.send_header("Retry-After", "0")
+            self.end_headers()
+            return
+        start = -(-int(params["startTime"]) // MINUTE) * MINUTE
+        limit = min(int(params["limit"]), PAGE_LIMIT)
+        rows = [kline(t, 2.0) for t in range(start, NOW, MINUTE)][:limit]
+        body = json.dumps(rows).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+class TestTailSync(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        FakeKlinesAPI.requests = []
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), FakeKlinesAPI)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.config = AppConfig(asset_type="spot", time_period="daily", data_type="klines", data_frequency="1m",
+                                destination_dir=self.tmp_dir, db_path=os.path.join(self.tmp_dir, "k.duckdb"),
+                                tail_sync=True, rest_base_url=f"http://127.0.0.1:{self.server.server_port}/api/v3",
+                                rest_weight_per_minute=60_000)
+        self.loader = DuckDBLoader()
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        shutil.rmtree(self.tmp_dir)
+
+    def load_archive_day(self, day, close):
+        path = os.path.join(self.tmp_dir, f"day{day}.csv")
+        with open(path, "w") as f:
+            for i in range(1440):
+                f.write(",".join(str(v) for v in kline(START + day * DAY + i * MINUTE, close)) + "\n")
+        con = duckdb.connect(self.config.db_path)
+        ensure_klines_schema(con)
+        self.loader.insert_klines(con, [path], "BTCUSDT", "1m")
+        con.close()
+
+    def query(self, sql):
+        con = duckdb.connect(self.config.db_path, read_only=True)
+        try:
+            return con.execute(sql).fetchall()
+        finally:
+            con.close()
+
+    def test_tail_pages_from_last_archive_and_archive_replaces_it(self):
+        self.load_archive_day(0, 1.0)
+        written = TailSyncer().sync(["BTCUSDT", "ETHUSDT"], self.config, end_ms=NOW)
+
+        # Closed klines only: the minute in progress at NOW is left out
+        self.assertEqual(written, 2500)
+        pages = FakeKlinesAPI.requests[1:]
+        self.assertEqual([int(p["startTime"]) for p in pages],
+                         [START + DAY, START + DAY + 1000 * MINUTE, START + DAY + 2000 * MINUTE])
+        self.assertTrue(all(p["limit"] == "1000" and p["symbol"] == "BTCUSDT" for p in pages))
+        self.assertEqual(self.query("SELECT count(*), max(close_time) FROM klines"),
+                         [(1440 + 2500, START + DAY + 2500 * MINUTE - 1)])
+
+        # The official archive of day two replaces its tail rows
+        self.load_archive_day(1, 3.0)
+        self.assertEqual(self.query("SELECT close, count(*) FROM klines GROUP BY close ORDER BY close"),
+                         [(1.0, 1440), (2.0, 2500 - 1440), (3.0, 1440)])
+
+        # Nothing is fetched again once the tail is current
+        FakeKlinesAPI.requests = [{}]
+        self.assertEqual(TailSyncer().sync(["BTCUSDT"], self.config, end_ms=NOW), 0)
+    def test_connection_errors_are_retried_with_backoff(self):
+        ok = MagicMock(status_code=200)
+        ok.json.return_value = [kline(START, 2.0)]
+        session = MagicMock()
+        session.get.side_effect = [requests.exceptions.ConnectionError("reset"), ok]
+        syncer = TailSyncer(session)
+        with patch("crypto_pipeline.tail_sync.time.sleep") as sleep:
+            self.assertEqual(syncer._get("http://api/klines", {}, self.config), [kline(START, 2.0)])
+        sleep.assert_called_once_with(0.5)
+
+        # Client errors are not retried
+        rejected = MagicMock(status_code=400)
+        rejected.raise_for_status.side_effect = requests.exceptions.HTTPError("bad symbol", response=rejected)
+        session.get.side_effect = [rejected, ok]
+        with self.assertRaises(requests.exceptions.HTTPError):
+            syncer._get("http://api/klines", {}, self.config)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,52 +1,60 @@
-
 import unittest
 import os
-from unittest.mock import patch
+import shutil
+import tempfile
+from crypto_pipeline.catalog import open_catalog
 from crypto_pipeline.verifier import Verifier
 from crypto_pipeline.config import AppConfig
 
 class TestVerifier(unittest.TestCase):
     def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
         self.verifier = Verifier()
         self.config = AppConfig(
             asset_type="spot",
             time_period="daily",
             data_type="klines",
             data_frequency="1d",
-            destination_dir="test_data"
+            destination_dir=self.tmp_dir
         )
-    
-    def test_verify_file_valid_klines(self):
-        # Create a dummy CSV file
-        with open("test_valid.csv", "w") as f:
-            # 12 columns for klines
-            f.write("1,2,3,4,5,6,7,8,9,10,11,12\n")
-            
-        with patch.object(self.verifier, '_is_valid_timestamp', return_value=True):
-            result = self.verifier._verify_file("test_valid.csv", self.config)
-            self.assertTrue(result)
-            
-        os.remove("test_valid.csv")
-
-    def test_verify_file_invalid_schema(self):
-        with open("test_invalid.csv", "w") as f:
-            # 11 columns (missing one)
-            f.write("1,2,3,4,5,6,7,8,9,10,11\n")
-            
-        with patch.object(self.verifier, '_quarantine_file') as mock_quarantine:
-            result = self.verifier._verify_file("test_invalid.csv", self.config)
-            self.assertFalse(result)
-            mock_quarantine.assert_called_once()
-            
-        os.remove("test_invalid.csv")
-
-    def test_verify_file_empty(self):
-        with open("test_empty.csv", "w") as f:
-            pass # Empty
-            
-        with patch.object(self.verifier, '_quarantine_file') as mock_quarantine:
-            result = self.verifier._verify_file("test_empty.csv", self.config)
-            self.assertFalse(result)
-            mock_quarantine.assert_called_once()
-            
-        os.remove("test_empty.csv")
+        self.directory = self.config.dataset_dir("BTCUSDT")
+        os.makedirs(self.directory)
+
+    def tearDown(self):
+        open_catalog(self.config).close()
+        shutil.rmtree(self.tmp_dir)
+
+    def write(self, name, content):
+        with open(os.path.join(self.directory, name), "w") as f:
+            f.write(content)
+
+    def verify(self):
+        """Run verification and return (verified file names, quarantined file names)."""
+        self.verifier.verify(["BTCUSDT"], self.config)
+        entries = open_catalog(self.config).files(self.directory)
+        quarantine = os.path.join(self.tmp_dir, "quarantine")
+        quarantined = sorted(os.listdir(quarantine)) if os.path.isdir(quarantine) else []
+        return sorted(os.path.basename(e["path"]) for e in entries if e["verified"]), quarantined
+
+    def test_verify_valid_klines(self):
+        self.write("BTCUSDT-1d-2025-01-01.csv", "1735689600000,1,1,1,1,1,1735775999999,1,1,1,1,0\n")
+        self.assertEqual(self.verify(), (["BTCUSDT-1d-2025-01-01.csv"], []))
+
+    def test_verify_invalid_schema(self):
+        # 11 columns (missing one)
+        self.write("BTCUSDT-1d-2025-01-01.csv", "1735689600000,1,1,1,1,1,1735775999999,1,1,1,1\n")
+        self.assertEqual(self.verify(), ([], ["BTCUSDT-1d-2025-01-01.csv"]))
+        self.assertEqual(open_catalog(self.config).files(self.directory), [])
+
+    def test_verify_empty(self):
+        self.write("BTCUSDT-1d-2025-01-01.csv", "")
+        self.assertEqual(self.verify(), ([], ["BTCUSDT-1d-2025-01-01.csv"]))
+
+    def test_timestamp_unit_detected_from_value(self):
+        # Milliseconds and microseconds are both accepted regardless of the file name
+        self.write("BTCUSDT-1d-2025-01-01.csv", "1735689600000,1,1,1,1,1,1735775999999,1,1,1,1,0\n")
+        self.write("BTCUSDT-1d-2024-12-31.csv", "1735603200000000,1,1,1,1,1,1735689599999999,1,1,1,1,0\n")
+        self.write("BTCUSDT-1d-2025-01-02.csv", "17357760000,1,1,1,1,1,17358623999,1,1,1,1,0\n")
+        self.assertEqual(self.verify(), (["BTCUSDT-1d-2024-12-31.csv", "BTCUSDT-1d-2025-01-01.csv"],
+                                         ["BTCUSDT-1d-2025-01-02.csv"]))
+
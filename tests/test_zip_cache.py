@@ -0,0 +1,154 @@
+import hashlib
+import os
+import shutil
+import tempfile
+import time
+import unittest
+from unittest.mock import patch, MagicMock
+from crypto_pipeline.config import AppConfig
+from crypto_pipeline.downloader import Downloader
+from crypto_pipeline.zip_cache import ZipCache
+
+URL = "https://data.binance.vision/data/spot/daily/klines/BTCUSDT/1m/BTCUSDT-1m-2024-01-01.zip"
+
+class TestZipCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_round_trip_and_stats(self):
+        cache = ZipCache(self.tmp_dir, max_bytes=1000)
+        self.assertIsNone(cache.get(URL))
+        cache.put(URL, b"zip-bytes")
+        self.assertEqual(cache.get(URL), b"zip-bytes")
+        # Another process sees the same entry
+        self.assertEqual(ZipCache(self.tmp_dir, max_bytes=1000).get(URL), b"zip-bytes")
+        self.assertEqual(cache.stats()["hits"], 1)
+        self.assertEqual(cache.stats()["misses"], 1)
+        self.assertEqual(cache.stats()["bytes_saved"], 9)
+
+    def test_least_recently_used_is_evicted(self):
+        cache = ZipCache(self.tmp_dir, max_bytes=25)
+        cache.put(f"{URL}.a", b"a" * 10)
+        cache.put(f"{URL}.b", b"b" * 10)
+        # Age both objects, b less than a, independent of file system time resolution
+        for age, content in ((200, b"a" * 10), (100, b"b" * 10)):
+            path = cache._object_path(hashlib.sha256(content).hexdigest())
+            os.utime(path, (time.time() - age, time.time() - age))
+
+        self.assertIsNotNone(cache.get(f"{URL}.a"))  # a becomes most recently used
+        cache.put(f"{URL}.c", b"c" * 10)
+
+        self.assertIsNone(cache.get(f"{URL}.b"))
+        self.assertIsNotNone(cache.get(f"{URL}.a"))
+        self.assertIsNotNone(cache.get(f"{URL}.c"))
+        self.assertLessEqual(cache.stats()["size"], 25)
+
+    def test_corrupt_object_is_a_miss(self):
+        cache = ZipCache(self.tmp_dir, max_bytes=1000)
+        cache.put(URL, b"zip-bytes")
+        digest = open(cache._ref_path(URL)).read()
+        with open(cache._object_path(digest), "wb") as f:
+            f.write(b"garbage")
+        self.assertIsNone(cache.get(URL))
+
+    def test_eviction_frees_down_to_low_watermark_and_prunes_refs(self):
+        cache = ZipCache(self.tmp_dir, max_bytes=100)
+        for i in range(10):
+            cache.put(f"{URL}.{i}", bytes([i]) * 10)
+            path = cache._object_path(hashlib.sha256(bytes([i]) * 10).hexdigest())
+            os.utime(path, (time.time() - 100 + i, time.time() - 100 + i))
+        with patch.object(cache, "evict", wraps=cache.evict) as evict:
+            cache.put(f"{URL}.10", b"x" * 10)
+            cache.put(f"{URL}.11", b"y" * 10)
+        # The first eviction made room for the next put as well
+        self.assertEqual(evict.call_count, 1)
+        self.assertEqual(cache.stats()["size"], 100)
+        self.assertIsNone(cache.get(f"{URL}.0"))
+        self.assertIsNone(cache.get(f"{URL}.1"))
+        self.assertIsNotNone(cache.get(f"{URL}.2"))
+        self.assertEqual(len(os.listdir(os.path.join(self.tmp_dir, "refs"))), 10)
+
+    def test_corrupt_object_is_removed_from_size(self):
+        cache = ZipCache(self.tmp_dir, max_bytes=1000)
+        cache.put(URL, b"zip-bytes")
+        digest = open(cache._ref_path(URL)).read()
+        with open(cache._object_path(digest), "wb") as f:
+            f.write(b"zip-bytez")
+        cache.get(URL)
+        self.assertEqual(cache.stats()["size"], 0)
+
+    def test_republished_archive_is_a_miss(self):
+        cache = ZipCache(self.tmp_dir, max_bytes=1000)
+        cache.put(URL, b"old", hashlib.sha256(b"old").hexdigest())
+        self.assertEqual(cache.get(URL, hashlib.sha256(b"old").hexdigest()), b"old")
+        self.assertIsNone(cache.get(URL, hashlib.sha256(b"new").hexdigest()))
+        # Content not matching the upstream checksum is not cached
+        cache.put(URL, b"truncated", hashlib.sha256(b"new").hexdigest())
+        self.assertIsNone(cache.get(URL))
+
+    def test_file_round_trip(self):
+        cache = ZipCache(os.path.join(self.tmp_dir, "cache"), max_bytes=1000)
+        source, dest = os.path.join(self.tmp_dir, "a.zip"), os.path.join(self.tmp_dir, "b.zip")
+        with open(source, "wb") as f:
+            f.write(b"zip-bytes")
+        self.assertFalse(cache.get_file(URL, dest))
+        self.assertFalse(os.path.exists(dest))
+        cache.put_file(URL, source, hashlib.sha256(b"zip-bytes").hexdigest())
+        self.assertTrue(cache.get_file(URL, dest, hashlib.sha256(b"zip-bytes").hexdigest()))
+        with open(dest, "rb") as f:
+            self.assertEqual(f.read(), b"zip-bytes")
+        self.assertEqual(cache.get(URL), b"zip-bytes")
+        self.assertEqual(cache.stats()["size"], 9)
+
+    @patch('requests.get')
+    def test_downloader_streams_to_file_through_cache(self, mock_get):
+        response = MagicMock()
+        response.text = f"{hashlib.sha256(b'zip_content').hexdigest()}  BTCUSDT-1m-2024-01-01.zip\n"
+        response.iter_content.return_value = [b"zip_", b"content"]
+        mock_get.return_value = response
+        config = AppConfig(asset_type="spot", time_period="daily", data_type="klines", data_frequency="1m",
+                           cache_dir=os.path.join(self.tmp_dir, "cache"))
+        dest = os.path.join(self.tmp_dir, "spooled.zip")
+
+        for downloader in (Downloader(), Downloader()):
+            downloader.download_to(URL, dest, config)
+            with open(dest, "rb") as f:
+                self.assertEqual(f.read(), b"zip_content")
+            os.remove(dest)
+        # The second download was served by the cache
+        self.assertEqual([c.args[0] for c in mock_get.call_args_list if not c.args[0].endswith(".CHECKSUM")], [URL])
+        self.assertTrue(mock_get.call_args_list[1].kwargs["stream"])
+
+    @patch('requests.get')
+    def test_downloader_consults_cache(self, mock_get):
+        published = {URL: b"zip_content"}
+
+        def get(url, **kwargs):
+            response = MagicMock()
+            if url.endswith(".CHECKSUM"):
+                content = published[url[:-len(".CHECKSUM")]]
+                response.text = f"{hashlib.sha256(content).hexdigest()}  BTCUSDT-1m-2024-01-01.zip\n"
+            else:
+                response.content = published[url]
+            return response
+
+        mock_get.side_effect = get
+        config = AppConfig(asset_type="spot", time_period="daily", data_type="klines", data_frequency="1m",
+                           cache_dir=self.tmp_dir)
+        downloaded = lambda: [c.args[0] for c in mock_get.call_args_list if not c.args[0].endswith(".CHECKSUM")]
+
+        # A second downloader stands in for another run sharing the cache
+        for downloader in (Downloader(), Downloader()):
+            self.assertEqual(downloader.download_file(URL, "dest", config), b"zip_content")
+        self.assertEqual(downloaded(), [URL])
+
+        # Binance republishes the archive under the same URL
+        published[URL] = b"zip_content_v2"
+        self.assertEqual(Downloader().download_file(URL, "dest", config), b"zip_content_v2")
+        self.assertEqual(downloaded(), [URL, URL])
+
+if __name__ == "__main__":
+    unittest.main()